@@ -0,0 +1,388 @@
+"""
+La Bàn Chứng Khoán AI Pro — api.py
+API JSON (ASGI, Starlette) chạy song song với giao diện Streamlit
+
+Dashboard nội bộ / bot chỉ cần số liệu, không cần chạy lại cả app.py mỗi
+lần tương tác. Dùng chung các lớp cache của app: st.cache_data (bộ nhớ
+process), core.cache_backend (đĩa / Redis, chung với replica Streamlit),
+core.singleflight, core.ai_cache. Thêm 1 lớp cache response đã mã hoá JSON
+theo URL (TTL bằng lớp dữ liệu) + ETag → request lặp lại không phải dựng
+lại JSON, client có ETag nhận 304.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 2
+
+  GET  /health
+  GET  /metrics                                 text Prometheus (core.latency)
+  GET  /v1/stock/{ticker}?region=VN
+  POST /v1/stock/batch      {"tickers": ["FPT", "VNM"], "region": "VN"}
+  GET  /v1/chart/{ticker}?region=VN&period=1y   OHLCV
+  POST /v1/chart/batch      {"tickers": [...], "region": "VN", "period": "1y"}
+  GET  /v1/indicators/{ticker}?name=macd&fast=12&slow=26&signal=9&period=1y
+  GET  /v1/analysis/{ticker}?region=VN&lang=Tiếng Việt&model=gemini-2.0-flash
+
+Env LBCK_API_TOKEN → bắt buộc header `Authorization: Bearer <token>`.
+Không đặt token → /v1/analysis bị tắt (403): endpoint này tiêu quota Gemini
+trả phí. model / lang chỉ nhận giá trị trong ai_engine.MODEL_MAP / LANGS.
+Cache response khoá theo tham số đã kiểm tra (tham số lạ không tạo entry mới).
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+import numpy as np                                                   # noqa: E402
+import pandas as pd                                                  # noqa: E402
+from starlette.applications import Starlette                         # noqa: E402
+from starlette.concurrency import run_in_threadpool                  # noqa: E402
+from starlette.requests import Request                               # noqa: E402
+from starlette.responses import JSONResponse, PlainTextResponse, Response   # noqa: E402
+from starlette.routing import Route                                  # noqa: E402
+
+from core import cache_warmer, indicators, latency, ohlcv_store      # noqa: E402
+from core.ai_engine import LANGS, MODEL_MAP, get_ai_analysis        # noqa: E402
+from core.data_fetcher import QUOTE_TTL, REGION_SUFFIX, get_stock_data   # noqa: E402
+from components.chart_ui import _fetch_chart_data, _load_full_history    # noqa: E402
+
+# st.cache_data ngoài Streamlit runtime → cảnh báo mỗi hàm, vô hại
+logging.getLogger("streamlit.runtime.caching").setLevel(logging.ERROR)
+
+API_TOKEN      = os.environ.get("LBCK_API_TOKEN", "")
+MAX_BATCH      = 50
+BATCH_PARALLEL = 8         # số mã chạy đồng thời trong 1 request batch
+CHART_TTL      = ohlcv_store.REFRESH_S
+ANALYSIS_TTL   = 300
+RESPONSE_CACHE_SIZE = 2048
+MAX_WINDOW     = 500       # chặn trên cho tham số cửa sổ chỉ báo (n, fast, slow...)
+MAX_FACTOR     = 10.0      # chặn trên cho hệ số thực (k của Bollinger)
+MODELS         = frozenset(MODEL_MAP.values())
+_AI_BADGES      = ("🔍", "🤖")
+_AI_INTERRUPTED = "Kết nối bị ngắt giữa chừng"
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status, self.message = status, message
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  JSON + CACHE RESPONSE + ETAG
+# ══════════════════════════════════════════════════════════════════════════════
+def _plain(v):
+    """Giá trị JSON hợp lệ: numpy → Python, NaN/inf → null, ngày → ISO."""
+    if isinstance(v, dict):
+        return {str(k): _plain(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_plain(x) for x in v]
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and not math.isfinite(v):
+        return None
+    if isinstance(v, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(v).isoformat()
+    return v
+
+
+def _encode(payload) -> bytes:
+    return json.dumps(_plain(payload), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class _ResponseCache:
+    """LRU theo URL: (hết hạn, body JSON, ETag). Chỉ lưu response 200."""
+
+    def __init__(self, size: int = RESPONSE_CACHE_SIZE):
+        self._size  = size
+        self._items = OrderedDict()
+        self._lock  = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, key, ttl: float, body: bytes):
+        item = (time.monotonic() + ttl, body, '"%s"' % hashlib.sha1(body).hexdigest())
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            while len(self._items) > self._size:
+                self._items.popitem(last=False)
+        return item
+
+    def stats(self) -> dict:
+        return {"entries": len(self._items), "hit": self.hits, "miss": self.misses}
+
+
+_responses = _ResponseCache()
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match", "")
+    tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+    return etag in tags or "*" in tags
+
+
+def _respond(request: Request, item, ttl: float) -> Response:
+    _, body, etag = item
+    headers = {"ETag": etag, "Cache-Control": f"max-age={int(ttl)}"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def _cached(request: Request, ttl: float, key: tuple, produce) -> Response:
+    """
+    Trả từ cache response nếu còn hạn, ngược lại chạy produce() trong thread pool.
+    `key` dựng từ tham số ĐÃ kiểm tra — không dùng query string thô.
+    """
+    item = _responses.get(key)
+    if item is None:
+        item = _responses.put(key, ttl, _encode(await run_in_threadpool(produce)))
+    return _respond(request, item, ttl)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  THAM SỐ
+# ══════════════════════════════════════════════════════════════════════════════
+def _valid_ticker(value) -> str:
+    t = value.upper().strip() if isinstance(value, str) else ""
+    if not t.replace(".", "").replace("-", "").isalnum() or len(t) > 12:
+        raise ApiError(400, f"mã không hợp lệ: {value!r}")
+    return t
+
+
+def _ticker(request: Request) -> str:
+    return _valid_ticker(request.path_params["ticker"])
+
+
+def _region(value) -> str:
+    region = (value or "VN").upper()
+    if region not in REGION_SUFFIX:
+        raise ApiError(400, f"region phải là một trong {sorted(REGION_SUFFIX)}")
+    return region
+
+
+def _period(value) -> str:
+    period = value or "1y"
+    if period not in ohlcv_store.PERIOD_DAYS:
+        raise ApiError(400, f"period phải là một trong {list(ohlcv_store.PERIOD_DAYS)}")
+    return period
+
+
+async def _body(request: Request) -> dict:
+    try:
+        body = await request.json()
+    except Exception:
+        raise ApiError(400, "body phải là JSON")
+    tickers = body.get("tickers") if isinstance(body, dict) else None
+    if not isinstance(tickers, list) or not tickers:
+        raise ApiError(400, "thiếu danh sách 'tickers'")
+    if len(tickers) > MAX_BATCH:
+        raise ApiError(400, f"tối đa {MAX_BATCH} mã / request")
+    body["tickers"] = list(dict.fromkeys(_valid_ticker(t) for t in tickers))
+    return body
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  DỮ LIỆU (chạy trong thread pool — mọi hàm bên dưới là blocking)
+# ══════════════════════════════════════════════════════════════════════════════
+def _stock(ticker: str, region: str) -> dict:
+    data = get_stock_data(ticker, region)
+    if "error" in data:
+        raise ApiError(503 if data.get("_unavailable") else 404, data["error"].replace("**", ""))
+    return data
+
+
+def _chart(ticker: str, region: str, period: str) -> dict:
+    df = _fetch_chart_data(ticker, region, period)
+    if df is None or df.empty:
+        raise ApiError(404, f"không có dữ liệu biểu đồ cho {ticker}")
+    return {"ticker": ticker, "region": region, "period": period,
+            "columns": list(ohlcv_store.COLUMNS),
+            "index": [d.strftime("%Y-%m-%d") for d in df.index],
+            "data": df[ohlcv_store.COLUMNS].to_numpy().tolist()}
+
+
+def _indicator_params(name: str, query) -> dict:
+    """Tham số chỉ báo: cửa sổ là int trong 1..MAX_WINDOW, hệ số thực trong (0, MAX_FACTOR]."""
+    if name not in indicators.INDICATORS:
+        raise ApiError(400, f"name phải là một trong {sorted(indicators.INDICATORS)}")
+    params = {}
+    for k, v in indicators.INDICATORS[name][1].items():
+        try:
+            x = type(v)(query[k]) if k in query else v
+        except ValueError:
+            x = None
+        ok = (x is not None and 1 <= x <= MAX_WINDOW if isinstance(v, int)
+              else x is not None and 0 < x <= MAX_FACTOR)
+        if not ok:
+            bound = f"số nguyên 1..{MAX_WINDOW}" if isinstance(v, int) else f"số thực (0, {MAX_FACTOR:g}]"
+            raise ApiError(400, f"{name}: '{k}' phải là {bound}")
+        params[k] = x
+    return params
+
+
+def _indicator(ticker: str, region: str, period: str, name: str, params: dict) -> dict:
+    try:
+        full = _load_full_history(ticker, region)
+    except Exception:
+        raise ApiError(404, f"không có dữ liệu biểu đồ cho {ticker}")
+    view = ohlcv_store.slice_period(full, period)
+    res  = indicators.compute(f"{ticker}:{region}", full, name, **params)
+    return {"ticker": ticker, "name": name, "params": params, "period": period,
+            "index": [d.strftime("%Y-%m-%d") for d in view.index],
+            "series": {k: s.loc[view.index[0]:].tolist() if len(view) else []
+                       for k, s in res.items()}}
+
+
+def _analysis(ticker: str, region: str, lang: str, model: str) -> dict:
+    data = _stock(ticker, region)
+    text = get_ai_analysis(ticker, lang, model, stock_data=data)
+    # Bài thành công luôn mở đầu bằng badge nguồn; còn lại là thông báo lỗi / quota
+    if not text.startswith(_AI_BADGES) or _AI_INTERRUPTED in text:
+        raise ApiError(503, text)
+    return {"ticker": ticker, "model": model, "lang": lang, "text": text}
+
+
+async def _batch(tickers, fn, *args) -> dict:
+    """Chạy fn cho từng mã (tối đa BATCH_PARALLEL song song); lỗi từng mã không làm hỏng cả batch."""
+    sem = asyncio.Semaphore(BATCH_PARALLEL)
+
+    async def one(t):
+        async with sem:
+            try:
+                return t, {"ok": True, "data": await run_in_threadpool(fn, t, *args)}
+            except ApiError as e:
+                return t, {"ok": False, "error": e.message, "status": e.status}
+            except Exception as e:
+                logging.getLogger(__name__).warning("batch %s %s: %r", fn.__name__, t, e)
+                return t, {"ok": False, "error": f"lỗi nội bộ: {type(e).__name__}", "status": 500}
+    return dict(await asyncio.gather(*(one(t) for t in tickers)))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  HANDLERS
+# ══════════════════════════════════════════════════════════════════════════════
+async def health(request: Request):
+    return JSONResponse({"ok": True, "responses": _responses.stats(),
+                         "warmer": cache_warmer.stats()})
+
+
+async def metrics(request: Request):
+    return PlainTextResponse(latency.prometheus_text(),
+                             media_type="text/plain; version=0.0.4")
+
+
+async def stock(request: Request):
+    t, region = _ticker(request), _region(request.query_params.get("region"))
+    cache_warmer.record_access(t, region)
+    return await _cached(request, QUOTE_TTL, ("stock", t, region), lambda: _stock(t, region))
+
+
+async def stock_batch(request: Request):
+    body = await _body(request)
+    region = _region(body.get("region"))
+    return Response(_encode(await _batch(body["tickers"], _stock, region)),
+                    media_type="application/json")
+
+
+async def chart(request: Request):
+    t, q = _ticker(request), request.query_params
+    region, period = _region(q.get("region")), _period(q.get("period"))
+    return await _cached(request, CHART_TTL, ("chart", t, region, period),
+                         lambda: _chart(t, region, period))
+
+
+async def chart_batch(request: Request):
+    body = await _body(request)
+    region, period = _region(body.get("region")), _period(body.get("period"))
+    return Response(_encode(await _batch(body["tickers"], _chart, region, period)),
+                    media_type="application/json")
+
+
+async def indicator(request: Request):
+    t, q = _ticker(request), request.query_params
+    region, period = _region(q.get("region")), _period(q.get("period"))
+    name   = (q.get("name") or "sma").lower()
+    params = _indicator_params(name, q)
+    return await _cached(request, CHART_TTL,
+                         ("indicator", t, region, period, name, tuple(sorted(params.items()))),
+                         lambda: _indicator(t, region, period, name, params))
+
+
+async def analysis(request: Request):
+    if not API_TOKEN:
+        raise ApiError(403, "/v1/analysis tắt khi chưa đặt LBCK_API_TOKEN")
+    t, q = _ticker(request), request.query_params
+    region = _region(q.get("region"))
+    lang   = q.get("lang") or LANGS[0]
+    model  = q.get("model") or "gemini-2.0-flash"
+    if lang not in LANGS:
+        raise ApiError(400, f"lang phải là một trong {list(LANGS)}")
+    if model not in MODELS:
+        raise ApiError(400, f"model phải là một trong {sorted(MODELS)}")
+    return await _cached(request, ANALYSIS_TTL, ("analysis", t, region, lang, model),
+                         lambda: _analysis(t, region, lang, model))
+
+
+async def _api_error(request: Request, exc: ApiError):
+    return JSONResponse({"error": exc.message}, status_code=exc.status)
+
+
+class _TokenAuth:
+    """ASGI middleware: Bearer token khi có LBCK_API_TOKEN (trừ /health)."""
+
+    def __init__(self, app, token: str):
+        self.app, self.token = app, token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.token and scope["path"] != "/health":
+            auth = dict(scope["headers"]).get(b"authorization", b"")
+            if not hmac.compare_digest(auth, f"Bearer {self.token}".encode()):   # so sánh thời gian hằng
+                await JSONResponse({"error": "unauthorized"}, status_code=401)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    cache_warmer.start()
+    yield
+
+
+routes = [
+    Route("/health", health),
+    Route("/metrics", metrics),
+    Route("/v1/stock/batch", stock_batch, methods=["POST"]),
+    Route("/v1/stock/{ticker}", stock),
+    Route("/v1/chart/batch", chart_batch, methods=["POST"]),
+    Route("/v1/chart/{ticker}", chart),
+    Route("/v1/indicators/{ticker}", indicator),
+    Route("/v1/analysis/{ticker}", analysis),
+]
+
+app = Starlette(routes=routes, lifespan=_lifespan,
+                exception_handlers={ApiError: _api_error})
+if API_TOKEN:
+    app.add_middleware(_TokenAuth, token=API_TOKEN)
+else:
+    logging.getLogger(__name__).warning(
+        "LBCK_API_TOKEN chưa đặt — API mở, /v1/analysis bị tắt")
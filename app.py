@@ -13,8 +13,14 @@ for _p in [_ROOT, os.getcwd()]:
 
 try:
     from core.data_fetcher     import get_stock_data
+    from core                  import genai_pool, cache_warmer, query_router, screener
+    from core.ai_engine        import MODEL_MAP
     from components.chart_ui   import render_chart
     from components.chatbot_ui import render_chat_interface
+    from components.watchlist_ui import render_watchlist
+    from components.screener_ui  import render_screener
+    from components.admin_ui     import admin_enabled, render_latency_panel, render_provider_panel
+    from components.live_quote_ui import render_live_price
 except ModuleNotFoundError as e:
     st.error(f"❌ **Import lỗi:** `{e}`")
     st.stop()
@@ -61,22 +67,6 @@ def load_locales(lang_code):
             return json.load(f)
     return {}
 
-_GKW = ["thị trường","market","nhận định","lạm phát","lãi suất","kinh tế","vĩ mô",
-        "hôm nay","tuần này","tháng này","xu hướng","nên mua","nên bán","cổ phiếu nào",
-        "gợi ý","recommend","inflation","interest rate","gdp","fed","ngân hàng",
-        "strategy","chiến lược","danh mục","portfolio","rủi ro","risk","cơ hội",
-        "tổng quan","tổng kết","diễn biến","có gì","thế nào","ra sao","như thế nào",
-        "hàng hóa","dầu","vàng","đặc biệt","sự kiện"]
-
-def classify(text):
-    if not text: return "general"
-    tl = text.lower().strip(); ws = tl.split()
-    for kw in _GKW:
-        if kw in tl: return "general"
-    if len(ws)==1 and len(ws[0])<=6 and ws[0].isalnum(): return "ticker"
-    if len(ws)==2 and all(len(w)<=6 and w.isalnum() for w in ws): return "ticker"
-    return "general"
-
 def fmt_price(v, region="VN"):
     """Format giá với đơn vị."""
     if v is None or v == "N/A": return "N/A"
@@ -110,6 +100,9 @@ for k,v in [("language","vi"),("selected_model","gemini-2.0-flash"),("market_reg
 
 loc = load_locales(st.session_state["language"])
 
+cache_warmer.start()
+screener.start_universe()
+
 # ── Sidebar ───────────────────────────────────────────────────────────────────
 with st.sidebar:
     st.title(loc.get("sidebar_title","⚙️ Cài đặt"))
@@ -124,20 +117,31 @@ with st.sidebar:
     st.session_state["market_region"] = "VN" if "Việt Nam" in mr else ("US" if "Mỹ" in mr else "INTL")
     if st.session_state["market_region"]=="VN":
         st.session_state["market_filter"] = st.radio("Sàn:",["Tất cả","HOSE","HNX","UPCOM"],horizontal=True)
+        st.session_state["page"] = st.radio("Trang:",["🔍 Tra cứu","🧮 Bộ lọc cổ phiếu"],horizontal=True)
+    else:
+        st.session_state["page"] = "🔍 Tra cứu"
+    render_watchlist(st.session_state["market_region"])
 
     st.divider()
     st.subheader(loc.get("ai_config","🤖 Cấu hình AI"))
-    MODEL_MAP = {
-        "⚡ Gemini 2.0 Flash (Khuyên dùng)": "gemini-2.0-flash",
-        "✨ Gemini 1.5 Flash":               "gemini-1.5-flash",
-        "🧠 Gemini 2.0 Pro":                 "gemini-2.0-pro-exp-02-05",
-    }
     cur = st.session_state["selected_model"]
     cur_lbl = next((k for k,v in MODEL_MAP.items() if v==cur),"⚡ Gemini 2.0 Flash (Khuyên dùng)")
     sel = st.selectbox(loc.get("model_select","Model:"),list(MODEL_MAP.keys()),
                        index=list(MODEL_MAP.keys()).index(cur_lbl))
     st.session_state["selected_model"] = MODEL_MAP[sel]
     if "Pro" in sel: st.warning("⚠️ Pro: ~2 req/phút. Dễ Rate Limit.")
+    pool = genai_pool.get_pool()
+    if pool is not None:
+        q = pool.quota(st.session_state["selected_model"])
+        with st.expander(f"📊 Quota AI: còn {q['left_today']:,}/{q['rpd']:,} hôm nay"):
+            st.caption(f"{q['keys']} API key" + (f" ({q['dropped']} bị loại)" if q['dropped'] else "")
+                       + f" · {q['rpm']} req/phút · đang chờ: {q['waiting']} · "
+                       f"lượt kế tiếp sau ~{q['next_slot_s']:.0f}s")
+            st.caption(f"Đã cho qua {q['admitted']} · xếp hàng {q['queued']} · "
+                       f"từ chối {q['rejected']} · 429 {q['throttled']}")
+    if admin_enabled():
+        render_latency_panel()
+        render_provider_panel()
     st.divider()
     st.markdown("**💡 Tránh Rate Limit:**\n- Dùng ⚡ Flash\n- Đợi 1–2 phút giữa các lần\n- 1,500 req/ngày miễn phí")
     st.caption("📦 v5.0 | Full Data + Search Grounding")
@@ -145,6 +149,10 @@ with st.sidebar:
 # ── Main ──────────────────────────────────────────────────────────────────────
 st.title(loc.get("title","📈 La Bàn Chứng Khoán AI Pro"))
 
+if "Bộ lọc" in st.session_state.get("page", ""):
+    render_screener(st.session_state.get("market_filter", "Tất cả"))
+    st.stop()
+
 with st.form("sf", clear_on_submit=False):
     c1,c2 = st.columns([0.82,0.18])
     with c1:
@@ -162,9 +170,17 @@ user_input  = (fi if fi else vi_in) or ""
 triggered   = sb or bool(vi_in)
 lang_prompt = "Tiếng Việt" if st.session_state["language"]=="vi" else "English"
 
-def _render_stock_data(data: dict, region: str):
-    """Hiển thị đầy đủ dữ liệu cổ phiếu theo layout như trang HOSE/CafeF."""
-
+def _tick(changed: dict, field: str, new, region: str):
+    """Delta so với lần làm mới trước (chỉ trường vừa đổi trong chế độ trực tiếp)."""
+    try:
+        d = float(new) - float(changed[field])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return f"{d:+,.2f}" if region != "VN" else f"{d:+,.0f}"
+
+def _render_price(data: dict, region: str, changed: dict = None):
+    """Header giá + bảng "Thông tin Giá" — vẽ lại riêng khi bật giá trực tiếp."""
+    changed  = changed or {}
     ticker   = data.get("ticker","")
     price    = data.get("price", 0)
     ref      = data.get("ref_price")   or data.get("prev_close") or price
@@ -175,34 +191,20 @@ def _render_stock_data(data: dict, region: str):
     low_p    = data.get("low_price",   "N/A")
     chg      = data.get("price_change", 0)
     chg_pct  = data.get("price_change_pct", 0)
-
-    pe    = data.get("pe", "N/A")
-    pb    = data.get("pb", "N/A")
-    eps   = data.get("eps", "N/A")
-    bvps  = data.get("bvps", "N/A")
-    roe   = data.get("roe", "N/A")
-    roa   = data.get("roa", "N/A")
-    avg_pe = data.get("avg_pe", 0) or "N/A"
-    avg_pb = data.get("avg_pb", 0) or "N/A"
-    ind   = data.get("industry", "N/A")
-    mkt   = data.get("market", region)
-    mc    = data.get("market_cap", "N/A")      # Tỷ đồng
-    vol   = data.get("volume", 0)
-    ls    = data.get("listed_shares", "N/A")
-    circ  = data.get("circulating", "N/A")
-    room  = data.get("foreign_room", "N/A")
-    fbuy  = data.get("foreign_buy", "N/A")
-    fsell = data.get("foreign_sell", "N/A")
+    ind      = data.get("industry", "N/A")
+    mkt      = data.get("market", region)
 
     unit = "VNĐ" if region == "VN" else "USD"
 
     # Header
     chg_color = "🟢" if chg > 0 else "🔴" if chg < 0 else "🟡"
     chg_sign  = "+" if chg > 0 else ""
+    tick      = _tick(changed, "price", price, region)
     st.subheader(
         f"📊 **{ticker}** — {ind} | Sàn: {mkt}  "
         f"{chg_color} {fmt_price(price, region)} {unit}  "
         f"({chg_sign}{chg:,.0f} | {chg_sign}{chg_pct:.2f}%)"
+        + (f"  {'▲' if tick[0] == '+' else '▼'} {tick}" if tick else "")
     )
 
     # ── BẢNG 1: Giá ──────────────────────────────────────────────────────────
@@ -216,9 +218,31 @@ def _render_stock_data(data: dict, region: str):
     g3.metric("Giá sàn",   fmt_price(floor_p, region),
               delta=f"-{round((float(ref)-float(floor_p))/float(ref)*100,1)}%" if floor_p!="N/A" and ref else None,
               delta_color="inverse")
-    g4.metric("Giá mở cửa", fmt_price(open_p, region))
-    g5.metric("Cao nhất",   fmt_price(high_p, region))
-    g6.metric("Thấp nhất",  fmt_price(low_p, region))
+    g4.metric("Giá mở cửa", fmt_price(open_p, region), delta=_tick(changed, "open_price", open_p, region))
+    g5.metric("Cao nhất",   fmt_price(high_p, region), delta=_tick(changed, "high_price", high_p, region))
+    g6.metric("Thấp nhất",  fmt_price(low_p, region),  delta=_tick(changed, "low_price", low_p, region))
+
+def _render_stock_data(data: dict, region: str):
+    """Hiển thị đầy đủ dữ liệu cổ phiếu theo layout như trang HOSE/CafeF."""
+
+    # Header + Giá — fragment tự làm mới trong phiên (mã VN), còn lại vẽ 1 lần
+    render_live_price(data, region, _render_price)
+
+    pe    = data.get("pe", "N/A")
+    pb    = data.get("pb", "N/A")
+    eps   = data.get("eps", "N/A")
+    bvps  = data.get("bvps", "N/A")
+    roe   = data.get("roe", "N/A")
+    roa   = data.get("roa", "N/A")
+    avg_pe = data.get("avg_pe", 0) or "N/A"
+    avg_pb = data.get("avg_pb", 0) or "N/A"
+    mc    = data.get("market_cap", "N/A")      # Tỷ đồng
+    vol   = data.get("volume", 0)
+    ls    = data.get("listed_shares", "N/A")
+    circ  = data.get("circulating", "N/A")
+    room  = data.get("foreign_room", "N/A")
+    fbuy  = data.get("foreign_buy", "N/A")
+    fsell = data.get("foreign_sell", "N/A")
 
     # ── BẢNG 2: Định giá (Fundamental) ───────────────────────────────────────
     st.markdown('<div class="section-header">💰 Chỉ số Định giá</div>', unsafe_allow_html=True)
@@ -282,7 +306,7 @@ def _render_stock_data(data: dict, region: str):
     missing = [k for k in ["pe","pb","eps"] if data.get(k) in ("N/A", None)]
     if missing:
         with st.expander(f"ℹ️ Một số chỉ số chưa có: {', '.join(missing)}"):
-            errs = {**data.get("_fund_errors",{}), **{"ssi": data.get("_ssi_error","")}}
+            errs = {"ssi": data.get("_ssi_error",""), **data.get("_fund_errors",{})}
             errs = {k:v for k,v in errs.items() if v}
             if errs:
                 st.code("\n".join(f"{k}: {v}" for k,v in errs.items()), language="text")
@@ -291,9 +315,11 @@ def _render_stock_data(data: dict, region: str):
 
 # ── Routing ───────────────────────────────────────────────────────────────────
 if triggered and user_input:
-    if classify(user_input) == "ticker":
-        ticker = user_input.upper().split()[0]
+    kind, ticker = query_router.route(user_input)
+    query_router.log_query(user_input, kind)
+    if kind == "ticker":
         region = st.session_state["market_region"]
+        cache_warmer.record_access(ticker, region)
 
         with st.spinner(f"📡 Đang tải đầy đủ dữ liệu {ticker}..."):
             data = get_stock_data(ticker, region=region)
@@ -301,6 +327,7 @@ if triggered and user_input:
         if "error" in data:
             st.error(f"❌ {data['error']}")
         else:
+            query_router.add_symbol(ticker)
             _render_stock_data(data, region)
 
             st.divider()
@@ -0,0 +1,179 @@
+"""
+benchmarks/bench_chart.py — Kích thước JSON + thời gian dựng figure biểu đồ
+
+So sánh cách vẽ cũ (mọi nến ngày, go.Scatter, vol_colors bằng iterrows) với
+build_figure(fast=True) (gộp nến tuần/tháng, LTTB) trên dữ liệu giả lập,
+không cần mạng. Mặc định đo phía Python (dựng figure, to_json, kích thước JSON).
+
+--render đo thêm thời gian render thật của Plotly.js trong Chromium headless
+(Chromium đóng gói sẵn trong kaleido 0.2.x — `pip install kaleido==0.2.1`,
+hoặc KALEIDO_BIN=đường dẫn tới executable/kaleido): mỗi lần = gửi JSON →
+Plotly.newPlot → xuất PNG, trừ đi thời gian của 1 figure rỗng. Chromium
+headless vẽ WebGL bằng phần mềm (SwiftShader) → Scattergl ở đây chậm hơn
+trên máy có GPU, nhưng chi phí khởi tạo WebGL là có thật ở cả hai.
+
+    python benchmarks/bench_chart.py
+    python benchmarks/bench_chart.py --render
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np                                       # noqa: E402
+import pandas as pd                                      # noqa: E402
+import plotly.graph_objects as go                        # noqa: E402
+from plotly.subplots import make_subplots                # noqa: E402
+
+from components.chart_ui import build_figure, point_budget   # noqa: E402
+
+
+def synthetic_ohlcv(n_days: int, seed: int = 0) -> pd.DataFrame:
+    rng   = np.random.default_rng(seed)
+    idx   = pd.bdate_range(end="2026-10-16", periods=n_days)
+    close = 50_000 * np.exp(np.cumsum(rng.normal(0, 0.015, n_days)))
+    open_ = close * (1 + rng.normal(0, 0.005, n_days))
+    high  = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n_days))
+    low   = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n_days))
+    vol   = rng.integers(100_000, 5_000_000, n_days).astype(float)
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low,
+                         "Close": close, "Volume": vol}, index=idx)
+
+
+def legacy_figure(df: pd.DataFrame, ticker: str) -> go.Figure:
+    """Bản sao nguyên văn cách vẽ trước khi có build_figure (để so sánh)."""
+    df = df.copy()
+    df['SMA20'] = df['Close'].rolling(20).mean()
+    df['SMA50'] = df['Close'].rolling(50).mean()
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True,
+                        vertical_spacing=0.03, row_heights=[0.78, 0.22])
+    fig.add_trace(go.Candlestick(
+        x=df.index, open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'],
+        name=ticker,
+        increasing_line_color='#26a69a', decreasing_line_color='#ef5350',
+        increasing_fillcolor='#26a69a',  decreasing_fillcolor='#ef5350',
+    ), row=1, col=1)
+    fig.add_trace(go.Scatter(x=df.index, y=df['SMA20'], name='SMA 20', mode='lines',
+                             line=dict(color='#F4A261', width=1.3)), row=1, col=1)
+    fig.add_trace(go.Scatter(x=df.index, y=df['SMA50'], name='SMA 50', mode='lines',
+                             line=dict(color='#4FC3F7', width=1.3)), row=1, col=1)
+    vol_colors = []
+    for _, row in df.iterrows():
+        if row['Close'] >= row['Open']:
+            vol_colors.append('#26a69a')
+        else:
+            vol_colors.append('#ef5350')
+    fig.add_trace(go.Bar(x=df.index, y=df['Volume'], name='KL', marker_color=vol_colors,
+                         marker_line_width=0, opacity=0.7), row=2, col=1)
+    fig.update_layout(
+        height=750, margin=dict(l=0, r=0, t=20, b=0), template="plotly_dark",
+        paper_bgcolor="#121212", plot_bgcolor="#121212",
+        legend=dict(orientation="h", yanchor="bottom", y=1.01, xanchor="right", x=1,
+                    bgcolor="rgba(0,0,0,0)", font=dict(size=11)),
+        hovermode='x unified', xaxis_rangeslider_visible=False,
+    )
+    grid = dict(showgrid=True, gridcolor='#2a2a2a', gridwidth=1)
+    fig.update_xaxes(**grid)
+    fig.update_yaxes(**grid, side='right')
+    fig.update_yaxes(title_text="Giá", row=1, col=1)
+    fig.update_yaxes(title_text="KL",  row=2, col=1)
+    return fig
+
+
+def _measure(fn, repeat=5):
+    best_build = best_json = float("inf")
+    size = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fig = fn()
+        t1 = time.perf_counter(); js = fig.to_json()
+        t2 = time.perf_counter()
+        best_build = min(best_build, t1 - t0)
+        best_json  = min(best_json, t2 - t1)
+        size = len(js)
+    return best_build * 1000, best_json * 1000, size
+
+
+def _kaleido_bin():
+    if os.environ.get("KALEIDO_BIN"):
+        return os.environ["KALEIDO_BIN"]
+    try:
+        import kaleido
+    except ImportError:
+        return None
+    exe = os.path.join(os.path.dirname(kaleido.__file__), "executable", "kaleido")
+    return exe if os.path.exists(exe) else None
+
+
+class HeadlessRenderer:
+    """1 tiến trình Chromium headless (kaleido 0.2.x) nhận figure JSON qua stdin."""
+
+    def __init__(self, exe: str, width: int = 1400, height: int = 750):
+        import plotly
+        plotly_js = os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js")
+        self.size = (width, height)
+        self._p = subprocess.Popen(
+            [exe, "plotly", f"--plotlyjs={plotly_js}", "--disable-gpu", "--single-process",
+             "--no-sandbox"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        json.loads(self._p.stdout.readline())                  # {"code": 0, "message": "Success"}
+        self._base = 0.0
+        self._base = self.median_ms(go.Figure())
+
+    def _once(self, fig_json: str) -> float:
+        w, h = self.size
+        req = f'{{"data": {fig_json}, "format": "png", "width": {w}, "height": {h}, "scale": 1}}\n'
+        t0 = time.perf_counter()
+        self._p.stdin.write(req)
+        self._p.stdin.flush()
+        r = json.loads(self._p.stdout.readline())
+        if r.get("code"):
+            raise RuntimeError(r.get("message"))
+        return (time.perf_counter() - t0) * 1000
+
+    def median_ms(self, fig, repeat: int = 7) -> float:
+        js = fig.to_json()
+        self._once(js)                                         # làm nóng
+        return statistics.median(self._once(js) for _ in range(repeat)) - self._base
+
+    def close(self):
+        self._p.stdin.close()
+        self._p.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--render", action="store_true",
+                    help="đo render Plotly.js trong Chromium headless (cần kaleido 0.2.x)")
+    args = ap.parse_args()
+
+    renderer = None
+    if args.render:
+        exe = _kaleido_bin()
+        if not exe:
+            sys.exit("--render cần kaleido 0.2.x (pip install kaleido==0.2.1) hoặc KALEIDO_BIN")
+        renderer = HeadlessRenderer(exe)
+
+    budget = point_budget()
+    print(f"point budget = {budget}")
+    print(f"{'khung':<6} {'mode':<7} {'build ms':>9} {'to_json ms':>11} {'JSON KB':>9}"
+          + (f"{'render ms':>11}" if renderer else ""))
+    for label, n in (("1y", 250), ("2y", 500), ("5y", 1250)):
+        df = synthetic_ohlcv(n)
+        for mode, fn in (("legacy", lambda: legacy_figure(df, "FPT")),
+                         ("fast",   lambda: build_figure(df, "FPT", point_budget=budget))):
+            b, j, size = _measure(fn)
+            line = f"{label:<6} {mode:<7} {b:9.1f} {j:11.1f} {size/1024:9.1f}"
+            if renderer:
+                line += f"{renderer.median_ms(fn()):11.0f}"
+            print(line)
+    if renderer:
+        renderer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+benchmarks/bench_http_pool.py — So sánh requests.get một lần vs core.http_pool
+
+Dựng 1 HTTP server giả trên localhost (HTTP/1.1, keep-alive), trả JSON giống
+TCBS overview. Mỗi kết nối TCP MỚI bị trễ `--handshake-ms` để mô phỏng chi
+phí bắt tay TCP+TLS tới server VN (localhost gần như 0ms nên không thấy).
+
+    python benchmarks/bench_http_pool.py
+    python benchmarks/bench_http_pool.py -n 500 --handshake-ms 0
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests                      # noqa: E402
+from core import http_pool           # noqa: E402
+
+BODY = json.dumps({"pe": 18.2, "pb": 3.1, "eps": 4520, "bvps": 26500,
+                   "roe": 24.1, "roa": 9.8, "industryName": "Công nghệ",
+                   "exchange": "HSX", "outstandingShare": 1_270_000_000}).encode()
+
+
+def _make_handler(handshake_s: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # header và body ghi 2 lần → tắt Nagle, tránh trễ 40ms do delayed-ACK
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            if handshake_s:
+                time.sleep(handshake_s)
+            super().setup()
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+        def log_message(self, *a):
+            pass
+    return Handler
+
+
+def _bench(fn, url, n):
+    lat = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        r = fn(url, timeout=5)
+        r.content
+        lat.append((time.perf_counter() - t0) * 1000)
+    return lat
+
+
+def _row(name, lat):
+    lat = sorted(lat)
+    p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+    return f"{name:<18} mean={statistics.mean(lat):7.3f}ms  p50={statistics.median(lat):7.3f}ms  p99={p99:7.3f}ms"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=200, help="số request mỗi chế độ")
+    ap.add_argument("--handshake-ms", type=float, default=20.0,
+                    help="độ trễ giả lập cho mỗi kết nối TCP mới")
+    a = ap.parse_args()
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(a.handshake_ms / 1000))
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{srv.server_address[1]}/tcanalysis/v1/ticker/FPT/overview"
+
+    try:
+        _bench(http_pool.get, url, 5)          # warm-up: mở kết nối đầu tiên
+        oneoff = _bench(requests.get, url, a.n)
+        pooled = _bench(http_pool.get, url, a.n)
+    finally:
+        http_pool.close_all()
+        srv.shutdown()
+
+    print(f"n={a.n}  handshake={a.handshake_ms}ms")
+    print(_row("requests.get", oneoff))
+    print(_row("http_pool.get", pooled))
+    print(f"speed-up (mean)    {statistics.mean(oneoff) / statistics.mean(pooled):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
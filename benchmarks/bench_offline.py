@@ -0,0 +1,153 @@
+"""
+benchmarks/bench_offline.py — Benchmark các đường nóng, không cần mạng
+
+Mọi lời gọi yfinance / API VN / Gemini được thay bằng fixture
+(benchmarks/fakes.py) → chạy được trên máy không có mạng, số liệu so được
+giữa các commit. Fixture đi kèm repo là dữ liệu tổng hợp (fixtures/
+provenance.json) — bench in ra fixture nào chưa được ghi thật. Đo:
+
+  stock_cold / stock_us_cold   get_stock_data, mọi cache trống
+  stock_vn_apis_down           get_stock_data lúc vừa khởi động, API VN treo
+                               tới timeout (chạy từ IP bị chặn)
+  stock_shared_hit             get_stock_data, chỉ còn backend chung
+  stock_hit                    get_stock_data, trúng st.cache_data
+  chart_cold / chart_hit       _fetch_chart_data + build_figure
+  prompt                       _build_ticker_prompt
+  classify                     query_router.classify_batch (bộ câu bench_router)
+  ai_cold / ai_hit             stream_ai_analysis (Gemini giả) / trúng ai_cache
+
+    python benchmarks/bench_offline.py
+    python benchmarks/bench_offline.py -n 50 --json out.json
+    python benchmarks/bench_offline.py --compare base.json     # so với lần trước
+    python benchmarks/bench_offline.py --latency-scale 0.1     # thêm độ trễ giả
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(_HERE))
+sys.path.insert(0, _HERE)
+
+import fakes                                                    # noqa: E402
+from bench_router import CORPUS                                 # noqa: E402
+from core import circuit_breaker, data_fetcher, query_router   # noqa: E402
+from core.ai_engine import _build_ticker_prompt, stream_ai_analysis   # noqa: E402
+from core.cache_backend import MemoryBackend, set_default      # noqa: E402
+from core.data_fetcher import get_stock_data                    # noqa: E402
+from components.chart_ui import _fetch_chart_data, build_figure, point_budget   # noqa: E402
+
+for _name in list(logging.root.manager.loggerDict):
+    if _name.startswith("streamlit"):
+        logging.getLogger(_name).setLevel(logging.ERROR)
+
+
+def _chart(ticker):
+    df = _fetch_chart_data(ticker, "VN", "1y")
+    return build_figure(df, ticker, point_budget=point_budget())
+
+
+def _ai():
+    return "".join(stream_ai_analysis("FPT", model_name=fakes.BENCH_MODEL,
+                                      stock_data=_STOCK))
+
+
+def _clear_shared():
+    set_default(MemoryBackend())
+
+
+def _fresh_process():
+    """Cache trống + registry nguồn / breaker như vừa khởi động."""
+    fakes.clear_caches()
+    data_fetcher._PROVIDERS.reset()
+    circuit_breaker.reset_all()
+
+
+def _stock_vn_apis_down():
+    with fakes.apis_down():
+        return get_stock_data("FPT", "VN")
+
+
+_STOCK = {}
+_TEXTS = [q for q, _ in CORPUS]
+
+# tên → (chuẩn bị trước mỗi lần đo, hàm đo, số thao tác mỗi lần đo)
+CASES = {
+    "stock_cold":       (fakes.clear_caches, lambda: get_stock_data("FPT", "VN"), 1),
+    "stock_us_cold":    (fakes.clear_caches, lambda: get_stock_data("AAPL", "US"), 1),
+    "stock_vn_apis_down": (_fresh_process, _stock_vn_apis_down, 1),
+    "stock_shared_hit": (lambda: __import__("streamlit").cache_data.clear(),
+                         lambda: get_stock_data("FPT", "VN"), 1),
+    "stock_hit":        (None, lambda: get_stock_data("FPT", "VN"), 1),
+    "chart_cold":       (fakes.clear_caches, lambda: _chart("FPT"), 1),
+    "chart_hit":        (None, lambda: _chart("FPT"), 1),
+    "prompt":           (None, lambda: _build_ticker_prompt("FPT", "Tiếng Việt", "", _STOCK), 1),
+    "classify":         (None, lambda: query_router.classify_batch(_TEXTS), len(_TEXTS)),
+    "ai_cold":          (_clear_shared, _ai, 1),
+    "ai_hit":           (None, _ai, 1),
+}
+
+
+def run_case(name, n, calls):
+    prepare, fn, ops = CASES[name]
+    if prepare: prepare()
+    fn()                                     # lượt làm nóng (và lấp cache cho *_hit)
+    lat, before = [], sum(calls.values())
+    for _ in range(n):
+        if prepare: prepare()
+        t0 = time.perf_counter()
+        fn()
+        lat.append((time.perf_counter() - t0) * 1000 / ops)
+    lat.sort()
+    return {
+        "median_ms": round(statistics.median(lat), 4),
+        "p90_ms":    round(lat[int(0.9 * (len(lat) - 1))], 4),
+        "min_ms":    round(lat[0], 4),
+        "net_calls": round((sum(calls.values()) - before) / n, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=20, help="số lần đo mỗi case")
+    ap.add_argument("--latency-scale", type=float, default=0.0,
+                    help="nhân độ trễ fixtures/latency.json (0 = chỉ CPU)")
+    ap.add_argument("--only", nargs="*", choices=list(CASES), help="chỉ chạy các case này")
+    ap.add_argument("--json", help="ghi kết quả ra file")
+    ap.add_argument("--compare", help="file --json của lần chạy trước để so sánh")
+    args = ap.parse_args()
+
+    base = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)["results"]
+
+    results, fx = {}, fakes.Fixtures()
+    synthetic = fx.synthetic()
+    if synthetic:
+        print(f"⚠️  fixture tổng hợp (chưa ghi thật): {', '.join(synthetic)}")
+    with fakes.offline(latency_scale=args.latency_scale, fixtures=fx) as calls:
+        fakes.clear_caches()
+        _STOCK.update(get_stock_data("FPT", "VN"))
+        print(f"{'case':20}{'median ms':>12}{'p90 ms':>11}{'min ms':>11}{'net/op':>8}"
+              + (f"{'Δ median':>11}" if base else ""))
+        for name in args.only or CASES:
+            r = results[name] = run_case(name, args.n, calls)
+            line = (f"{name:20}{r['median_ms']:12.3f}{r['p90_ms']:11.3f}"
+                    f"{r['min_ms']:11.3f}{r['net_calls']:8.1f}")
+            if name in base and base[name]["median_ms"]:
+                line += f"{(r['median_ms'] / base[name]['median_ms'] - 1):+11.1%}"
+            print(line)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"n": args.n, "latency_scale": args.latency_scale,
+                       "synthetic_fixtures": synthetic, "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+benchmarks/bench_router.py — Tốc độ + độ chính xác phân loại câu nhập
+
+So sánh app.classify cũ (vòng `kw in text` + heuristic độ dài) với
+core.query_router (1 regex đã biên dịch + tập mã đã biết). Không cần mạng.
+
+Bộ câu:
+  --corpus file.jsonl   câu nhập thật: log của LBCK_QUERY_LOG (query_router.log_query)
+                        đã thêm tay trường "label" ("ticker" / "general");
+                        dòng chưa có label bị bỏ qua
+  mặc định              CORPUS dưới đây — VIẾT TAY, thiên về các ca router
+                        sửa (mã + từ khoá, fed/fedex) → độ chính xác trên bộ
+                        này không đại diện cho lưu lượng thật
+
+Kết quả ở số từ khoá hiện tại (~40): router đúng hơn nhưng CHẬM hơn bản cũ
+(~0.7–0.8×: regex + tách token đắt hơn 40 lần `in`); router chỉ nhanh hơn
+khi danh sách từ khoá dài ra (dòng cuối, ×10 từ khoá).
+
+    python benchmarks/bench_router.py
+    python benchmarks/bench_router.py --corpus queries_labelled.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.query_router import GENERAL_KEYWORDS, Router   # noqa: E402
+
+# (câu nhập, nhãn đúng) — viết tay, xem docstring
+CORPUS = [
+    ("FPT", "ticker"), ("fpt", "ticker"), ("VNM", "ticker"), ("HPG", "ticker"),
+    ("MBB", "ticker"), ("GAS", "ticker"), ("VCB", "ticker"), ("SSI", "ticker"),
+    ("AAPL", "ticker"), ("NVDA", "ticker"), ("TSLA", "ticker"), ("VND", "ticker"),
+    ("FPT VNM", "ticker"), ("hpg mwg", "ticker"), ("DGC", "ticker"), ("PVD", "ticker"),
+    ("HPG rủi ro", "ticker"), ("VCB có gì", "ticker"), ("FPT hôm nay", "ticker"),
+    ("MWG thế nào", "ticker"), ("PLX dầu", "ticker"), ("PNJ vàng", "ticker"),
+    ("VIC ra sao", "ticker"), ("SSI nhận định", "ticker"),
+    ("Thị trường hôm nay thế nào", "general"),
+    ("Nhận định VN-Index tuần này", "general"),
+    ("lãi suất NHNN tháng này ra sao", "general"),
+    ("Fed tăng lãi suất ảnh hưởng gì", "general"),
+    ("có nên mua cổ phiếu ngân hàng không", "general"),
+    ("cổ phiếu nào tốt để đầu tư dài hạn", "general"),
+    ("giá vàng hôm nay", "general"),
+    ("giá dầu tăng thì ngành nào hưởng lợi", "general"),
+    ("lạm phát Mỹ tháng 9", "general"),
+    ("chiến lược đầu tư cuối năm", "general"),
+    ("gợi ý danh mục cho người mới", "general"),
+    ("market outlook next week", "general"),
+    ("what is the fed doing", "general"),
+    ("interest rate cut impact on banks", "general"),
+    ("recommend some stocks", "general"),
+    ("tổng quan thị trường chứng khoán", "general"),
+    ("diễn biến khối ngoại tuần qua", "general"),
+    ("xu hướng dòng tiền", "general"),
+    ("rủi ro margin hiện nay", "general"),
+    ("cơ hội đầu tư bất động sản", "general"),
+    ("sự kiện đặc biệt tháng 10", "general"),
+    ("hàng hóa thế giới biến động", "general"),
+    ("GDP quý 3 tăng bao nhiêu", "general"),
+    ("kinh tế vĩ mô việt nam 2026", "general"),
+    ("nên bán chứng khoán lúc này không", "general"),
+    ("portfolio rebalancing strategy", "general"),
+    ("tại sao VN-Index giảm mạnh", "general"),
+    ("ngành thép có triển vọng không", "general"),
+    ("so sánh FPT và CMG về tăng trưởng", "general"),
+    ("khi nào nên cắt lỗ", "general"),
+    ("FedEx earnings", "general"),
+    ("GDPR compliance cost for banks", "general"),
+]
+
+
+def legacy_classify(text):
+    """Bản sao nguyên văn app.classify trước khi có query_router."""
+    _GKW = GENERAL_KEYWORDS
+    if not text: return "general"
+    tl = text.lower().strip(); ws = tl.split()
+    for kw in _GKW:
+        if kw in tl: return "general"
+    if len(ws)==1 and len(ws[0])<=6 and ws[0].isalnum(): return "ticker"
+    if len(ws)==2 and all(len(w)<=6 and w.isalnum() for w in ws): return "ticker"
+    return "general"
+
+
+def _measure(fn, texts, rounds=200):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn(texts)
+    dt = time.perf_counter() - t0
+    return rounds * len(texts) / dt
+
+
+def load_corpus(path: str) -> list:
+    """[(câu, nhãn)] từ JSONL {"q": ..., "label": ...}; bỏ dòng chưa gán nhãn."""
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line) if line.strip() else {}
+            if row.get("label") in ("ticker", "general"):
+                out.append((row["q"], row["label"]))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", help="JSONL câu nhập thật đã gán nhãn")
+    args = ap.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else CORPUS
+    print(f"Bộ câu: {args.corpus or 'CORPUS viết tay (không phải câu nhập thật)'}"
+          f" — {len(corpus)} câu\n")
+    router = Router()
+    texts  = [q for q, _ in corpus]
+    labels = [y for _, y in corpus]
+
+    legacy_out = [legacy_classify(t) for t in texts]
+    router_out = router.classify_batch(texts)
+
+    print(f"{'':10}{'acc':>8}{'queries/s':>14}")
+    qps = {}
+    for name, out, fn in [
+        ("legacy", legacy_out, lambda ts: [legacy_classify(t) for t in ts]),
+        ("router", router_out, router.classify_batch),
+    ]:
+        acc = sum(o == y for o, y in zip(out, labels)) / len(labels)
+        qps[name] = _measure(fn, texts)
+        print(f"{name:10}{acc:8.1%}{qps[name]:14,.0f}")
+    print(f"{len(GENERAL_KEYWORDS)} từ khoá (hiện tại): router = "
+          f"{qps['router'] / qps['legacy']:.2f}× tốc độ bản cũ")
+
+    diff = [(t, y, lo, ro) for t, y, lo, ro in zip(texts, labels, legacy_out, router_out) if lo != ro]
+    if diff:
+        print("\nKhác nhau (câu | nhãn | cũ | mới):")
+        for t, y, lo, ro in diff:
+            print(f"  {t!r:45} {y:8} {lo:8} {ro:8}")
+
+    # Chi phí theo số từ khoá: nhân danh sách lên 10 lần
+    big = GENERAL_KEYWORDS + [f"{k} {i}" for i in range(9) for k in GENERAL_KEYWORDS]
+    big_router = Router(keywords=big)
+    def big_legacy(ts):
+        for t in ts:
+            tl = t.lower()
+            any(kw in tl for kw in big)
+    print(f"\n{len(big)} từ khoá: legacy {_measure(big_legacy, texts, 50):,.0f} q/s"
+          f" | router {_measure(big_router.classify_batch, texts, 50):,.0f} q/s")
+
+
+if __name__ == "__main__":
+    main()
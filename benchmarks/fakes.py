@@ -0,0 +1,316 @@
+"""
+benchmarks/fakes.py — Thay mạng bằng fixture cho benchmark offline
+
+Thay thế trong process (monkeypatch, gỡ được):
+  yfinance.Ticker / yfinance.download   ← fixtures/<mã>.json, <mã>_5y.csv
+  core.http_pool.get                    ← fixtures/{vndirect,tcbs,ssi}_<mã>.json
+  core.genai_pool.get_pool              ← client giả stream fixtures/gemini_<mã>.md
+  core.cache_backend / core.ohlcv_store ← bộ nhớ + SQLite trong thư mục tạm
+
+Độ trễ giả lấy từ fixtures/latency.json nhân với `latency_scale`
+(0 = chỉ đo CPU — số liệu ổn định nhất để so giữa các commit).
+Mã không có fixture → Yahoo trả rỗng, API VN trả 404 (như mã gõ sai).
+apis_down() → API VN treo tới timeout rồi lỗi (latency "api_timeout").
+
+    with fakes.offline(latency_scale=0.0) as calls:
+        get_stock_data("FPT")
+    print(calls)        # số lần "gọi mạng" theo nguồn
+
+Fixture hiện có là dữ liệu TỔNG HỢP (đúng định dạng, không phải giá / chỉ
+số thật — xem fixtures/provenance.json): số đo phản ánh chi phí CPU theo
+kích thước dữ liệu, không phản ánh hành vi trên dữ liệu thị trường thật.
+Thay bằng bản ghi thật (cần mạng): python benchmarks/record_fixtures.py FPT.VN AAPL
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from io import StringIO
+
+import pandas as pd
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+CHUNK_CHARS = 200          # Gemini stream trả các đoạn vài trăm ký tự
+
+
+def _read_json(name: str):
+    path = os.path.join(FIXTURES, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _frame(split: dict) -> pd.DataFrame:
+    return pd.read_json(StringIO(json.dumps(split)), orient="split")
+
+
+def _anchor(df: pd.DataFrame, today=None) -> pd.DataFrame:
+    """Dời chuỗi nến để nến cuối = ngày làm việc gần nhất → khung 1y/5y luôn đủ nến."""
+    if df.empty:
+        return df
+    end = pd.Timestamp(today or pd.Timestamp.today().normalize())
+    idx = pd.bdate_range(end=end, periods=len(df))
+    out = df.copy()
+    out.index = idx
+    out.index.name = "Date"
+    return out
+
+
+class Fixtures:
+    """Nạp lười, giữ trong bộ nhớ — đọc đĩa không tính vào thời gian đo."""
+
+    def __init__(self):
+        self._stock, self._bars, self._api, self._replies = {}, {}, {}, {}
+        self.latency = {k: v for k, v in (_read_json("latency.json") or {}).items()
+                        if not k.startswith("_")}
+        self.provenance = {k: v for k, v in (_read_json("provenance.json") or {}).items()
+                           if not k.startswith("_")}
+
+    def synthetic(self) -> list:
+        """Các fixture chưa được ghi từ mạng thật."""
+        return sorted(k for k, v in self.provenance.items() if not v.startswith("recorded"))
+
+    def stock(self, symbol: str) -> dict:
+        if symbol not in self._stock:
+            doc = _read_json(f"{symbol}.json")
+            if doc is not None:
+                for k in ("history_5d", "income_stmt", "balance_sheet"):
+                    doc[k] = _frame(doc[k])
+                doc["history_5d"] = _anchor(doc["history_5d"])
+            self._stock[symbol] = doc
+        return self._stock[symbol]
+
+    def bars(self, symbol: str) -> pd.DataFrame:
+        if symbol not in self._bars:
+            path = os.path.join(FIXTURES, f"{symbol}_5y.csv")
+            df = (pd.read_csv(path, index_col="Date", parse_dates=True)
+                  if os.path.exists(path) else pd.DataFrame())
+            self._bars[symbol] = _anchor(df)
+        return self._bars[symbol]
+
+    def api(self, source: str, ticker: str):
+        key = (source, ticker)
+        if key not in self._api:
+            self._api[key] = _read_json(f"{source}_{ticker}.json")
+        return self._api[key]
+
+    def reply(self, ticker: str) -> str:
+        if ticker not in self._replies:
+            path = os.path.join(FIXTURES, f"gemini_{ticker}.md")
+            if not os.path.exists(path):
+                path = os.path.join(FIXTURES, "gemini_FPT.md")
+            with open(path, encoding="utf-8") as f:
+                self._replies[ticker] = f.read()
+        return self._replies[ticker]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  ĐỐI TƯỢNG GIẢ
+# ══════════════════════════════════════════════════════════════════════════════
+class _Net:
+    """Đếm lượt gọi + ngủ theo độ trễ fixture."""
+
+    def __init__(self, fx: Fixtures, scale: float):
+        self.fx, self.scale, self.calls = fx, scale, Counter()
+        self.down = set()
+
+    def hit(self, source: str):
+        self.calls[source] += 1
+        ms = self.fx.latency.get(source, 0) * self.scale
+        if ms:
+            time.sleep(ms / 1000)
+
+
+class _FastInfo:
+    def __init__(self, shares):
+        self.shares = shares
+
+
+def _ticker_cls(net: _Net):
+    class FakeTicker:
+        def __init__(self, symbol, session=None):
+            self.ticker = symbol
+            self._doc   = net.fx.stock(symbol)
+
+        def history(self, period="1mo", **kw):
+            net.hit("yf_history")
+            return self._doc["history_5d"].copy() if self._doc else pd.DataFrame()
+
+        @property
+        def info(self):
+            net.hit("yf_info")
+            return dict(self._doc["info"]) if self._doc else {}
+
+        @property
+        def fast_info(self):
+            net.hit("yf_fast_info")
+            return _FastInfo(self._doc["fast_info"]["shares"] if self._doc else None)
+
+        @property
+        def income_stmt(self):
+            net.hit("yf_income_stmt")
+            return self._doc["income_stmt"].copy() if self._doc else pd.DataFrame()
+
+        @property
+        def balance_sheet(self):
+            net.hit("yf_balance_sheet")
+            return self._doc["balance_sheet"].copy() if self._doc else pd.DataFrame()
+    return FakeTicker
+
+
+def _download_fn(net: _Net):
+    def one(symbol, start, end, period):
+        df = net.fx.bars(symbol)
+        if df.empty:
+            return df
+        if period and period.endswith("d"):
+            return df.tail(int(period[:-1])).copy()
+        lo = pd.Timestamp(start) if start else df.index[0]
+        hi = pd.Timestamp(end) if end else df.index[-1] + pd.Timedelta(days=1)
+        return df[(df.index >= lo) & (df.index < hi)].copy()
+
+    def download(symbol, start=None, end=None, period=None, **kw):
+        net.hit("yf_download")
+        if isinstance(symbol, str):
+            return one(symbol, start, end, period)
+        # nhiều mã + group_by="ticker" → cột MultiIndex (mã, trường); mã không có bị bỏ
+        frames = {s: one(s, start, end, period) for s in symbol}
+        frames = {s: f for s, f in frames.items() if not f.empty}
+        return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+    return download
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.status_code = 200 if payload is not None else 404
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+    @property
+    def content(self):
+        return json.dumps(self._payload).encode()
+
+
+_API_TICKER = [
+    ("vndirect", "finfo-api.vndirect.com.vn", re.compile(r"code:([A-Z0-9]+)")),
+    ("tcbs",     "apipubaws.tcbs.com.vn",     re.compile(r"/ticker/([A-Z0-9]+)/")),
+    ("ssi",      "iboard-query.ssi.com.vn",   None),
+]
+
+
+def _http_get_fn(net: _Net):
+    def get(url, params=None, **kw):
+        for source, host, rx in _API_TICKER:
+            if host in url:
+                if source in net.down:
+                    net.hit("api_timeout")
+                    raise ConnectionError(f"offline: {host} không phản hồi")
+                net.hit(source)
+                m = rx.search(url) if rx else None
+                ticker = m.group(1) if m else (params or {}).get("symbol", "")
+                return FakeResponse(net.fx.api(source, ticker))
+        raise ConnectionError(f"offline: {url}")
+    return get
+
+
+class _Chunk:
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenaiClient:
+    """genai.Client giả: models.generate_content_stream trả reply fixture theo đoạn."""
+
+    def __init__(self, net: _Net):
+        self.models = self
+        self._net = net
+
+    def generate_content_stream(self, model, contents, config=None):
+        m = re.search(r"\*\*([A-Z0-9]{2,6})\*\*", str(contents))
+        text = self._net.fx.reply(m.group(1) if m else "")
+
+        def gen():
+            self._net.hit("gemini_first_chunk")
+            for i in range(0, len(text), CHUNK_CHARS):
+                if i:
+                    self._net.hit("gemini_chunk")
+                yield _Chunk(text[i:i + CHUNK_CHARS])
+        return gen()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CÀI / GỠ
+# ══════════════════════════════════════════════════════════════════════════════
+BENCH_MODEL = "bench-flash"
+_ACTIVE = []               # _Net của offline() đang chạy
+
+
+def _patch(obj, name, value, undo):
+    undo.append((obj, name, getattr(obj, name)))
+    setattr(obj, name, value)
+
+
+@contextmanager
+def offline(latency_scale: float = 0.0, fixtures: Fixtures = None):
+    """
+    Cài toàn bộ fake; yield Counter số lượt gọi theo nguồn. Cache dùng bộ nhớ
+    + SQLite tạm → lần chạy sau không ăn cache của lần trước.
+    """
+    import yfinance as yf
+    from core import ai_engine, cache_backend, genai_pool, http_pool, ohlcv_store, rate_limiter
+
+    net  = _Net(fixtures or Fixtures(), latency_scale)
+    tmp  = tempfile.mkdtemp(prefix="lbck_bench_")
+    pool = genai_pool.ClientPool(["bench-key"], client_factory=lambda k: FakeGenaiClient(net))
+    undo = []
+    try:
+        _patch(yf, "Ticker", _ticker_cls(net), undo)
+        _patch(yf, "download", _download_fn(net), undo)
+        _patch(http_pool, "get", _http_get_fn(net), undo)
+        _patch(genai_pool, "get_pool", lambda: pool, undo)
+        _patch(ai_engine, "HAS_GENAI", True, undo)
+        _patch(ohlcv_store, "DB_PATH", os.path.join(tmp, "ohlcv.sqlite"), undo)
+        _patch(ohlcv_store, "_init_done", False, undo)
+        _patch(cache_backend, "_default", cache_backend.MemoryBackend(), undo)
+        rate_limiter.MODEL_LIMITS[BENCH_MODEL] = (10**6, 10**9)
+        _ACTIVE.append(net)
+        yield net.calls
+    finally:
+        _ACTIVE.remove(net)
+        for obj, name, old in reversed(undo):
+            setattr(obj, name, old)
+        rate_limiter.MODEL_LIMITS.pop(BENCH_MODEL, None)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+@contextmanager
+def apis_down(*sources):
+    """API VN (mặc định cả 3) chờ hết timeout rồi lỗi — như chạy từ IP bị chặn."""
+    net = _ACTIVE[-1]
+    down = set(sources or (s for s, _, _ in _API_TICKER))
+    net.down |= down
+    try:
+        yield
+    finally:
+        net.down -= down
+
+
+def clear_caches():
+    """Xoá mọi lớp cache (st.cache_data, backend chung, kho nến) → đo đường cold."""
+    import streamlit as st
+    from core import cache_backend, ohlcv_store
+    st.cache_data.clear()
+    cache_backend.set_default(cache_backend.MemoryBackend())
+    for ext in ("", "-wal", "-shm"):
+        if os.path.exists(ohlcv_store.DB_PATH + ext):
+            os.remove(ohlcv_store.DB_PATH + ext)
+    ohlcv_store._init_done = False
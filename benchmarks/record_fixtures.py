@@ -0,0 +1,130 @@
+"""
+benchmarks/record_fixtures.py — Ghi lại fixture cho bench_offline.py từ mạng thật
+
+Cần mạng (và API key Gemini nếu ghi cả bài phân tích). Ghi đè các file trong
+benchmarks/fixtures/ theo đúng định dạng benchmarks/fakes.py đọc; đồng thời
+đo độ trễ thực tế từng nguồn → fixtures/latency.json, và đánh dấu
+"recorded <ngày>" trong fixtures/provenance.json (thay cho "synthetic").
+
+    python benchmarks/record_fixtures.py FPT.VN AAPL
+    GOOGLE_API_KEY=... python benchmarks/record_fixtures.py FPT.VN --gemini
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(_HERE))
+
+import yfinance as yf                     # noqa: E402
+from core import http_pool                # noqa: E402
+
+FIXTURES = os.path.join(_HERE, "fixtures")
+_API_URLS = {
+    "vndirect": ("https://finfo-api.vndirect.com.vn/v4/ratios/latest?filter=code:{t}"
+                 "&fields=pe,pb,eps,bvps,roe,roa,industryPe,industryPb,industryName,"
+                 "exchange,capitalisation,listedShare,foreignPercent", None),
+    "tcbs":     ("https://apipubaws.tcbs.com.vn/tcanalysis/v1/ticker/{t}/overview", None),
+    "ssi":      ("https://iboard-query.ssi.com.vn/v2/stock/full", "symbol"),
+}
+_RECORDED = []             # tên fixture đã ghi thật trong lần chạy này → provenance.json
+
+
+def _timed(lat, source, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    lat.setdefault(source, []).append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def _split(df):
+    return json.loads(df.to_json(orient="split", date_format="iso"))
+
+
+def _dump(name, obj):
+    with open(os.path.join(FIXTURES, name), "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=1, default=str)
+    _RECORDED.append(name.rsplit(".json", 1)[0])
+
+
+def record_symbol(symbol, lat):
+    t = yf.Ticker(symbol)
+    fi = _timed(lat, "yf_fast_info", lambda: t.fast_info)
+    doc = {
+        "symbol":        symbol,
+        "history_5d":    _split(_timed(lat, "yf_history", lambda: t.history(period="5d"))),
+        "info":          _timed(lat, "yf_info", lambda: t.info),
+        "fast_info":     {"shares": getattr(fi, "shares", None)},
+        "income_stmt":   _split(_timed(lat, "yf_income_stmt", lambda: t.income_stmt)),
+        "balance_sheet": _split(_timed(lat, "yf_balance_sheet", lambda: t.balance_sheet)),
+    }
+    _dump(f"{symbol}.json", doc)
+    bars = _timed(lat, "yf_download",
+                  lambda: yf.download(symbol, period="5y", progress=False, multi_level_index=False))
+    bars[["Open", "High", "Low", "Close", "Volume"]].to_csv(os.path.join(FIXTURES, f"{symbol}_5y.csv"))
+    _RECORDED.append(f"{symbol}_5y")
+
+    if symbol.endswith(".VN"):
+        ticker = symbol[:-3]
+        for source, (url, param) in _API_URLS.items():
+            try:
+                r = _timed(lat, source, lambda: http_pool.get(
+                    url.format(t=ticker), params={param: ticker} if param else None, timeout=5))
+                if r.status_code == 200:
+                    _dump(f"{source}_{ticker}.json", r.json())
+            except Exception as e:
+                print(f"  {source}: {e}")
+
+
+def record_gemini(symbol, lat):
+    from core import ai_engine, genai_pool
+    from core.data_fetcher import get_stock_data
+    ticker = symbol.split(".")[0]
+    region = "VN" if symbol.endswith(".VN") else "US"
+    pool = genai_pool.ClientPool([os.environ["GOOGLE_API_KEY"]])
+    prompt = ai_engine._build_ticker_prompt(ticker, "Tiếng Việt", "", get_stock_data(ticker, region))
+    kid, client = pool.pick("gemini-2.0-flash")
+    t0, first, parts = time.perf_counter(), None, []
+    for chunk in client.models.generate_content_stream(model="gemini-2.0-flash", contents=prompt):
+        if chunk.text:
+            if first is None:
+                first = (time.perf_counter() - t0) * 1000
+            parts.append(chunk.text)
+    total = (time.perf_counter() - t0) * 1000
+    lat.setdefault("gemini_first_chunk", []).append(first or total)
+    lat.setdefault("gemini_chunk", []).append((total - (first or total)) / max(1, len(parts) - 1))
+    with open(os.path.join(FIXTURES, f"gemini_{ticker}.md"), "w", encoding="utf-8") as f:
+        f.write("".join(parts))
+    _RECORDED.append(f"gemini_{ticker}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("symbols", nargs="+", help="mã Yahoo, vd FPT.VN AAPL")
+    ap.add_argument("--gemini", action="store_true", help="ghi cả bài phân tích (cần GOOGLE_API_KEY)")
+    args = ap.parse_args()
+
+    lat = {}
+    for symbol in args.symbols:
+        print(f"→ {symbol}")
+        record_symbol(symbol, lat)
+        if args.gemini:
+            record_gemini(symbol, lat)
+
+    path = os.path.join(FIXTURES, "latency.json")
+    with open(path, encoding="utf-8") as f:
+        profile = json.load(f)
+    profile.update({k: round(sorted(v)[len(v) // 2]) for k, v in lat.items()})
+    _dump("latency.json", profile)
+    print(json.dumps(profile, ensure_ascii=False, indent=1))
+
+    with open(os.path.join(FIXTURES, "provenance.json"), encoding="utf-8") as f:
+        prov = json.load(f)
+    prov.update({name: f"recorded {time.strftime('%Y-%m-%d')}" for name in _RECORDED})
+    _dump("provenance.json", prov)
+
+
+if __name__ == "__main__":
+    main()
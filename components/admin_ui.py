@@ -0,0 +1,53 @@
+"""
+components/admin_ui.py — Bảng quản trị: độ trễ từng bước lấy dữ liệu
+
+Chỉ hiện khi env LBCK_ADMIN=1 hoặc Streamlit Secrets có ADMIN = "1" — không
+bật qua URL (trang công khai, có nút xoá số liệu). Số liệu lấy từ
+core.latency (chỉ tính lần gọi mạng thật — cache hit không tạo span ở các
+lớp dữ liệu). Tải về dạng text Prometheus để đẩy vào hệ thống giám sát.
+Kèm bảng xếp hạng nguồn (core.providers) — thứ tự get_stock_data sẽ gọi.
+"""
+import os
+
+import pandas as pd
+import streamlit as st
+
+from core import latency
+from core.data_fetcher import provider_stats
+
+
+def admin_enabled() -> bool:
+    if os.environ.get("LBCK_ADMIN") == "1":
+        return True
+    try:
+        return str(st.secrets.get("ADMIN", "")) == "1"
+    except Exception:
+        return False
+
+
+def render_latency_panel():
+    rows = latency.stats()
+    with st.expander(f"⏱️ Độ trễ nguồn dữ liệu ({len(rows)} bước)"):
+        if not rows:
+            st.caption("Chưa có số liệu — tra cứu 1 mã để bắt đầu đo.")
+            return
+        df = pd.DataFrame(rows)
+        df["outcomes"] = df["outcomes"].map(
+            lambda d: ", ".join(f"{k} {v}" for k, v in sorted(d.items())))
+        st.dataframe(df.set_index("stage"), width="stretch")
+        c1, c2 = st.columns(2)
+        with c1:
+            st.download_button("⬇️ Prometheus", latency.prometheus_text(),
+                               file_name="lbck_metrics.prom", mime="text/plain",
+                               key="lat_prom")
+        with c2:
+            if st.button("🧹 Xoá số liệu", key="lat_reset"):
+                latency.reset()
+                st.rerun()
+
+
+def render_provider_panel():
+    with st.expander("🧭 Thứ tự nguồn dữ liệu"):
+        df = pd.DataFrame.from_dict(provider_stats(), orient="index")
+        st.dataframe(df, width="stretch")
+        st.caption("Điểm thấp = gọi trước. Điểm = (độ trễ + chi phí) / tỉ lệ thành công.")
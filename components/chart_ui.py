@@ -6,108 +6,164 @@
   ✅ Thay use_container_width=True → width='stretch' (Streamlit 1.54+ yêu cầu)
   ✅ Retry chống YFRateLimitError
   ✅ Candlestick + SMA 20/50 + Volume sub-chart
+  ✅ Nến lấy từ core.ohlcv_store — chỉ tải delta, không tải lại cả 5 năm
+  ✅ Tải 1 lần khung dài nhất, các khung ngắn hơn cắt trong bộ nhớ
+  ✅ Khung dài: gộp nến tuần/tháng + LTTB cho SMA theo ngân sách điểm
+  ✅ Đường line vẽ SVG; WebGL chỉ khi > WEBGL_MIN_POINTS điểm (đo render thật ở
+     benchmarks/bench_chart.py --render: Scattergl tốn ~0.9s khởi tạo WebGL,
+     chậm hơn SVG với vài trăm điểm sau LTTB)
+  ✅ Chỉ báo EMA / Bollinger / RSI / MACD / ATR / OBV (core.indicators)
+  ✅ Nhiều phiên cùng mở 1 mã lúc cache hết hạn → chỉ 1 lần đọc kho (singleflight)
+  ✅ Chuỗi nến lưu thêm ở backend chung (core.cache_backend) cho replica / restart
+  ✅ Span thời gian tải / dựng chart (core.latency)
+  ✅ Giá trực tiếp bật (components.live_quote_ui) → chart là fragment, nến cuối
+     vá từ quote đã hiển thị mỗi CHART_EVERY_S, không tải lại kho nến
 ================================================================================
 """
 
 import streamlit as st
-import yfinance as yf
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import time
 
-def _fetch_chart_data(ticker: str, region: str = "VN", period: str = "1y") -> pd.DataFrame:
+from core import ohlcv_store, indicators, latency
+from core.singleflight import singleflight
+from core.cache_backend import shared_cache
+from core.downsample import aggregate_ohlcv, lttb
+from components.live_quote_ui import live_active, live_bar, CHART_EVERY_S
+
+CHART_MAX_PERIOD = "5y"     # khung dài nhất trên selectbox — tải 1 lần
+CHART_CACHE_SIZE = 64       # số mã giữ trong bộ nhớ
+
+
+@st.cache_data(ttl=ohlcv_store.REFRESH_S, max_entries=CHART_CACHE_SIZE, show_spinner=False)
+@shared_cache("chart_history", ttl=ohlcv_store.REFRESH_S)
+@singleflight("chart_history")
+def _load_full_history(ticker: str, region: str = "VN") -> pd.DataFrame:
+    """Chuỗi CHART_MAX_PERIOD của 1 mã từ kho OHLCV (rỗng → raise, không cache)."""
     suffix_map = {"VN": ".VN", "US": "", "INTL": ""}
     yf_str     = f"{ticker}{suffix_map.get(region, '')}"
 
-    for attempt in range(3):
-        try:
-            df = yf.download(yf_str, period=period, progress=False, timeout=12)
-            if not df.empty:
-                return df
-            if suffix_map.get(region):
-                df2 = yf.download(ticker, period=period, progress=False, timeout=12)
-                if not df2.empty:
-                    return df2
-            return pd.DataFrame()
-        except Exception as e:
-            err = str(e).lower()
-            if ("ratelimit" in err or "429" in err or "too many" in err) and attempt < 2:
-                time.sleep((attempt + 1) * 4)
-            else:
-                return pd.DataFrame()
-    return pd.DataFrame()
-
-
-def render_chart(ticker: str, exchange: str = "HOSE", region: str = "VN"):
-    """Vẽ candlestick full-width với sub-chart volume."""
-
-    _, tf_col = st.columns([0.65, 0.35])
-    with tf_col:
-        period_map = {
-            "1 tháng": "1mo", "3 tháng": "3mo", "6 tháng": "6mo",
-            "1 năm":   "1y",  "2 năm":   "2y",  "5 năm":   "5y",
-        }
-        period_label = st.selectbox(
-            "Khung thời gian:", list(period_map.keys()),
-            index=3, key=f"period_{ticker}"
-        )
-    period = period_map[period_label]
+    df = ohlcv_store.get_history(yf_str, CHART_MAX_PERIOD)
+    if df.empty and suffix_map.get(region):
+        df = ohlcv_store.get_history(ticker, CHART_MAX_PERIOD)
+    if df.empty:
+        raise ValueError(f"no chart data for {yf_str}")
+    return df
 
-    with st.spinner(f"Đang tải biểu đồ {ticker}..."):
-        df = _fetch_chart_data(ticker, region=region, period=period)
 
-    if df is None or df.empty:
-        st.warning(f"⚠️ Không có dữ liệu biểu đồ cho **{ticker}**. Thử lại sau 30 giây.")
-        return
+def _fetch_chart_data(ticker: str, region: str = "VN", period: str = "1y") -> pd.DataFrame:
+    """
+    Mọi khung thời gian cắt từ cùng 1 chuỗi dài đã cache → đổi khung chỉ là
+    thao tác trong bộ nhớ, không gọi mạng.
+    """
+    try:
+        return ohlcv_store.slice_period(_load_full_history(ticker, region), period)
+    except Exception:
+        return pd.DataFrame()
 
-    # Chuẩn hoá columns
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = [col[0] for col in df.columns]
-    df.columns = [c.capitalize() for c in df.columns]
 
-    df['SMA20'] = df['Close'].rolling(20).mean()
-    df['SMA50'] = df['Close'].rolling(50).mean()
+# ══════════════════════════════════════════════════════════════════════════════
+#  DỰNG FIGURE — giới hạn số điểm theo bề rộng chart
+# ══════════════════════════════════════════════════════════════════════════════
+CHART_WIDTH_PX = 1400       # bề rộng layout="wide" điển hình
+PX_PER_BAR     = 3          # < 3px/nến thì mắt không phân biệt được nữa
+WEBGL_MIN_POINTS = 5000     # ít điểm hơn → SVG render nhanh hơn WebGL
+UP_COLOR, DOWN_COLOR = '#26a69a', '#ef5350'
+_AGG_LABEL = {"W-FRI": "nến tuần", "ME": "nến tháng"}
+
+
+def _dates(idx) -> np.ndarray:
+    """Nến ngày chỉ cần 'YYYY-MM-DD' — JSON gọn hơn ISO datetime đầy đủ."""
+    return np.datetime_as_string(np.asarray(idx, dtype="datetime64[D]"))
+
 
+def point_budget(width_px: int = CHART_WIDTH_PX) -> int:
+    return max(60, width_px // PX_PER_BAR)
+
+
+def _line_xy(series: pd.Series, budget: int, fast: bool):
+    """x/y cho 1 đường line — LTTB về `budget` điểm nếu fast và chuỗi quá dài."""
+    if fast and budget and len(series) > budget:
+        ns = series.index.to_numpy().astype("datetime64[ns]").astype(np.int64)
+        xs, ys = lttb(ns, series.to_numpy(), budget)
+        return _dates(xs.astype(np.int64).astype("datetime64[ns]")), ys
+    return _dates(series.index), series.to_numpy()
+
+
+def build_figure(df: pd.DataFrame, ticker: str, point_budget: int = None,
+                 fast: bool = True, overlays=None, panels=None) -> go.Figure:
+    """
+    df: nến ngày (Open/High/Low/Close/Volume).
+    overlays: [(tên, Series, màu)] vẽ trên panel giá. None → SMA 20/50 từ df.
+    panels:   [(tiêu đề, [(tên, Series, màu)])] — mỗi phần tử 1 panel riêng
+              bên dưới KL (RSI, MACD...).
+    fast=True:
+      - nến + KL: gộp tuần/tháng nếu vượt `point_budget`
+      - đường line: LTTB về `point_budget` điểm; Scattergl chỉ khi vẫn còn
+        > WEBGL_MIN_POINTS điểm, còn lại go.Scatter (SVG)
+    fig.layout.meta = mô tả việc gộp (để hiện caption), rỗng nếu không gộp.
+    """
+    if overlays is None:
+        overlays = [("SMA 20", df['Close'].rolling(20).mean(), '#F4A261'),
+                    ("SMA 50", df['Close'].rolling(50).mean(), '#4FC3F7')]
+    panels = panels or []
+
+    bars, rule, note = df, None, ""
+    if fast and point_budget:
+        bars, rule = aggregate_ohlcv(df, point_budget)
+        if rule:
+            note = f"{len(df):,} nến ngày → {len(bars):,} {_AGG_LABEL.get(rule, rule)}"
+
+    n_rows  = 2 + len(panels)
+    panel_h = 0.16
+    vol_h   = 0.14 if panels else 0.22
+    heights = [1 - vol_h - panel_h * len(panels), vol_h] + [panel_h] * len(panels)
     fig = make_subplots(
-        rows=2, cols=1, shared_xaxes=True,
-        vertical_spacing=0.03, row_heights=[0.78, 0.22]
+        rows=n_rows, cols=1, shared_xaxes=True,
+        vertical_spacing=0.03, row_heights=heights
     )
 
+    bx = _dates(bars.index)
     fig.add_trace(go.Candlestick(
-        x=df.index,
-        open=df['Open'], high=df['High'],
-        low=df['Low'],   close=df['Close'],
+        x=bx,
+        open=bars['Open'], high=bars['High'],
+        low=bars['Low'],   close=bars['Close'],
         name=ticker,
-        increasing_line_color='#26a69a', decreasing_line_color='#ef5350',
-        increasing_fillcolor='#26a69a',  decreasing_fillcolor='#ef5350',
+        increasing_line_color=UP_COLOR, decreasing_line_color=DOWN_COLOR,
+        increasing_fillcolor=UP_COLOR,  decreasing_fillcolor=DOWN_COLOR,
     ), row=1, col=1)
 
-    fig.add_trace(go.Scatter(
-        x=df.index, y=df['SMA20'], name='SMA 20',
-        mode='lines', line=dict(color='#F4A261', width=1.3)
-    ), row=1, col=1)
+    def Line(x, **kw):
+        return (go.Scattergl if fast and len(x) > WEBGL_MIN_POINTS else go.Scatter)(x=x, **kw)
 
-    fig.add_trace(go.Scatter(
-        x=df.index, y=df['SMA50'], name='SMA 50',
-        mode='lines', line=dict(color='#4FC3F7', width=1.3)
-    ), row=1, col=1)
+    for name, series, color in overlays:
+        x, ys = _line_xy(series, point_budget, fast)
+        fig.add_trace(Line(
+            x=x, y=ys, name=name,
+            mode='lines', line=dict(color=color, width=1.3)
+        ), row=1, col=1)
 
-    # Khởi tạo vol_colors
-    vol_colors = []
-    for _, row in df.iterrows():
-        if row['Close'] >= row['Open']:
-            vol_colors.append('#26a69a')
-        else:
-            vol_colors.append('#ef5350')
+    vol_colors = np.where(bars['Close'].to_numpy() >= bars['Open'].to_numpy(),
+                          UP_COLOR, DOWN_COLOR)
 
     fig.add_trace(go.Bar(
-        x=df.index, y=df['Volume'], name='KL',
+        x=bx, y=bars['Volume'], name='KL',
         marker_color=vol_colors, marker_line_width=0, opacity=0.7
     ), row=2, col=1)
 
+    for r, (title, lines) in enumerate(panels, start=3):
+        for name, series, color in lines:
+            x, ys = _line_xy(series, point_budget, fast)
+            fig.add_trace(Line(
+                x=x, y=ys, name=name,
+                mode='lines', line=dict(color=color, width=1.2)
+            ), row=r, col=1)
+        fig.update_yaxes(title_text=title, row=r, col=1)
+
     fig.update_layout(
-        height=750,
+        height=750 + 150 * len(panels),
         margin=dict(l=0, r=0, t=20, b=0),
         template="plotly_dark",
         paper_bgcolor="#121212",
@@ -118,12 +174,126 @@ def render_chart(ticker: str, exchange: str = "HOSE", region: str = "VN"):
         ),
         hovermode='x unified',
         xaxis_rangeslider_visible=False,
+        meta=note,
     )
     grid = dict(showgrid=True, gridcolor='#2a2a2a', gridwidth=1)
     fig.update_xaxes(**grid)
     fig.update_yaxes(**grid, side='right')
     fig.update_yaxes(title_text="Giá", row=1, col=1)
     fig.update_yaxes(title_text="KL",  row=2, col=1)
+    return fig
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CHỈ BÁO — tính trên toàn bộ chuỗi 5 năm (core.indicators, có cache), rồi cắt
+#  theo khung đang xem → đường không bị NaN ở đầu khung ngắn
+# ══════════════════════════════════════════════════════════════════════════════
+# nhãn: (tên chỉ báo, tham số, [(output, tên hiển thị, màu)], panel riêng?)
+INDICATOR_MENU = {
+    "EMA 20":        ("ema",    {"n": 20}, [("ema", "EMA 20", "#BA68C8")], None),
+    "Bollinger 20":  ("bbands", {"n": 20, "k": 2.0},
+                      [("upper", "BB trên", "#90A4AE"), ("mid", "BB giữa", "#78909C"),
+                       ("lower", "BB dưới", "#90A4AE")], None),
+    "RSI 14":        ("rsi",    {"n": 14}, [("rsi", "RSI 14", "#FFD54F")], "RSI"),
+    "MACD 12/26/9":  ("macd",   {"fast": 12, "slow": 26, "signal": 9},
+                      [("macd", "MACD", "#4FC3F7"), ("signal", "Signal", "#F4A261")], "MACD"),
+    "ATR 14":        ("atr",    {"n": 14}, [("atr", "ATR 14", "#A1887F")], "ATR"),
+    "OBV":           ("obv",    {}, [("obv", "OBV", "#81C784")], "OBV"),
+}
+
+
+def _indicator_traces(symbol: str, full: pd.DataFrame, view_index, selected):
+    """(overlays, panels) cho build_figure; SMA 20/50 luôn có."""
+    start = view_index[0]
+    sma = lambda n: indicators.compute(symbol, full, "sma", n=n)["sma"].loc[start:]
+    overlays = [("SMA 20", sma(20), '#F4A261'), ("SMA 50", sma(50), '#4FC3F7')]
+    panels = []
+    for label in selected:
+        name, params, outputs, panel = INDICATOR_MENU[label]
+        res   = indicators.compute(symbol, full, name, **params)
+        lines = [(disp, res[key].loc[start:], color) for key, disp, color in outputs]
+        if panel:
+            panels.append((panel, lines))
+        else:
+            overlays.extend(lines)
+    return overlays, panels
+
+
+def _with_live_bar(df: pd.DataFrame, bar: dict) -> pd.DataFrame:
+    """Ghi đè nến phiên `bar["date"]` (hoặc thêm nến mới) bằng quote trực tiếp."""
+    if not bar or df.empty:
+        return df
+    day = pd.Timestamp(bar["date"])
+    if day < df.index[-1].normalize():
+        return df
+    price = bar["price"]
+    row = {"Open":  bar.get("open") or price,
+           "High":  max(bar.get("high") or price, price),
+           "Low":   min(bar.get("low") or price, price),
+           "Close": price,
+           "Volume": bar.get("volume") or 0}
+    df = df.copy()
+    idx = df.index[-1] if day == df.index[-1].normalize() else day
+    df.loc[idx, list(row)] = list(row.values())
+    return df
+
+
+def render_chart(ticker: str, exchange: str = "HOSE", region: str = "VN",
+                 fast: bool = True):
+    """
+    Vẽ candlestick full-width với sub-chart volume.
+    fast=True → gộp nến / LTTB theo ngân sách điểm cho nến và đường SMA.
+    Giá trực tiếp đang chạy → dựng lại riêng chart mỗi CHART_EVERY_S.
+    """
+    if live_active(ticker, region):
+        st.fragment(_render_chart, run_every=CHART_EVERY_S)(ticker, exchange, region, fast)
+    else:
+        _render_chart(ticker, exchange, region, fast)
+
+
+def _render_chart(ticker: str, exchange: str, region: str, fast: bool):
+    ind_col, tf_col = st.columns([0.65, 0.35])
+    with ind_col:
+        selected = st.multiselect("Chỉ báo:", list(INDICATOR_MENU.keys()),
+                                  key=f"ind_{ticker}")
+    with tf_col:
+        period_map = {
+            "1 tháng": "1mo", "3 tháng": "3mo", "6 tháng": "6mo",
+            "1 năm":   "1y",  "2 năm":   "2y",  "5 năm":   "5y",
+        }
+        period_label = st.selectbox(
+            "Khung thời gian:", list(period_map.keys()),
+            index=3, key=f"period_{ticker}"
+        )
+    period = period_map[period_label]
+
+    with st.spinner(f"Đang tải biểu đồ {ticker}..."), latency.span("chart_load") as sp:
+        df = _fetch_chart_data(ticker, region=region, period=period)
+        if df is None or df.empty:
+            sp.outcome = "empty"
+
+    if df is None or df.empty:
+        st.warning(f"⚠️ Không có dữ liệu biểu đồ cho **{ticker}**. Thử lại sau 30 giây.")
+        return
+
+    # Chuẩn hoá columns
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = [col[0] for col in df.columns]
+    df.columns = [c.capitalize() for c in df.columns]
+    df = _with_live_bar(df, live_bar(ticker, region))
+
+    try:
+        overlays, panels = _indicator_traces(f"{ticker}:{region}",
+                                             _load_full_history(ticker, region),
+                                             df.index, selected)
+    except Exception:
+        overlays, panels = None, None
+
+    with latency.span("chart_build", fast=fast):
+        fig = build_figure(df, ticker, point_budget=point_budget(), fast=fast,
+                           overlays=overlays, panels=panels)
+    if fig.layout.meta:
+        st.caption(f"📉 {fig.layout.meta}")
 
     # ✅ Fix: dùng width='stretch' thay cho use_container_width=True (Streamlit 1.54+)
     try:
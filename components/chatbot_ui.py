@@ -1,10 +1,14 @@
 """
-components/chatbot_ui.py — v6.0
+components/chatbot_ui.py — v6.1
 Auto phân tích NGAY khi load (không có nút bấm).
 Dùng session cache để không gọi lại mỗi lần re-render.
+v6.1: Stream từng đoạn vào khung chat (st.write_stream) thay vì spinner chờ cả bài.
+v6.2: Hiện vị trí hàng đợi + thời gian chờ ước tính khi bị giới hạn quota.
+v6.3: Câu hỏi tiếp theo đi qua hội thoại nhiều lượt (core.ai_chat) — chỉ gửi lượt mới.
 """
 import streamlit as st
-from core.ai_engine import get_ai_analysis
+from core.ai_engine import stream_ai_analysis
+from core.ai_chat import stream_followup
 
 try:
     from streamlit_mic_recorder import speech_to_text
@@ -13,6 +17,17 @@ except ImportError:
     VOICE_ENABLED = False
 
 
+def _stream_reply(stream_fn=stream_ai_analysis, **kwargs) -> str:
+    """Stream câu trả lời trong chat_message hiện tại, kèm dòng báo xếp hàng nếu phải chờ."""
+    note = st.empty()
+    def on_wait(wait_s, ahead):
+        note.info(f"⏳ Đang xếp hàng gọi AI — {ahead} yêu cầu phía trước, "
+                  f"ước tính chờ ~{wait_s:.0f} giây...")
+    reply = st.write_stream(stream_fn(on_wait=on_wait, **kwargs))
+    note.empty()
+    return reply
+
+
 def render_chat_interface(ticker: str, lang: str, model: str,
                           mode: str = "ticker", stock_data: dict = None,
                           initial_query: str = ""):
@@ -28,20 +43,6 @@ def render_chat_interface(ticker: str, lang: str, model: str,
 
     history = st.session_state.get(hist_key, [])
 
-    # ── AUTO phân tích ngay lần đầu (không cần bấm nút) ─────────────────────
-    if not st.session_state.get(done_key):
-        with st.spinner("🔍 AI đang tìm kiếm thông tin và phân tích... (15–30 giây)"):
-            reply = get_ai_analysis(
-                ticker=ticker, lang=lang, model_name=model,
-                mode=mode, stock_data=stock_data,
-                initial_query=initial_query, context="",
-            )
-        history.append({"role": "assistant", "content": reply})
-        st.session_state[hist_key] = history
-        st.session_state[done_key] = True
-        st.rerun()
-        return
-
     # ── Hiển thị lịch sử ────────────────────────────────────────────────────
     chat_box = st.container(height=560, border=True)
     with chat_box:
@@ -49,9 +50,24 @@ def render_chat_interface(ticker: str, lang: str, model: str,
             with st.chat_message(msg["role"]):
                 st.markdown(msg["content"])
 
+    # ── AUTO phân tích ngay lần đầu (không cần bấm nút) — stream vào khung ──
+    if not st.session_state.get(done_key):
+        with chat_box:
+            with st.chat_message("assistant"):
+                reply = _stream_reply(
+                    ticker=ticker, lang=lang, model_name=model,
+                    mode=mode, stock_data=stock_data,
+                    initial_query=initial_query, context="",
+                )
+        history.append({"role": "assistant", "content": reply})
+        st.session_state[hist_key] = history
+        st.session_state[done_key] = True
+        st.rerun()
+        return
+
     # ── Nếu rate limit → nút retry + hướng dẫn ──────────────────────────────
     last = history[-1].get("content","") if history else ""
-    if "Rate Limit" in last or "quota" in last.lower():
+    if "Rate Limit" in last or "quota" in last.lower() or "Hàng đợi AI" in last:
         c1, c2 = st.columns([0.35, 0.65])
         with c1:
             if st.button("🔄 Thử lại", key=f"retry_{sk}", type="primary"):
@@ -75,18 +91,17 @@ def render_chat_interface(ticker: str, lang: str, model: str,
         prompt = st.chat_input("💬 Hỏi thêm về cổ phiếu này...", key=f"ci_{sk}")
 
     if prompt:
-        history.append({"role": "user", "content": prompt})
         with chat_box:
             with st.chat_message("user"):
                 st.markdown(prompt)
             with st.chat_message("assistant"):
-                with st.spinner("🔍 Đang tìm kiếm và phân tích..."):
-                    reply = get_ai_analysis(
-                        ticker=ticker, lang=lang, model_name=model,
-                        context=prompt, mode=mode,
-                        stock_data=stock_data, initial_query=initial_query,
-                    )
-                st.markdown(reply)
+                reply = _stream_reply(
+                    stream_followup,
+                    ticker=ticker, lang=lang, model_name=model,
+                    history=list(history), question=prompt, mode=mode,
+                    stock_data=stock_data, initial_query=initial_query,
+                )
+        history.append({"role": "user", "content": prompt})
         history.append({"role": "assistant", "content": reply})
         st.session_state[hist_key] = history
         try:
@@ -0,0 +1,110 @@
+"""
+components/live_quote_ui.py — Giá trực tiếp: chỉ vùng "Thông tin Giá" tự làm mới
+
+Trước đây muốn giá mới phải bấm Phân tích lại → chạy lại get_stock_data,
+cả 4 bảng chỉ số, chart và khung chat. Vùng giá giờ là 1 fragment
+(st.fragment run_every=LIVE_EVERY_S): chỉ fragment chạy lại, đọc
+get_live_quote (1 request nến phiên, cache LIVE_TTL dùng chung mọi phiên).
+
+  ✅ Chỉ mã VN, chỉ trong giờ khớp lệnh HOSE (cache_warmer.market_phase):
+     ngoài giờ → không hẹn giờ; hết phiên khi đang mở trang → tick không gọi mạng
+  ✅ Toggle bật/tắt nằm trong fragment → bật/tắt không chạy lại cả trang
+  ✅ Giữ bản đã hiển thị trong session_state, chỉ ghi đè trường đổi giá;
+     trường vừa đổi hiện delta so với lần trước
+  ✅ live_bar() → chart_ui vá nến cuối mà không gọi thêm request nào
+"""
+from datetime import datetime, timedelta, timezone
+
+import streamlit as st
+
+from core.cache_warmer import market_phase
+from core.data_fetcher import get_live_quote, LIVE_TTL
+
+LIVE_EVERY_S = max(15, LIVE_TTL)     # chu kỳ làm mới vùng giá
+CHART_EVERY_S = 60                   # chu kỳ dựng lại chart để vá nến cuối
+_VN_TZ = timezone(timedelta(hours=7))
+
+# trường quote → trường của get_stock_data
+_QUOTE_FIELD = {"price": "price", "open": "open_price", "high": "high_price",
+                "low": "low_price", "volume": "volume"}
+
+
+def _key(ticker: str, region: str) -> str:
+    return f"live_{ticker}_{region}"
+
+
+def live_supported(region: str) -> bool:
+    return region == "VN"
+
+
+def live_active(ticker: str, region: str) -> bool:
+    """Toggle đang bật và đang trong phiên khớp lệnh."""
+    return (live_supported(region) and market_phase() == "session"
+            and st.session_state.get(_key(ticker, region) + "_on", True))
+
+
+def apply_quote(view: dict, quote: dict):
+    """(view mới, {trường: giá trị cũ}) — chỉ các trường thực sự đổi."""
+    changed = {}
+    for qk, dk in _QUOTE_FIELD.items():
+        v = quote.get(qk)
+        if v not in (None, 0) and v != view.get(dk):
+            changed[dk] = view.get(dk)
+    if not changed:
+        return view, changed
+    view = dict(view)
+    for qk, dk in _QUOTE_FIELD.items():
+        if dk in changed:
+            view[dk] = quote[qk]
+    try:
+        ref = float(view.get("ref_price"))
+        view["price_change"]     = round(view["price"] - ref, 2)
+        view["price_change_pct"] = round((view["price"] - ref) / ref * 100, 2)
+    except (TypeError, ValueError, ZeroDivisionError):
+        pass
+    view["_live_date"] = quote.get("date")
+    return view, changed
+
+
+def live_bar(ticker: str, region: str) -> dict:
+    """Nến phiên đã cập nhật trực tiếp ({} nếu chưa có tick nào đổi giá)."""
+    view = st.session_state.get(_key(ticker, region)) or {}
+    if not view.get("_live_date"):
+        return {}
+    return {"date": view["_live_date"], "price": view["price"],
+            **{qk: view.get(dk) for qk, dk in _QUOTE_FIELD.items() if qk != "price"}}
+
+
+def _body(ticker: str, region: str, render):
+    key = _key(ticker, region)
+    on  = st.toggle("🔴 Giá trực tiếp", value=True, key=key + "_on",
+                    help=f"Tự làm mới mỗi {LIVE_EVERY_S}s trong giờ giao dịch HOSE")
+    view, changed = st.session_state[key], {}
+    if not on:
+        status = "⏸️ Đã tắt cập nhật trực tiếp"
+    elif market_phase() != "session":
+        status = "⏸️ Ngoài giờ khớp lệnh HOSE — tạm dừng cập nhật"
+    else:
+        quote = get_live_quote(ticker, region)
+        if quote:
+            view, changed = apply_quote(view, quote)
+            st.session_state[key] = view
+        status = (f"🔄 {datetime.now(_VN_TZ):%H:%M:%S} · "
+                  + (f"{len(changed)} trường đổi" if changed else
+                     "không đổi" if quote else "chưa lấy được giá mới"))
+    render(view, region, changed)
+    st.caption(status)
+
+
+def render_live_price(data: dict, region: str, render):
+    """
+    Vẽ vùng giá bằng `render(view, region, changed)`. Gọi ở lần chạy cả trang:
+    bản hiển thị được làm mới từ `data` (get_stock_data vừa trả về).
+    """
+    if not live_supported(region):
+        render(data, region, {})
+        return
+    ticker = data.get("ticker", "")
+    st.session_state[_key(ticker, region)] = dict(data)
+    every = LIVE_EVERY_S if market_phase() == "session" else None
+    st.fragment(_body, run_every=every)(ticker, region, render)
@@ -0,0 +1,70 @@
+"""
+components/screener_ui.py — Trang Bộ lọc cổ phiếu
+Điều kiện lọc chạy vector trên universe do core.screener dựng dần trong nền,
+không gọi mạng khi đổi bộ lọc. Universe chưa đủ → lọc trên phần đã có và
+hiện tiến độ, không chặn trang.
+"""
+import time
+import streamlit as st
+from core.screener import universe, universe_progress, screen, INDUSTRY_AVG
+
+SORT_LABELS = {
+    "Khối lượng": "volume", "Vốn hóa": "market_cap", "ROE": "roe",
+    "P/E": "pe", "P/B": "pb", "% thay đổi": "price_change_pct",
+}
+
+
+def render_screener(market_filter: str = "Tất cả"):
+    st.subheader("🧮 Bộ lọc cổ phiếu")
+    uni, prog = universe(), universe_progress()
+    building = prog["passes"] == 0                     # lượt dựng đầu chưa xong
+    if building:
+        c1, c2 = st.columns([0.8, 0.2])
+        c1.progress(prog["fundamentals"] / max(prog["listed"], 1),
+                    text=f"📡 Đang dựng danh sách trong nền: giá {prog['quoted']}/{prog['listed']} mã"
+                         f" · chỉ số cơ bản {prog['fundamentals']}/{prog['quoted']} mã")
+        c2.button("🔄 Cập nhật", key="screener_refresh")
+    if uni is None or uni.empty:
+        if not building:
+            st.warning("⚠️ Không tải được dữ liệu thị trường. Thử lại sau 30 giây.")
+        return
+
+    c1, c2, c3, c4 = st.columns(4)
+    roe_min = c1.number_input("ROE tối thiểu (%)", value=15.0, step=1.0)
+    pe_max  = c2.number_input("P/E tối đa (0 = bỏ qua)", value=0.0, step=1.0)
+    pe_ind  = c3.checkbox("P/E < TB ngành", value=True)
+    mc_min  = c4.number_input("Vốn hóa tối thiểu (tỷ)", value=0.0, step=500.0)
+    s1, s2, s3 = st.columns([0.4, 0.3, 0.3])
+    sort_lbl = s1.selectbox("Xếp theo:", list(SORT_LABELS.keys()))
+    asc      = s2.checkbox("Tăng dần", value=False)
+    top_n    = s3.slider("Top", 5, 100, 20, step=5)
+
+    cond = [("roe", ">", roe_min)]
+    if pe_max > 0: cond.append(("pe", "<", pe_max))
+    if pe_ind:     cond.append(("pe", "<", INDUSTRY_AVG))
+    if mc_min > 0: cond.append(("market_cap", ">=", mc_min))
+
+    t0  = time.perf_counter()
+    out = screen(uni, cond, market=market_filter, sort_by=SORT_LABELS[sort_lbl],
+                 ascending=asc, top_n=top_n)
+    ms  = (time.perf_counter() - t0) * 1000
+
+    st.caption(f"{len(out)} / {len(uni)} mã khớp · lọc trong {ms:.1f} ms")
+    st.dataframe(
+        out[["market", "industry", "price", "price_change_pct", "volume",
+             "pe", "pb", "eps", "roe", "roa", "market_cap"]],
+        height=min(38 + 35 * max(len(out), 1), 740),
+        column_config={
+            "market":           "Sàn",
+            "industry":         "Ngành",
+            "price":            st.column_config.NumberColumn("Giá", format="%.0f"),
+            "price_change_pct": st.column_config.NumberColumn("%", format="%+.2f"),
+            "volume":           st.column_config.NumberColumn("KL", format="%.0f"),
+            "pe":               st.column_config.NumberColumn("P/E", format="%.2f"),
+            "pb":               st.column_config.NumberColumn("P/B", format="%.2f"),
+            "eps":              st.column_config.NumberColumn("EPS", format="%.2f"),
+            "roe":              st.column_config.NumberColumn("ROE %", format="%.1f"),
+            "roa":              st.column_config.NumberColumn("ROA %", format="%.1f"),
+            "market_cap":       st.column_config.NumberColumn("Vốn hóa (tỷ)", format="%.0f"),
+        },
+    )
@@ -0,0 +1,39 @@
+"""
+components/watchlist_ui.py — Watchlist gọn trong sidebar
+Giá cả danh sách lấy bằng 1 request (core.batch_fetcher), cache 60 giây.
+"""
+import re
+import streamlit as st
+from core.batch_fetcher import get_batch_snapshot, VN30
+
+
+def render_watchlist(region: str = "VN"):
+    if not st.checkbox("📋 Watchlist", key="wl_on"):
+        return
+
+    default = ", ".join(VN30) if region == "VN" else "AAPL, MSFT, NVDA, GOOGL, AMZN"
+    raw = st.text_area("Mã (cách nhau bởi dấu phẩy):",
+                       value=st.session_state.get("watchlist", default),
+                       key="wl_input", height=90)
+    st.session_state["watchlist"] = raw
+    tickers = [t for t in re.split(r"[,\s;]+", raw.upper()) if t]
+
+    with st.spinner(f"Đang tải {len(tickers)} mã..."):
+        df, errors = get_batch_snapshot(tickers, region=region, fundamentals=False)
+
+    if df.empty:
+        st.caption("⚠️ Không tải được giá. Thử lại sau 30 giây.")
+        return
+
+    view = df[["price", "price_change_pct", "volume"]].sort_values(
+        "price_change_pct", ascending=False)
+    st.dataframe(
+        view, height=min(38 + 35 * len(view), 420),
+        column_config={
+            "price":            st.column_config.NumberColumn("Giá", format="%.2f" if region != "VN" else "%.0f"),
+            "price_change_pct": st.column_config.NumberColumn("%", format="%+.2f"),
+            "volume":           st.column_config.NumberColumn("KL", format="%.0f"),
+        },
+    )
+    if errors:
+        st.caption("Không có giá: " + ", ".join(errors))
@@ -0,0 +1,86 @@
+"""
+core/ai_cache.py — Cache (LRU) cho kết quả phân tích AI
+
+Mỗi lần phân tích Gemini + Google Search mất 15–30s và tốn 1 lượt quota
+(1,500 req/ngày). Bài phân tích được lưu qua backend chung
+(core.cache_backend — mặc định SQLite trong .cache/, hoặc Redis) → dùng
+chung giữa các phiên, các replica, còn sau khi restart.
+
+  Khoá = sha256(prompt) + model + ngôn ngữ + NGÀY GIAO DỊCH
+         (giờ VN; trước 9:00 và cuối tuần tính cho phiên liền trước)
+  Tươi  = tuổi ≤ FRESH_S (mặc định 6h, env LBCK_AI_FRESH_S)
+  Dọn   = theo dung lượng của backend (LBCK_CACHE_MB) — bài lâu không được
+          đọc nhất bị xoá trước
+
+    key = make_key(prompt, "gemini-2.0-flash", "Tiếng Việt")
+    text = get(key)            # None nếu chưa có / đã cũ
+    put(key, text)
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from core import cache_backend
+
+FRESH_S     = int(os.environ.get("LBCK_AI_FRESH_S", 6 * 3600))
+STORE_TTL_S = 24 * 3600        # khoá đã gắn ngày giao dịch → giữ quá 1 ngày là thừa
+NAMESPACE   = "ai"
+
+_VN_TZ     = timezone(timedelta(hours=7))
+_OPEN_HOUR = 9                 # HOSE mở cửa 9:00
+
+_stats = {"hit": 0, "miss": 0, "stale": 0}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  KHOÁ
+# ══════════════════════════════════════════════════════════════════════════════
+def trading_day(now: datetime = None) -> str:
+    """Ngày giao dịch (giờ VN) mà thời điểm `now` thuộc về, dạng YYYY-MM-DD."""
+    now = (now or datetime.now(timezone.utc)).astimezone(_VN_TZ)
+    d = now.date()
+    if now.hour < _OPEN_HOUR:
+        d -= timedelta(days=1)
+    while d.weekday() >= 5:                 # T7, CN → thứ Sáu
+        d -= timedelta(days=1)
+    return d.isoformat()
+
+
+def make_key(prompt: str, model: str, lang: str, now: datetime = None) -> tuple:
+    """(key, model, lang, bucket) — truyền nguyên tuple cho get/put."""
+    bucket = trading_day(now)
+    h = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return (hashlib.sha256(f"{h}|{model}|{lang}|{bucket}".encode()).hexdigest(),
+            model, lang, bucket)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  ĐỌC / GHI
+# ══════════════════════════════════════════════════════════════════════════════
+def _backend_key(key: tuple) -> str:
+    return cache_backend.make_key(NAMESPACE, key[0])
+
+
+def get(key: tuple, fresh_s: float = None):
+    """Bài phân tích đã lưu nếu còn tươi, ngược lại None."""
+    fresh_s = FRESH_S if fresh_s is None else fresh_s
+    item = cache_backend.default().get(_backend_key(key))
+    if item is None:
+        _stats["miss"] += 1
+        return None
+    created, text = item
+    if time.time() - created > fresh_s:
+        _stats["stale"] += 1
+        return None
+    _stats["hit"] += 1
+    return text
+
+
+def put(key: tuple, text: str):
+    cache_backend.default().set(_backend_key(key), (time.time(), text), STORE_TTL_S)
+
+
+def stats() -> dict:
+    """Hit/miss trong tiến trình + trạng thái backend."""
+    return {**_stats, "backend": cache_backend.stats()}
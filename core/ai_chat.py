@@ -0,0 +1,170 @@
+"""
+core/ai_chat.py — Hội thoại nhiều lượt cho câu hỏi tiếp theo
+
+Trước: mỗi câu hỏi thêm gọi lại get_ai_analysis(context=câu hỏi) → dựng lại
+toàn bộ prompt (bảng dữ liệu + 5 mục phân tích), chạy lại Google Search và
+bỏ qua lịch sử chat. Giờ:
+
+  - Ngữ cảnh lớn (dữ liệu mã + bài phân tích đầu tiên) được giữ 1 lần:
+      · Gemini context caching (caches.create, theo từng API key) nếu được
+      · không tạo được (ngữ cảnh nhỏ hơn ngưỡng / key không hỗ trợ)
+        → gửi dạng system_instruction; lỗi caches.create → thử lại sau
+        NO_CACHE_BACKOFF_S, gấp đôi mỗi lần lỗi tiếp (tối đa CONTEXT_TTL_S)
+  - Mỗi lượt chỉ gửi các lượt gần nhất (cắt theo HISTORY_TOKENS) + câu hỏi mới
+  - Không bật Google Search → trả lời trong vài giây
+  - Lỗi trước chunk đầu → quay về đường cũ (stream_ai_analysis)
+
+    for part in stream_followup("FPT", "Tiếng Việt", "gemini-2.0-flash",
+                                history, "Mục tiêu giá 6 tháng?"):
+        ...
+"""
+import hashlib
+import threading
+import time
+
+from core import genai_pool, rate_limiter
+from core.ai_engine import _open_on_pool, _queue_message, stream_ai_analysis
+
+HISTORY_TOKENS   = 6000        # ngân sách token cho các lượt chat gần nhất
+CACHE_MIN_TOKENS = 4096        # Gemini từ chối cache ngữ cảnh nhỏ hơn mức này
+CONTEXT_TTL_S    = 3600
+NO_CACHE_BACKOFF_S = 300       # caches.create lỗi → chờ rồi thử lại (lỗi có thể tạm thời)
+
+_ctx_caches: dict = {}         # (kid, model, hash ngữ cảnh) → (tên cache, hết hạn)
+_no_cache:   dict = {}         # (kid, model) → (thử lại lúc, số lần lỗi liên tiếp)
+_lock  = threading.Lock()
+_stats = {"turns": 0, "ctx_cached": 0, "ctx_inline": 0, "tokens_sent": 0}
+
+
+def approx_tokens(text: str) -> int:
+    """Ước lượng số token (~4 ký tự / token) — đủ cho việc cắt lịch sử."""
+    return len(text) // 4 + 1
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  NGỮ CẢNH
+# ══════════════════════════════════════════════════════════════════════════════
+def _data_table(data: dict) -> str:
+    rows = [("Giá", "price"), ("Khối lượng", "volume"), ("Ngành", "industry"),
+            ("EPS", "eps"), ("P/E", "pe"), ("P/E TB ngành", "avg_pe"),
+            ("P/B", "pb"), ("P/B TB ngành", "avg_pb"), ("BVPS", "bvps"),
+            ("ROE %", "roe"), ("Vốn hóa (tỷ)", "market_cap")]
+    return "\n".join(f"| {lbl} | {data.get(k, 'N/A')} |" for lbl, k in rows)
+
+
+def build_context(ticker, lang, mode, stock_data, initial_query, first_report) -> str:
+    """System instruction cho cả hội thoại: vai trò + dữ liệu + bài phân tích đầu."""
+    if mode == "ticker":
+        head = (f"Bạn là Giám đốc Phân tích Đầu tư tại Việt Nam, đang trao đổi tiếp "
+                f"với nhà đầu tư về mã **{ticker}** (sàn {(stock_data or {}).get('market', 'HOSE')}).\n\n"
+                f"### Dữ liệu thực tế\n| Chỉ số | Giá trị |\n|---|---|\n{_data_table(stock_data or {})}")
+    else:
+        head = (f"Bạn là Chuyên gia Kinh tế & Thị trường Tài chính Việt Nam, đang trao "
+                f"đổi tiếp về câu hỏi: {initial_query or 'Nhận định thị trường'}")
+    return (f"{head}\n\n### Bài phân tích bạn đã đưa ra\n{first_report}\n\n"
+            f"Trả lời ngắn gọn, đúng trọng tâm câu hỏi, nhất quán với bài phân tích trên. "
+            f"**Ngôn ngữ:** {lang} | **Format:** Markdown\n"
+            f"*⚠️ Phân tích tham khảo, không phải lời khuyên đầu tư.*")
+
+
+def trim_history(turns: list, budget: int = HISTORY_TOKENS) -> list:
+    """Giữ các lượt gần nhất vừa `budget` token (luôn giữ ít nhất lượt cuối)."""
+    kept, used = [], 0
+    for msg in reversed(turns):
+        t = approx_tokens(msg["content"])
+        if kept and used + t > budget:
+            break
+        kept.append(msg)
+        used += t
+    kept.reverse()
+    # Gemini yêu cầu lượt đầu là của user
+    while kept and kept[0]["role"] != "user":
+        kept.pop(0)
+    return kept
+
+
+def _config_for(context: str):
+    """config_for(kid, client) cho _open_on_pool: dùng cache ngữ cảnh nếu có."""
+    types = genai_pool.types
+    h = hashlib.sha256(context.encode("utf-8")).hexdigest()[:16]
+
+    def make(kid, client, model_name):
+        key, now = (kid, model_name, h), time.time()
+        with _lock:
+            hit = _ctx_caches.get(key)
+            skip = _no_cache.get((kid, model_name), (0, 0))[0] > now
+        if hit and hit[1] > now:
+            _stats["ctx_cached"] += 1
+            return types.GenerateContentConfig(cached_content=hit[0])
+        if not skip and approx_tokens(context) >= CACHE_MIN_TOKENS:
+            try:
+                cache = client.caches.create(model=model_name, config=types.CreateCachedContentConfig(
+                    system_instruction=context, ttl=f"{CONTEXT_TTL_S}s"))
+                with _lock:
+                    _ctx_caches[key] = (cache.name, now + CONTEXT_TTL_S - 60)
+                    _no_cache.pop((kid, model_name), None)
+                _stats["ctx_cached"] += 1
+                return types.GenerateContentConfig(cached_content=cache.name)
+            except Exception:
+                with _lock:
+                    fails = _no_cache.get((kid, model_name), (0, 0))[1] + 1
+                    wait  = min(NO_CACHE_BACKOFF_S * 2 ** (fails - 1), CONTEXT_TTL_S)
+                    _no_cache[(kid, model_name)] = (now + wait, fails)
+        _stats["ctx_inline"] += 1
+        _stats["tokens_sent"] += approx_tokens(context)
+        return types.GenerateContentConfig(system_instruction=context)
+    return make
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  LƯỢT HỎI TIẾP
+# ══════════════════════════════════════════════════════════════════════════════
+def stream_followup(ticker, lang, model_name, history, question,
+                    mode="ticker", stock_data=None, initial_query="", on_wait=None):
+    """
+    history: [{"role": "assistant"|"user", "content": ...}] — lượt đầu là bài
+             phân tích tự động; KHÔNG gồm `question`.
+    Yield các đoạn Markdown như stream_ai_analysis.
+    """
+    pool  = genai_pool.get_pool()
+    first = next((m["content"] for m in history if m["role"] == "assistant"), "")
+    if pool is None or not first:
+        yield from stream_ai_analysis(ticker, lang, model_name, question, mode,
+                                      stock_data, initial_query, on_wait=on_wait)
+        return
+
+    types   = genai_pool.types
+    context = build_context(ticker, lang, mode, stock_data, initial_query, first)
+    i_first = next(i for i, m in enumerate(history) if m["role"] == "assistant")
+    turns   = trim_history(history[i_first + 1:] + [{"role": "user", "content": question}])
+    contents = [types.Content(role="model" if m["role"] == "assistant" else "user",
+                              parts=[types.Part(text=m["content"])]) for m in turns]
+    make = _config_for(context)
+
+    try:
+        text, chunks, _ = _open_on_pool(pool, model_name, contents, False, on_wait,
+                                        config_for=lambda kid, c: make(kid, c, model_name))
+    except rate_limiter.QuotaExceeded as e:
+        yield _queue_message(e)
+        return
+    except Exception:
+        # Model / key không hỗ trợ dạng hội thoại → đường cũ (prompt đầy đủ)
+        yield from stream_ai_analysis(ticker, lang, model_name, question, mode,
+                                      stock_data, initial_query, on_wait=on_wait)
+        return
+
+    _stats["turns"] += 1
+    _stats["tokens_sent"] += sum(approx_tokens(m["content"]) for m in turns)
+
+    yield text
+    try:
+        for chunk in chunks:
+            t = getattr(chunk, "text", None)
+            if t:
+                yield t
+    except Exception:
+        yield "\n\n⚠️ *Kết nối bị ngắt giữa chừng — hỏi lại để nhận câu trả lời đầy đủ.*"
+
+
+def stats() -> dict:
+    return dict(_stats)
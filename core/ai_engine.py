@@ -2,18 +2,26 @@
 core/ai_engine.py — v8.0
 Đã nâng cấp lên thư viện google.genai mới nhất.
 Hướng dẫn rõ cách cập nhật API key mới vào Streamlit Secrets.
-Auto-retry 1 lần sau 35s khi rate limit.
+Rate limit: xếp hàng theo khe GCRA của core.rate_limiter; gặp 429 → penalize()
+dời khe kế tiếp theo retryDelay cho mọi phiên rồi thử lại 1 lần (không sleep cố định).
+v8.1: Cache đĩa theo (prompt, model, ngôn ngữ, ngày giao dịch) — core.ai_cache.
+v8.2: stream_ai_analysis() — stream từng đoạn qua generate_content_stream.
+v8.3: Hàng đợi + giới hạn tốc độ chung theo model (core.rate_limiter) thay cho sleep(35).
+v8.4: Client Gemini dùng lại + xoay vòng nhiều API key (core.genai_pool).
+v8.5: Các yêu cầu giống nhau đồng thời dùng chung 1 stream (core.singleflight).
 """
-import streamlit as st
-import time
+from core import ai_cache, genai_pool, rate_limiter, singleflight
+from core.genai_pool import HAS_GENAI
 
-HAS_GENAI = False
-try:
-    from google import genai
-    from google.genai import types
-    HAS_GENAI = True
-except ImportError:
-    pass
+_AI_FLIGHT = singleflight.group("ai_analysis")
+
+# Model / ngôn ngữ cho người dùng chọn — sidebar app.py và api.py dùng chung
+MODEL_MAP = {
+    "⚡ Gemini 2.0 Flash (Khuyên dùng)": "gemini-2.0-flash",
+    "✨ Gemini 1.5 Flash":               "gemini-1.5-flash",
+    "🧠 Gemini 2.0 Pro":                 "gemini-2.0-pro-exp-02-05",
+}
+LANGS = ("Tiếng Việt", "English")
 
 
 def _build_ticker_prompt(ticker, lang, context, data):
@@ -119,91 +127,179 @@ def _build_general_prompt(query, lang):
 *⚠️ Phân tích tham khảo, không phải lời khuyên đầu tư.*"""
 
 
-def _call(api_key, model_name, prompt, use_search=True):
-    client = genai.Client(api_key=api_key)
-    
-    config = None
-    if use_search:
-        try:
-            # Khởi tạo công cụ Google Search cho genai SDK mới
-            google_search_tool = types.Tool(
-                google_search=types.GoogleSearch()
-            )
-            config = types.GenerateContentConfig(
-                tools=[google_search_tool]
-            )
-        except:
-            use_search = False
+# Field đổi theo từng phút giao dịch → không đưa vào khoá cache, nếu không
+# 2 người mở cùng mã cách nhau vài phút sẽ không bao giờ trúng cache
+_VOLATILE_FIELDS = ("price", "volume", "pe", "pb", "market_cap")
+
 
+def _cache_prompt(ticker, lang, context, mode, stock_data, initial_query):
+    if mode == "ticker":
+        stable = {k: v for k, v in (stock_data or {}).items() if k not in _VOLATILE_FIELDS}
+        return "ticker|" + _build_ticker_prompt(ticker, lang, context or "", stable)
+    return "general|" + _build_general_prompt(initial_query or context or "Nhận định thị trường", lang)
+
+
+def _open_stream(client, model_name, prompt, config=None):
+    """
+    Mở stream generate_content_stream và đọc tới chunk có chữ đầu tiên.
+    Mọi lỗi (429, 404 model, search tool...) đều nổ ở đây — TRƯỚC khi có gì
+    được hiển thị — nên logic retry/fallback giữ nguyên như bản blocking.
+    Trả về (chữ đầu tiên, iterator phần còn lại).
+    """
     if config:
-        response = client.models.generate_content(
+        stream = client.models.generate_content_stream(
             model=model_name,
             contents=prompt,
             config=config
         )
     else:
-        response = client.models.generate_content(
+        stream = client.models.generate_content_stream(
             model=model_name,
             contents=prompt
         )
 
-    text = ""
-    if hasattr(response, "text") and response.text:
-        text = response.text
+    it = iter(stream)
+    for chunk in it:
+        text = getattr(chunk, "text", None)
+        if text:
+            return text, it
 
-    if not text or len(text.strip()) < 10:
-        raise Exception(f"Response rỗng: {str(response)[:100]}")
-        
-    return text, use_search
+    raise Exception("Response rỗng: stream kết thúc không có nội dung")
+
+
+def _open_on_pool(pool, model_name, prompt, use_search, on_wait=None, config_for=None):
+    """
+    Chọn key trong pool (core.genai_pool), xếp hàng theo limiter của key đó
+    rồi mở stream. Key bị thu hồi (401/403) → loại, key bị 429 → lùi key đó;
+    cả 2 trường hợp thử ngay key khác trước khi báo lỗi cho người dùng.
+    config_for(kid, client) → config riêng theo key (vd context cache của chat).
+    Trả về (chữ đầu tiên, iterator, use_search).
+    """
+    config = None
+    if use_search:
+        try:
+            config = pool.search_config()
+        except:
+            use_search = False
+
+    tried, last = set(), None
+    while True:
+        try:
+            kid, client = pool.pick(model_name, exclude=tried)
+        except genai_pool.NoKeyAvailable:
+            if last is not None:
+                raise last
+            # chưa thử key nào = mọi key đều hết quota ngày
+            raise rate_limiter.QuotaExceeded(model_name, rate_limiter.seconds_to_reset(),
+                                             daily=True)
+        tried.add(kid)
+        rate_limiter.acquire(model_name, on_wait=on_wait, key=kid)
+        try:
+            cfg = config_for(kid, client) if config_for else config
+            first, it = _open_stream(client, model_name, prompt, cfg)
+            return first, it, use_search
+        except Exception as e:
+            err, last = str(e), e
+            if genai_pool.is_auth_error(err) and pool.drop(kid, err):
+                continue
+            if genai_pool.is_rate_error(err):
+                rate_limiter.penalize(model_name, rate_limiter.retry_after_from(err), key=kid)
+                if len(pool.alive) > len(tried):
+                    continue
+            raise
 
 
 def get_ai_analysis(ticker, lang="Tiếng Việt", model_name="gemini-2.0-flash",
-                    context="", mode="ticker", stock_data=None, initial_query=""):
+                    context="", mode="ticker", stock_data=None, initial_query="",
+                    use_cache=True):
+    """Bản blocking — gom toàn bộ stream thành 1 chuỗi."""
+    return "".join(stream_ai_analysis(ticker, lang, model_name, context, mode,
+                                      stock_data, initial_query, use_cache))
+
+
+def _queue_message(e) -> str:
+    if e.daily:
+        return (f"⏳ **Đã dùng hết quota hôm nay của {e.model}**\n\n"
+                f"Quota reset sau khoảng **{e.wait_s / 3600:.1f} giờ**. "
+                "Chuyển sang model khác (⚡ Flash) để tiếp tục.")
+    return (f"⏳ **Hàng đợi AI đang dài** — ước tính phải chờ **~{e.wait_s:.0f} giây** "
+            f"cho {e.model}.\n\nNhấn 🔄 Thử lại sau ít phút hoặc chuyển sang ⚡ Flash.")
+
+
+def stream_ai_analysis(ticker, lang="Tiếng Việt", model_name="gemini-2.0-flash",
+                       context="", mode="ticker", stock_data=None, initial_query="",
+                       use_cache=True, on_wait=None):
+    """
+    Generator các đoạn Markdown của bài phân tích (dùng với st.write_stream).
+    Lỗi / hướng dẫn / bài từ cache được yield thành 1 đoạn duy nhất.
+    on_wait(giây, số yêu cầu phía trước) — gọi khi phải xếp hàng chờ quota.
+    Nhiều phiên hỏi cùng 1 bài lúc đang tạo → dùng chung 1 lần gọi Gemini.
+    """
+    key = (model_name, lang, use_cache,
+           _cache_prompt(ticker, lang, context, mode, stock_data, initial_query))
+    return _AI_FLIGHT.stream(key, lambda ow: _stream_ai_analysis(
+        ticker, lang, model_name, context, mode, stock_data, initial_query, use_cache, ow),
+        on_wait)
+
+
+def _stream_ai_analysis(ticker, lang, model_name, context, mode, stock_data,
+                        initial_query, use_cache, on_wait):
     if not HAS_GENAI:
-        return "❌ **Thiếu `google-genai`** trong `requirements.txt`. Vui lòng cập nhật thư viện."
+        yield "❌ **Thiếu `google-genai`** trong `requirements.txt`. Vui lòng cập nhật thư viện."
+        return
 
-    # Lấy API key từ Secrets
-    api_key = None
-    try:
-        api_key = (st.secrets.get("GOOGLE_API_KEY")
-                   or st.secrets.get("google_api_key")
-                   or st.secrets.get("GEMINI_API_KEY"))
-    except:
-        pass
+    pool = genai_pool.get_pool()
 
-    if not api_key:
-        return """❌ **Chưa có API Key trong Streamlit Secrets**
+    if pool is None:
+        yield """❌ **Chưa có API Key trong Streamlit Secrets**
 
 **Cách thêm / cập nhật key mới:**
 1. Vào trang app Streamlit → **⋮ (3 chấm)** → **Settings**
 2. Chọn tab **Secrets**
 3. Thêm / sửa:
 GOOGLE_API_KEY = "AIzaSy...key_mới_của_bạn..."
+(nhiều key: GOOGLE_API_KEYS = ["AIza...1", "AIza...2"])
 
 4. Nhấn **Save** → App tự **Reboot**
 5. Sau khi reboot xong → thử lại
 
 Lấy key miễn phí: [https://aistudio.google.com/](https://aistudio.google.com/)"""
+        return
 
     prompt = (_build_ticker_prompt(ticker, lang, context or "", stock_data or {})
               if mode == "ticker" else
               _build_general_prompt(initial_query or context or "Nhận định thị trường", lang))
 
+    cache_key = None
+    if use_cache:
+        try:
+            cache_key = ai_cache.make_key(
+                _cache_prompt(ticker, lang, context, mode, stock_data, initial_query),
+                model_name, lang)
+            cached = ai_cache.get(cache_key)
+            if cached:
+                yield cached
+                return
+        except Exception:
+            cache_key = None        # đĩa lỗi / read-only → gọi thẳng Gemini
+
     last_err = ""
     for attempt in range(2):
         for use_search in [True, False]:
             try:
-                text, searched = _call(api_key, model_name, prompt, use_search)
-                badge = "🔍 *Google Search + AI*" if searched else "🤖 *AI*"
-                return f"{badge} | ***{model_name}***\n\n---\n\n{text}"
+                first, chunks, searched = _open_on_pool(pool, model_name, prompt,
+                                                        use_search, on_wait)
+            except rate_limiter.QuotaExceeded as e:
+                yield _queue_message(e)
+                return
             except Exception as e:
                 err = str(e); el = err.lower(); last_err = err
 
                 if any(x in el for x in ["429", "quota", "resource_exhausted", "rate"]):
+                    # Mọi key đều 429 (đã penalize trong _open_on_pool) → lượt sau xếp hàng
                     if attempt == 0:
-                        time.sleep(35)
-                        break  # Thử lại vòng attempt=1
-                    return (
+                        break  # Thử lại vòng attempt=1 (acquire sẽ chờ hết retryDelay)
+                    yield (
                         "⏳ **AI Rate Limit — Hết quota tạm thời**\n\n"
                         "**Nguyên nhân thường gặp:**\n"
                         "- Gọi API quá nhiều lần liên tiếp\n"
@@ -216,9 +312,10 @@ Lấy key miễn phí: [https://aistudio.google.com/](https://aistudio.google.co
                         "Flash miễn phí: 15 req/phút, 1,500 req/ngày\n"
                         "Tạo key mới: [https://aistudio.google.com/](https://aistudio.google.com/)"
                     )
+                    return
 
                 if any(x in el for x in ["api_key", "invalid", "401", "403", "unauthorized"]):
-                    return (
+                    yield (
                         "🔑 **API Key không hợp lệ hoặc bị thu hồi**\n\n"
                         "**Cách fix:**\n"
                         "1. Vào [https://aistudio.google.com/](https://aistudio.google.com/) → tạo key mới\n"
@@ -226,13 +323,15 @@ Lấy key miễn phí: [https://aistudio.google.com/](https://aistudio.google.co
                         "3. Cập nhật GOOGLE_API_KEY = \"key_mới\"\n"
                         "4. **Save** → đợi app reboot"
                     )
+                    return
 
                 if "not found" in el or "404" in err:
                     model_name = "gemini-1.5-flash"
                     continue
 
                 if any(x in el for x in ["network", "timeout", "connect", "ssl"]):
-                    return "🌐 **Lỗi kết nối mạng.** Thử lại sau 10 giây."
+                    yield "🌐 **Lỗi kết nối mạng.** Thử lại sau 10 giây."
+                    return
 
                 if any(x in el for x in ["tool", "grounding", "search", "function"]):
                     continue  # Thử lại không có search
@@ -240,5 +339,24 @@ Lấy key miễn phí: [https://aistudio.google.com/](https://aistudio.google.co
                 last_err = err
                 continue
 
-    return (f"⚠️ **Lỗi không xác định:**\n{last_err[:300]}\n\n"
+            # ── Đã có chunk đầu → từ đây chỉ stream tiếp, không retry nữa ──
+            badge = "🔍 *Google Search + AI*" if searched else "🤖 *AI*"
+            parts = [f"{badge} | ***{model_name}***\n\n---\n\n", first]
+            yield parts[0]
+            yield first
+            try:
+                for chunk in chunks:
+                    text = getattr(chunk, "text", None)
+                    if text:
+                        parts.append(text)
+                        yield text
+            except Exception:
+                yield "\n\n⚠️ *Kết nối bị ngắt giữa chừng — nhấn 🔄 Thử lại để tải lại đầy đủ.*"
+                return              # bài dở dang → không lưu cache
+            if cache_key:
+                try: ai_cache.put(cache_key, "".join(parts))
+                except Exception: pass
+            return
+
+    yield (f"⚠️ **Lỗi không xác định:**\n{last_err[:300]}\n\n"
             "Đợi 1–2 phút rồi nhấn 🔄 Thử lại.")
@@ -0,0 +1,213 @@
+"""
+core/batch_fetcher.py — Snapshot nhiều mã cùng lúc (watchlist, VN30, screener)
+
+get_stock_data() chỉ xử lý 1 mã / 1 lần history. Với watchlist 30–100 mã:
+  - Giá: 1 lần yf.download cho CẢ danh sách (cache QUOTE_TTL)
+  - Cơ bản: lấy từ các lớp cache của data_fetcher (.info, fast_info, BCTC),
+    chạy trên cùng _POOL với 1 deadline chung; mã nào chưa kịp → NaN + lỗi
+  - Kết quả dạng cột: DataFrame index = ticker, kèm dict lỗi theo mã
+  - Dạng mã Yahoo qua core.symbol_resolver: dạng ưu tiên của từng mã, mã
+    trong cache âm bị bỏ qua; lô không dò mã trần và không ghi gì vào
+    resolver trừ cache âm đã được kiểm tra riêng từng mã
+
+    df, errors = get_batch_snapshot(VN30, region="VN")
+"""
+import time
+from concurrent.futures import wait
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import yfinance as yf
+
+from core import latency, symbol_resolver
+from core.data_fetcher import (
+    REGION_SUFFIX, QUOTE_TTL, DEADLINE_S, _POOL, _LayerMiss,
+    _STOCK_SOURCES, _parse_quote, _statement_metrics, _safe, _f, _i, _pick,
+    _remaining,
+)
+
+VN30 = [
+    "ACB", "BCM", "BID", "BVH", "CTG", "FPT", "GAS", "GVR", "HDB", "HPG",
+    "LPB", "MBB", "MSN", "MWG", "PLX", "SAB", "SHB", "SSB", "SSI", "STB",
+    "TCB", "TPB", "VCB", "VHM", "VIB", "VIC", "VJC", "VNM", "VPB", "VRE",
+]
+
+RECHECK_MAX = 5     # mã vắng trong 1 lô được kiểm tra riêng (nhiều hơn = lô bị rate limit)
+
+SNAPSHOT_COLUMNS = [
+    "price", "open_price", "high_price", "low_price", "volume", "ref_price",
+    "price_change", "price_change_pct",
+    "pe", "pb", "eps", "bvps", "roe", "roa", "market_cap",
+    "industry", "market",
+]
+
+
+@st.cache_data(ttl=QUOTE_TTL, show_spinner=False)
+def _batch_quotes(symbols: tuple) -> pd.DataFrame:
+    """1 lần yf.download(5d) cho cả danh sách → bảng quote, index = mã Yahoo."""
+    raw = None
+    with latency.span("batch_download") as sp:
+        for attempt in range(3):
+            if attempt:
+                sp.retries += 1
+            try:
+                raw = yf.download(list(symbols), period="5d", group_by="ticker",
+                                  progress=False, threads=True, timeout=12)
+                break
+            except Exception as e:
+                err = str(e).lower()
+                if ("ratelimit" in err or "429" in err or "too many" in err) and attempt < 2:
+                    sp.sleep((attempt + 1) * 4)
+                else:
+                    sp.outcome = "error"
+                    break
+        if sp.outcome == "ok" and (raw is None or raw.empty):
+            sp.outcome = "empty"
+    if raw is None or raw.empty:
+        raise _LayerMiss()
+
+    rows = {}
+    for sym in symbols:
+        try:
+            df = raw[sym] if isinstance(raw.columns, pd.MultiIndex) else raw
+            df = df.dropna(subset=["Close"])
+            if not df.empty:
+                rows[sym] = _parse_quote(df)
+        except (KeyError, ValueError):
+            pass
+    if not rows:
+        raise _LayerMiss()
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def _recheck(sym: str):
+    """
+    1 lần history(5d) riêng cho mã vắng trong lô → (quote | None, chắc chắn
+    không tồn tại?). Lỗi mạng / 429 / timeout → (None, False): chỉ là lỗi tạm.
+    """
+    with latency.span("history_attempt", form="recheck") as sp:
+        try:
+            df = yf.Ticker(sym).history(period="5d", timeout=12)
+        except Exception as e:
+            sp.outcome = "error"
+            return None, symbol_resolver.is_not_found_error(str(e))
+        df = df.dropna(subset=["Close"]) if df is not None and not df.empty else None
+        if df is None or df.empty:
+            sp.outcome = "empty"
+            return None, True
+    return _parse_quote(df), False
+
+
+def _resolve_quotes(tickers, suffix: str):
+    """
+    ({ticker: mã Yahoo có giá}, bảng quote, {ticker: lỗi}). 1 lần yf.download
+    cho dạng mã ưu tiên của mọi mã (symbol_resolver.preferred) — KHÔNG thử mã
+    trần (ACB, MBB, VRE... trần là mã Mỹ) và không remember() gì từ lô.
+    yf.download trả cột NaN cả khi 1 mã bị 429 / timeout → mã vắng trong lô
+    chỉ bị cache âm khi _recheck riêng từng mã xác nhận không tồn tại; quá
+    RECHECK_MAX mã vắng (lô bị rate limit) → không recheck, báo lỗi tạm.
+    """
+    sym_of, errors, forms = {}, {}, {}
+    for t in tickers:
+        if symbol_resolver.is_unknown(t, suffix):
+            errors[t] = "Không tìm thấy mã"
+        else:
+            forms[t] = symbol_resolver.preferred(t, suffix)
+    q = _safe(_batch_quotes, tuple(sorted(set(forms.values())))) if forms else None
+    rows = {} if q is None else q.to_dict("index")
+    missing = [t for t in forms if forms[t] not in rows]
+    for t in forms:
+        if forms[t] in rows:
+            sym_of[t] = forms[t]
+    if q is not None and len(missing) <= RECHECK_MAX:
+        for t in missing:
+            quote, not_found = _recheck(forms[t])
+            if quote:
+                rows[forms[t]] = quote
+                sym_of[t] = forms[t]
+            elif not_found:
+                symbol_resolver.mark_unknown(t, suffix)
+                errors[t] = "Không tìm thấy mã"
+    for t in forms:
+        if t not in sym_of and t not in errors:
+            errors[t] = "Không có dữ liệu giá"
+    return sym_of, pd.DataFrame.from_dict(rows, orient="index"), errors
+
+
+def _normalize_tickers(tickers) -> list:
+    seen, out = set(), []
+    for t in tickers:
+        t = str(t).upper().strip()
+        if t and t not in seen:
+            seen.add(t)
+            out.append(t)
+    return out
+
+
+def _fundamental_row(price: float, layers: dict) -> dict:
+    """Các chỉ số cơ bản cho 1 mã từ .info + BCTC (cùng công thức get_stock_data)."""
+    info   = layers.get("info") or {}
+    shares = _pick(layers.get("fast_info"), _i(info.get("sharesOutstanding"), lo=1000))
+    sm     = _statement_metrics(layers.get("income_stmt"), layers.get("balance_sheet"),
+                                shares, price)
+    roe_r, roa_r = info.get("returnOnEquity"), info.get("returnOnAssets")
+    return {
+        "pe":   _pick(_f(info.get("trailingPE")), _f(info.get("forwardPE")), sm["pe_calc"]),
+        "pb":   _pick(_f(info.get("priceToBook")), sm["pb_calc"]),
+        "eps":  _pick(_f(info.get("trailingEps"), lo=-1e9, hi=1e9), sm["eps_stmt"]),
+        "bvps": _pick(_f(info.get("bookValue")), sm["bvps_stmt"]),
+        "roe":  _pick(round(float(roe_r)*100, 2) if roe_r else None, sm["roe_stmt"]),
+        "roa":  _pick(round(float(roa_r)*100, 2) if roa_r else None, sm["roa_stmt"]),
+        "market_cap": round(shares * price / 1e9, 2) if shares else None,
+        "industry": info.get("industry") or info.get("sector"),
+        "market":   (info.get("exchange") or "").replace("HSX", "HOSE").replace("VNM", "HOSE") or None,
+    }
+
+
+def get_batch_snapshot(tickers, region: str = "VN", fundamentals: bool = True,
+                       deadline: float = DEADLINE_S):
+    """
+    Trả về (DataFrame, errors):
+      DataFrame — index `ticker`, cột SNAPSHOT_COLUMNS, thiếu = NaN/None
+      errors    — {ticker: lý do} cho mã không có giá hoặc thiếu chỉ số cơ bản
+    fundamentals=False → chỉ giá (1 request duy nhất), dùng cho watchlist sidebar.
+    """
+    tickers = _normalize_tickers(tickers)
+    if not tickers:
+        return pd.DataFrame(columns=SNAPSHOT_COLUMNS).rename_axis("ticker"), {}
+    sym_of, quotes, errors = _resolve_quotes(tickers, REGION_SUFFIX.get(region, ""))
+
+    rows = {}
+    for t in tickers:
+        if t not in sym_of:
+            continue
+        q   = quotes.loc[sym_of[t]].to_dict()
+        ref = q["prev"]
+        rows[t] = {
+            "price": q["price"], "open_price": q["open"], "high_price": q["high"],
+            "low_price": q["low"], "volume": q["volume"], "ref_price": ref,
+            "price_change":     round(q["price"] - ref, 2) if ref else 0.0,
+            "price_change_pct": round((q["price"] - ref) / ref * 100, 2) if ref else 0.0,
+        }
+
+    if fundamentals and rows:
+        t_end = time.monotonic() + deadline
+        futs  = {(t, name): _POOL.submit(_safe, fn, sym_of[t])
+                 for t in rows for name, fn in _STOCK_SOURCES.items()}
+        done, _ = wait(futs.values(), timeout=_remaining(t_end))
+        for t in rows:
+            layers, late = {}, False
+            for name in _STOCK_SOURCES:
+                f = futs[(t, name)]
+                if f in done: layers[name] = f.result()
+                else:         late = True
+            if late:
+                errors[t] = "Chỉ số cơ bản chưa kịp tải (quá deadline)"
+            rows[t].update(_fundamental_row(rows[t]["price"], layers))
+
+    df = pd.DataFrame.from_dict(rows, orient="index").reindex(columns=SNAPSHOT_COLUMNS)
+    df.index.name = "ticker"
+    num = [c for c in SNAPSHOT_COLUMNS if c not in ("industry", "market")]
+    df[num] = df[num].apply(pd.to_numeric, errors="coerce").astype(np.float64)
+    return df, errors
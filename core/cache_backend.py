@@ -0,0 +1,498 @@
+"""
+core/cache_backend.py — Cache dùng chung giữa các replica và qua các lần restart
+
+st.cache_data chỉ sống trong 1 tiến trình: nhiều replica / Streamlit Cloud
+reboot (đổi secrets) → cache lạnh hết, cả cụm cùng dồn vào yfinance. Lớp này
+đặt phía SAU st.cache_data (bộ nhớ, nhanh) và TRƯỚC lời gọi mạng:
+
+    @st.cache_data(ttl=60)                       # L1: trong tiến trình
+    @shared_cache("stock", ttl=60)               # L2: backend chung
+    @singleflight("get_stock_data")              # gộp miss đồng thời
+    def get_stock_data(...): ...
+
+Backend (chọn qua LBCK_CACHE_URL hoặc secrets CACHE_URL):
+  memory://                → MemoryBackend  (LRU theo dung lượng, trong tiến trình)
+  disk:// (mặc định)       → DiskBackend    (SQLite trong .cache/, LRU theo dung lượng)
+  redis://host:port/db     → RedisBackend   (giao thức RESP qua socket, không cần
+                                             thư viện redis; lỗi → coi như miss,
+                                             có circuit breaker)
+
+Giá trị được đóng gói có phiên bản: MAGIC + SERIAL_VERSION + JSON. Đổi
+SERIAL_VERSION → mọi entry cũ tự thành miss (khoá cũng mang số phiên bản).
+Không dùng pickle: store chung (Redis / file) mà bị ghi bậy thì pickle.loads
+= chạy code tuỳ ý trên mọi replica. JSON chỉ dựng lại được dữ liệu thuần:
+dict / list / str / số / bool / None, tuple và DataFrame được gắn thẻ
+(DataFrame qua to_json orient="table" — giữ index, tên cột, kiểu dữ liệu).
+Kiểu khác → set() bỏ qua (đếm vào "error"), không cache.
+"""
+import abc
+import functools
+import hashlib
+import io
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+from core.circuit_breaker import breaker_for, CircuitOpenError
+from core.ohlcv_store import CACHE_DIR
+
+SERIAL_VERSION = 2     # 1 = pickle (bỏ)
+MAGIC          = b"LBCK"
+MAX_BYTES      = int(float(os.environ.get("LBCK_CACHE_MB", 200)) * 1024 * 1024)
+REDIS_TIMEOUT  = 0.5
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  ĐÓNG GÓI
+# ══════════════════════════════════════════════════════════════════════════════
+_TAGS = ("__tuple__", "__df__", "__items__")
+
+
+def _enc(v):
+    if v is None or isinstance(v, (str, bool, int, float)):
+        return v
+    if isinstance(v, np.generic):
+        return v.item()
+    if isinstance(v, (list, tuple)):
+        items = [_enc(x) for x in v]
+        return {"__tuple__": items} if isinstance(v, tuple) else items
+    if isinstance(v, dict):
+        if all(isinstance(k, str) for k in v) and not any(t in v for t in _TAGS):
+            return {k: _enc(x) for k, x in v.items()}
+        return {"__items__": [[_enc(k), _enc(x)] for k, x in v.items()]}
+    if isinstance(v, pd.DataFrame):
+        return {"__df__": v.to_json(orient="table", date_unit="ns")}
+    raise TypeError(f"không cache được kiểu {type(v).__name__}")
+
+
+def _dec(v):
+    if isinstance(v, list):
+        return [_dec(x) for x in v]
+    if not isinstance(v, dict):
+        return v
+    if "__tuple__" in v:
+        return tuple(_dec(x) for x in v["__tuple__"])
+    if "__df__" in v:
+        return pd.read_json(io.StringIO(v["__df__"]), orient="table")
+    if "__items__" in v:
+        return {_key(_dec(k)): _dec(x) for k, x in v["__items__"]}
+    return {k: _dec(x) for k, x in v.items()}
+
+
+def _key(k):
+    return tuple(_key(x) for x in k) if isinstance(k, (list, tuple)) else k
+
+
+def dumps(value) -> bytes:
+    return MAGIC + bytes([SERIAL_VERSION]) + json.dumps(
+        _enc(value), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(blob: bytes):
+    """Giá trị gốc, hoặc _MISS nếu sai định dạng / khác phiên bản / hỏng."""
+    if not blob or blob[:4] != MAGIC or blob[4] != SERIAL_VERSION:
+        return _MISS
+    try:
+        return _dec(json.loads(blob[5:].decode("utf-8")))
+    except Exception:
+        return _MISS
+
+
+_MISS = object()
+
+
+def make_key(namespace: str, key) -> str:
+    digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32]
+    return f"lbck:v{SERIAL_VERSION}:{namespace}:{digest}"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  BACKEND
+# ══════════════════════════════════════════════════════════════════════════════
+class CacheBackend(abc.ABC):
+    """Giao diện chung: bytes vào / bytes ra, TTL tính bằng giây."""
+    name = "base"
+
+    def __init__(self):
+        self._stats = {"hit": 0, "miss": 0, "set": 0, "error": 0, "evicted": 0}
+
+    @abc.abstractmethod
+    def get_bytes(self, key: str):
+        """blob, hoặc None nếu không có / hết hạn."""
+
+    @abc.abstractmethod
+    def set_bytes(self, key: str, blob: bytes, ttl: float):
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abc.abstractmethod
+    def clear(self):
+        ...
+
+    def get(self, key: str, default=None):
+        try:
+            blob = self.get_bytes(key)
+        except Exception:
+            self._stats["error"] += 1
+            blob = None
+        value = loads(blob) if blob is not None else _MISS
+        if value is _MISS:
+            self._stats["miss"] += 1
+            return default
+        self._stats["hit"] += 1
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        try:
+            self.set_bytes(key, dumps(value), ttl)
+            self._stats["set"] += 1
+        except Exception:
+            self._stats["error"] += 1
+
+    def stats(self) -> dict:
+        return {"backend": self.name, **self._stats}
+
+
+class MemoryBackend(CacheBackend):
+    name = "memory"
+
+    def __init__(self, max_bytes: int = MAX_BYTES, clock=time.time):
+        super().__init__()
+        self.max_bytes, self._clock = max_bytes, clock
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()     # key → (hết hạn, blob)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_bytes(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= self._clock():
+                self._bytes -= len(self._data.pop(key)[1])
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set_bytes(self, key, blob, ttl):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old:
+                self._bytes -= len(old[1])
+            self._data[key] = (self._clock() + ttl, blob)
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes and len(self._data) > 1:
+                _, (_, b) = self._data.popitem(last=False)
+                self._bytes -= len(b)
+                self._stats["evicted"] += 1
+
+    def delete(self, key):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old:
+                self._bytes -= len(old[1])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {**super().stats(), "entries": len(self._data), "bytes": self._bytes}
+
+
+class DiskBackend(CacheBackend):
+    """SQLite (WAL) — chung cho mọi tiến trình trên cùng máy, còn sau restart."""
+    name = "disk"
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS kv (
+        key      TEXT PRIMARY KEY,
+        expires  REAL NOT NULL,
+        accessed REAL NOT NULL,
+        size     INTEGER NOT NULL,
+        value    BLOB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_kv_accessed ON kv(accessed);
+    """
+
+    def __init__(self, path: str = None, max_bytes: int = MAX_BYTES, clock=time.time):
+        super().__init__()
+        self.path = path or os.path.join(CACHE_DIR, "shared_cache.sqlite")
+        self.max_bytes, self._clock = max_bytes, clock
+        self._lock = threading.Lock()
+        self._init_done = False
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        con = sqlite3.connect(self.path, timeout=15)
+        if not self._init_done:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(self._SCHEMA)
+            self._init_done = True
+        return con
+
+    def get_bytes(self, key):
+        now = self._clock()
+        with self._lock:
+            con = self._connect()
+            try:
+                row = con.execute("SELECT expires, value FROM kv WHERE key=?", (key,)).fetchone()
+                if row is None:
+                    return None
+                with con:
+                    if row[0] <= now:
+                        con.execute("DELETE FROM kv WHERE key=?", (key,))
+                        return None
+                    con.execute("UPDATE kv SET accessed=? WHERE key=?", (now, key))
+                return bytes(row[1])
+            finally:
+                con.close()
+
+    def set_bytes(self, key, blob, ttl):
+        now = self._clock()
+        with self._lock:
+            con = self._connect()
+            try:
+                with con:
+                    con.execute("INSERT OR REPLACE INTO kv VALUES (?,?,?,?,?)",
+                                (key, now + ttl, now, len(blob), sqlite3.Binary(blob)))
+                    total = con.execute("SELECT COALESCE(SUM(size),0) FROM kv").fetchone()[0]
+                    if total > self.max_bytes:
+                        con.execute("DELETE FROM kv WHERE expires<=?", (now,))
+                        total = con.execute("SELECT COALESCE(SUM(size),0) FROM kv").fetchone()[0]
+                    if total > self.max_bytes:
+                        for k, sz in con.execute(
+                                "SELECT key, size FROM kv ORDER BY accessed").fetchall():
+                            if total <= self.max_bytes or k == key:
+                                break
+                            con.execute("DELETE FROM kv WHERE key=?", (k,))
+                            total -= sz
+                            self._stats["evicted"] += 1
+            finally:
+                con.close()
+
+    def delete(self, key):
+        with self._lock:
+            con = self._connect()
+            try:
+                with con:
+                    con.execute("DELETE FROM kv WHERE key=?", (key,))
+            finally:
+                con.close()
+
+    def clear(self):
+        with self._lock:
+            con = self._connect()
+            try:
+                with con:
+                    con.execute("DELETE FROM kv")
+            finally:
+                con.close()
+
+    def stats(self):
+        with self._lock:
+            con = self._connect()
+            try:
+                n, size = con.execute("SELECT COUNT(*), COALESCE(SUM(size),0) FROM kv").fetchone()
+            finally:
+                con.close()
+        return {**super().stats(), "entries": n, "bytes": size}
+
+
+class RedisBackend(CacheBackend):
+    """
+    Client RESP tối giản (GET / SET PX / DEL / FLUSHDB + AUTH / SELECT) trên 1
+    socket keep-alive. Redis chết → lỗi được nuốt (= miss) và breaker mở để
+    không chờ timeout ở mọi request.
+    """
+    name = "redis"
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", timeout: float = REDIS_TIMEOUT):
+        super().__init__()
+        u = urlparse(url)
+        self.host, self.port = u.hostname or "127.0.0.1", u.port or 6379
+        self.db       = int((u.path or "/0").lstrip("/") or 0)
+        self.password = u.password
+        self.timeout  = timeout
+        self._sock, self._buf = None, b""
+        self._lock    = threading.Lock()
+        self._breaker = breaker_for(f"redis:{self.host}:{self.port}")
+
+    # ── RESP ────────────────────────────────────────────────────────────────
+    def _connect(self):
+        s = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock, self._buf = s, b""
+        if self.password:
+            self._roundtrip("AUTH", self.password)
+        if self.db:
+            self._roundtrip("SELECT", str(self.db))
+
+    def _readline(self) -> bytes:
+        while b"\r\n" not in self._buf:
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("redis closed connection")
+            self._buf += chunk
+        line, self._buf = self._buf.split(b"\r\n", 1)
+        return line
+
+    def _readexact(self, n: int) -> bytes:
+        while len(self._buf) < n + 2:
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("redis closed connection")
+            self._buf += chunk
+        data, self._buf = self._buf[:n], self._buf[n + 2:]
+        return data
+
+    def _reply(self):
+        line = self._readline()
+        kind, rest = line[:1], line[1:]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            return None if n < 0 else self._readexact(n)
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._reply() for _ in range(n)]
+        raise RuntimeError(f"RESP không hợp lệ: {line[:40]!r}")
+
+    def _roundtrip(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for a in args:
+            b = a if isinstance(a, bytes) else str(a).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(b), b))
+        self._sock.sendall(b"".join(parts))
+        return self._reply()
+
+    def command(self, *args):
+        self._breaker.before_call()
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                out = self._roundtrip(*args)
+            except RuntimeError:
+                # lỗi lệnh (-ERR) — kết nối vẫn tốt; phải báo breaker, nếu không
+                # lượt thử half-open không bao giờ kết thúc → Redis bị chặn mãi
+                self._breaker.record_success()
+                raise
+            except Exception:
+                try: self._sock and self._sock.close()
+                except Exception: pass
+                self._sock = None
+                self._breaker.record_failure()
+                raise
+        self._breaker.record_success()
+        return out
+
+    # ── Giao diện ───────────────────────────────────────────────────────────
+    def get_bytes(self, key):
+        try:
+            return self.command("GET", key)
+        except CircuitOpenError:
+            return None
+
+    def set_bytes(self, key, blob, ttl):
+        try:
+            self.command("SET", key, blob, "PX", str(max(1, int(ttl * 1000))))
+        except CircuitOpenError:
+            pass
+
+    def delete(self, key):
+        self.command("DEL", key)
+
+    def clear(self):
+        self.command("FLUSHDB")
+
+    def stats(self):
+        return {**super().stats(), "url": f"redis://{self.host}:{self.port}/{self.db}",
+                "breaker": self._breaker.state}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CHỌN BACKEND + DECORATOR
+# ══════════════════════════════════════════════════════════════════════════════
+def from_url(url: str) -> CacheBackend:
+    scheme = urlparse(url).scheme or url.rstrip(":/")
+    if scheme in ("redis", "rediss"):
+        return RedisBackend(url)
+    if scheme == "memory":
+        return MemoryBackend()
+    if scheme == "disk":
+        path = urlparse(url).path
+        return DiskBackend(path or None)
+    raise ValueError(f"cache backend không hỗ trợ: {url}")
+
+
+def _configured_url() -> str:
+    url = os.environ.get("LBCK_CACHE_URL")
+    if url:
+        return url
+    try:
+        import streamlit as st
+        return st.secrets.get("CACHE_URL") or "disk://"
+    except Exception:
+        return "disk://"
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default() -> CacheBackend:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = from_url(_configured_url())
+        return _default
+
+
+def set_default(backend: CacheBackend):
+    global _default
+    with _default_lock:
+        _default = backend
+
+
+def shared_cache(namespace: str, ttl: float, cache_if=None):
+    """
+    Decorator: tra backend chung trước khi chạy hàm. Exception không được
+    cache; cache_if(kết quả) → False thì cũng không lưu (vd dict có "error").
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            backend = default()
+            key = make_key(namespace, (args, tuple(sorted(kwargs.items()))))
+            hit = backend.get(key, _MISS)
+            if hit is not _MISS:
+                return hit
+            value = fn(*args, **kwargs)
+            if cache_if is None or cache_if(value):
+                backend.set(key, value, ttl)
+            return value
+        return wrapper
+    return deco
+
+
+def stats() -> dict:
+    return default().stats()
@@ -0,0 +1,199 @@
+"""
+core/cache_warmer.py — Luồng nền giữ ấm cache cho các mã "nóng"
+
+Trước: dữ liệu chỉ được tải trong request của người dùng → người đầu tiên
+mở mỗi mã luôn chịu trọn thời gian tải lạnh. Warmer chạy 1 luồng nền / tiến
+trình, giữ ấm:
+  - Tập nóng = VN30 + TOP_N mã được tra nhiều nhất (đếm qua record_access)
+               + LBCK_WARM_EXTRA ("HPG,VNM:VN,AAPL:US")
+  - get_stock_data (quote + các lớp cơ bản) và kho nến ohlcv_store
+  - Nhịp theo giờ sàn HOSE (giờ VN): trong phiên làm mới quote theo
+    QUOTE_TTL; nghỉ trưa / ngoài giờ / cuối tuần thưa dần. Đổi pha (vd vừa
+    đóng cửa) → làm mới tất cả 1 lượt để lấy giá chốt phiên
+  - Ngân sách Yahoo dùng chung với request người dùng (data_fetcher.YAHOO,
+    tính theo từng request thật, không theo lần gọi get_stock_data): chỉ gọi
+    khi limiter có khe trống → tự nhường khi người dùng đang tải
+  - Trong phiên chỉ làm mới quote cho quote_capacity() mã nóng nhất — số mã
+    làm mới được trong 1 QUOTE_TTL với WARM_SHARE ngân sách → 1 lượt xong
+    trước khi quote hết hạn, thay vì lượt dài hơn TTL và quote "ấm" đã hết hạn
+
+    cache_warmer.start()                      # 1 lần trong app.py
+    cache_warmer.record_access("FPT", "VN")   # mỗi lần tra mã
+"""
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, time as dtime, timedelta, timezone
+
+import streamlit as st
+
+from core import ohlcv_store
+from core.batch_fetcher import VN30
+from core.data_fetcher import get_stock_data, QUOTE_TTL, REGION_SUFFIX, YAHOO
+
+ENABLED          = os.environ.get("LBCK_WARM", "1") != "0"
+TOP_N            = int(os.environ.get("LBCK_WARM_TOP", 20))
+WARM_SHARE       = float(os.environ.get("LBCK_WARM_SHARE", 0.5))   # phần ngân sách Yahoo cho warmer
+HISTORY_PERIOD   = "5y"         # = chart_ui.CHART_MAX_PERIOD
+TICK_S           = 10
+
+_VN_TZ   = timezone(timedelta(hours=7))
+SESSIONS = ((dtime(9, 0), dtime(11, 30)), (dtime(13, 0), dtime(15, 0)))
+
+# pha → (chu kỳ quote, chu kỳ nến) tính bằng giây
+CADENCE = {
+    "session": (QUOTE_TTL,   15 * 60),
+    "break":   (15 * 60,     30 * 60),
+    "closed":  (30 * 60,   6 * 3600),
+    "weekend": (6 * 3600, 24 * 3600),
+}
+
+
+def market_phase(now: datetime = None) -> str:
+    now = (now or datetime.now(timezone.utc)).astimezone(_VN_TZ)
+    if now.weekday() >= 5:
+        return "weekend"
+    t = now.time()
+    if any(a <= t < b for a, b in SESSIONS):
+        return "session"
+    if SESSIONS[0][1] <= t < SESSIONS[1][0]:
+        return "break"
+    return "closed"
+
+
+def _parse_extra(raw: str) -> list:
+    out = []
+    for item in filter(None, (x.strip().upper() for x in raw.split(","))):
+        t, _, r = item.partition(":")
+        out.append((t, r or "VN"))
+    return out
+
+
+class Warmer:
+    def __init__(self, base=None, top_n: int = TOP_N, budget=None, share: float = WARM_SHARE,
+                 fetch_quote=None, fetch_history=None, clock=time.monotonic, sleep=time.sleep):
+        self.base   = list(base if base is not None else
+                           [(t, "VN") for t in VN30] + _parse_extra(os.environ.get("LBCK_WARM_EXTRA", "")))
+        self.top_n  = top_n
+        self.budget = budget or YAHOO
+        self.share  = share
+        self._fetch_quote   = fetch_quote or (lambda t, r: get_stock_data(t, region=r))
+        self._fetch_history = fetch_history or (
+            lambda t, r: ohlcv_store.get_history(f"{t}{REGION_SUFFIX.get(r, '')}", HISTORY_PERIOD))
+        self._clock, self._sleep = clock, sleep
+        self._hits   = Counter()
+        self._last_q, self._last_h = {}, {}
+        self._phase  = None
+        self._lock   = threading.Lock()
+        self._stop   = threading.Event()
+        self._thread = None
+        self._stats  = {"quotes": 0, "histories": 0, "errors": 0, "cycles": 0,
+                        "last_cycle_s": 0.0, "phase": None, "quote_capacity": 0,
+                        "budget_wait_s": 0.0}
+
+    # ── Tập nóng ────────────────────────────────────────────────────────────
+    def record_access(self, ticker: str, region: str = "VN"):
+        with self._lock:
+            self._hits[(ticker.upper(), region)] += 1
+
+    def hot_set(self) -> list:
+        """Mã được tra nhiều nhất trước (ấm trước), rồi tới danh sách cố định."""
+        with self._lock:
+            top = [k for k, _ in self._hits.most_common(self.top_n)]
+        seen, out = set(), []
+        for k in top + self.base:
+            if k not in seen:
+                seen.add(k)
+                out.append(k)
+        return out
+
+    def quote_capacity(self, q_every: float) -> int:
+        """Số mã làm mới quote được trong q_every giây (~1 request / mã khi lớp cơ bản còn hạn)."""
+        return max(1, int(self.budget.rpm * q_every / 60 * self.share))
+
+    # ── Vòng chạy ────────────────────────────────────────────────────────────
+    def _wait_budget(self) -> bool:
+        while not self._stop.is_set():
+            w = self.budget.ready_in()
+            if w <= 0:
+                return True
+            w = min(w, TICK_S)
+            self._stats["budget_wait_s"] = round(self._stats["budget_wait_s"] + w, 1)
+            self._sleep(w)
+        return False
+
+    def _warm(self, kind, fn, key):
+        if not self._wait_budget():
+            return
+        try:
+            fn(*key)                        # request thật tự trừ vào self.budget
+            self._stats[kind] += 1
+        except Exception:
+            self._stats["errors"] += 1      # lỗi → đợi chu kỳ sau, không thử dồn
+
+    def run_once(self, now: datetime = None):
+        """1 lượt: làm ấm mọi mã đã tới hạn theo pha thị trường hiện tại."""
+        phase = market_phase(now)
+        if phase != self._phase:
+            self._last_q.clear()
+            self._last_h.clear()
+            self._phase = self._stats["phase"] = phase
+        q_every, h_every = CADENCE[phase]
+        hot  = self.hot_set()
+        quoted = set(hot[:self.quote_capacity(q_every)])
+        self._stats["quote_capacity"] = len(quoted)
+        t0 = self._clock()
+        for key in hot[:len(quoted)]:                   # quote trước: lượt quote < q_every
+            if self._stop.is_set():
+                return
+            if self._clock() - self._last_q.get(key, -1e18) >= q_every:
+                self._last_q[key] = self._clock()
+                self._warm("quotes", self._fetch_quote, key)
+        for key in hot:                                 # lịch sử: phần còn lại của q_every,
+            if self._stop.is_set() or self._clock() - t0 >= q_every:   # dư → lượt sau
+                break
+            if self._clock() - self._last_h.get(key, -1e18) >= h_every:
+                self._last_h[key] = self._clock()
+                self._warm("histories", self._fetch_history, key)
+        self._stats["cycles"] += 1
+        self._stats["last_cycle_s"] = round(self._clock() - t0, 1)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(TICK_S)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="cache-warmer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {**self._stats, "hot": len(self.hot_set()),
+                "running": bool(self._thread and self._thread.is_alive())}
+
+
+@st.cache_resource(show_spinner=False)
+def _warmer() -> Warmer:
+    w = Warmer()
+    w.start()
+    return w
+
+
+def start():
+    """Khởi động warmer (1 lần / tiến trình). LBCK_WARM=0 để tắt."""
+    return _warmer() if ENABLED else None
+
+
+def record_access(ticker: str, region: str = "VN"):
+    if ENABLED:
+        _warmer().record_access(ticker, region)
+
+
+def stats() -> dict:
+    return _warmer().stats() if ENABLED else {"running": False}
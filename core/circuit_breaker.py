@@ -0,0 +1,128 @@
+"""
+core/circuit_breaker.py — Circuit breaker theo host + bảng sức khoẻ nguồn
+
+Từ server US, VnDirect / TCBS / SSI luôn fail DNS hoặc timeout. Không có
+breaker thì MỖI lần tra cứu vẫn chờ đủ timeout cho từng nguồn.
+
+    closed    → gọi bình thường; lỗi liên tiếp ≥ FAILURE_THRESHOLD → open
+    open      → từ chối ngay (CircuitOpenError, tốn vài µs) trong COOLDOWN_S
+    half_open → hết cool-down: cho ĐÚNG 1 request thăm dò đi qua
+                  thành công → closed | thất bại → open lại từ đầu
+
+    br = breaker_for("apipubaws.tcbs.com.vn")
+    br.before_call()          # raise CircuitOpenError nếu đang open
+    ... gọi API ...
+    br.record_success()  /  br.record_failure("DNS fail")
+"""
+import threading
+import time
+
+FAILURE_THRESHOLD = 3
+COOLDOWN_S        = 300.0
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Nguồn đang bị ngắt — không gọi mạng."""
+
+
+class CircuitBreaker:
+    def __init__(self, host: str, failure_threshold: int = FAILURE_THRESHOLD,
+                 cooldown_s: float = COOLDOWN_S, clock=time.monotonic):
+        self.host              = host
+        self.failure_threshold = failure_threshold
+        self.cooldown_s        = cooldown_s
+        self._clock            = clock
+        self._lock             = threading.Lock()
+        self._state            = CLOSED
+        self._failures         = 0
+        self._opened_at        = 0.0
+        self._probing          = False
+        self._last_error       = ""
+        self._rejected         = 0
+
+    # ── Trạng thái ───────────────────────────────────────────────────────────
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown_s:
+            self._state = HALF_OPEN
+        return self._state
+
+    # ── Vòng đời 1 lần gọi ───────────────────────────────────────────────────
+    def before_call(self):
+        """Raise CircuitOpenError nếu không được phép gọi lúc này."""
+        with self._lock:
+            st = self._current_state()
+            if st == CLOSED:
+                return
+            if st == HALF_OPEN and not self._probing:
+                self._probing = True        # request này là probe
+                return
+            self._rejected += 1
+            raise CircuitOpenError(f"{self.host}: circuit {st}")
+
+    def record_success(self):
+        with self._lock:
+            self._state    = CLOSED
+            self._failures = 0
+            self._probing  = False
+
+    def record_failure(self, err: str = ""):
+        with self._lock:
+            self._failures  += 1
+            self._last_error = str(err)[:200]
+            if self._probing or self._failures >= self.failure_threshold:
+                self._state     = OPEN
+                self._opened_at = self._clock()
+            self._probing = False
+
+    def reset(self):
+        self.record_success()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            st = self._current_state()
+            retry_in = (max(0.0, self.cooldown_s - (self._clock() - self._opened_at))
+                        if st == OPEN else 0.0)
+            return {
+                "state":      st,
+                "failures":   self._failures,
+                "rejected":   self._rejected,
+                "retry_in_s": round(retry_in, 1),
+                "last_error": self._last_error,
+            }
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  REGISTRY — 1 breaker cho mỗi host, dùng chung toàn process
+# ══════════════════════════════════════════════════════════════════════════════
+_breakers: dict = {}
+_lock = threading.Lock()
+
+
+def breaker_for(host: str) -> CircuitBreaker:
+    host = host.lower()
+    br = _breakers.get(host)
+    if br is None:
+        with _lock:
+            br = _breakers.setdefault(host, CircuitBreaker(host))
+    return br
+
+
+def health() -> dict:
+    """Host → snapshot trạng thái breaker (cho debug/monitor)."""
+    with _lock:
+        items = list(_breakers.items())
+    return {host: br.snapshot() for host, br in items}
+
+
+def reset_all():
+    with _lock:
+        items = list(_breakers.values())
+    for br in items:
+        br.reset()
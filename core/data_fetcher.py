@@ -1,5 +1,5 @@
 """
-core/data_fetcher.py — v9.0
+core/data_fetcher.py — v9.3
 
 THỰC TẾ ĐÃ XÁC NHẬN:
   ✅ Hoạt động từ Streamlit Cloud (US server):
@@ -34,11 +34,47 @@ CHIẾN LƯỢC v9:
   NN Mua/Bán: Không lấy được → N/A
   Giá open/high/low: yfinance history (LUÔN CÓ)
   Giá trần/sàn: tính ±7% từ prev_close (HOSE), chuẩn xác
+
+v9.1 — CHẠY SONG SONG:
+  Các nguồn độc lập chạy đồng thời trên 1 pool giới hạn (MAX_WORKERS),
+  chung 1 deadline (DEADLINE_S). Waterfall BƯỚC 5 merge những gì về kịp,
+  nguồn trễ được ghi vào `_missed_sources`. parallel=False → tuần tự như v9.
+  API VN đi qua session keep-alive + circuit breaker theo host: nguồn chết
+  bị bỏ qua ngay trong thời gian cool-down, lý do ghi vào `_fund_errors`.
+  Mỗi lớp dữ liệu có TTL riêng: quote 1 phút, định giá vài giờ, BCTC 1 ngày.
+  Nhiều phiên cùng cache miss 1 mã → chỉ 1 lần tải thật (core.singleflight).
+  Kết quả còn được lưu vào backend chung (core.cache_backend) → replica khác
+  / lần khởi động sau dùng lại được, không dồn vào yfinance.
+  Dạng mã Yahoo chạy được (.VN hay mã trần) được nhớ, mã không tồn tại
+  được cache âm 10 phút (core.symbol_resolver).
+  Mỗi bước (history từng lần thử, .info, BCTC, từng API VN, merge) có span
+  đo thời gian → histogram p50/p99 theo nguồn (core.latency).
+
+v9.2 — REGISTRY NGUỒN:
+  Mỗi nguồn khai báo vùng, các trường cung cấp, chi phí (core.providers).
+  Chỉ gọi nguồn đủ để lấp các trường còn thiếu, xếp theo tỉ lệ thành công
+  + độ trễ đo được; API VN không còn chạy cho mã US / quốc tế. Nguồn trả
+  rỗng → đợt sau gọi nguồn khác cho các trường còn thiếu.
+
+v9.3 — QUOTE TRỰC TIẾP:
+  get_live_quote(): chỉ nến phiên hiện tại (1 request, TTL LIVE_TTL) cho panel
+  giá tự làm mới — không chạy lại cả waterfall của get_stock_data.
 """
 
+import os
 import yfinance as yf
 import streamlit as st
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, TimeoutError as FutureTimeout
+
+from core import http_pool
+from core.circuit_breaker import breaker_for
+from core.singleflight import singleflight
+from core.cache_backend import shared_cache
+from core import symbol_resolver
+from core import latency
+from core import providers
+from core import rate_limiter
 
 REGION_SUFFIX = {"VN": ".VN", "US": "", "INTL": ""}
 
@@ -84,21 +120,19 @@ def _get_row(df, *keys):
 
 # ══════════════════════════════════════════════════════════════════════════════
 #  CÁC EXTERNAL APIs — thử nhưng không phụ thuộc
+#  Đi qua core.http_pool → dùng lại kết nối keep-alive giữa các ticker
 # ══════════════════════════════════════════════════════════════════════════════
 def _try_vndirect(ticker: str) -> dict:
     try:
-        import requests, urllib3
-        urllib3.disable_warnings()
         url = (
             "https://finfo-api.vndirect.com.vn/v4/ratios/latest"
             f"?filter=code:{ticker}"
             "&fields=pe,pb,eps,bvps,roe,roa,industryPe,industryPb,industryName,"
             "exchange,capitalisation,listedShare,foreignPercent"
         )
-        r = requests.get(url,
-            headers={"User-Agent":"Mozilla/5.0","Accept":"application/json",
-                     "Referer":"https://www.vndirect.com.vn/"},
-            timeout=5, verify=False)
+        r = http_pool.get(url,
+            headers={"Referer":"https://www.vndirect.com.vn/"},
+            timeout=5)
         if r.status_code != 200:
             return {}
         data = r.json().get("data", [])
@@ -129,14 +163,11 @@ def _try_vndirect(ticker: str) -> dict:
 
 def _try_tcbs(ticker: str) -> dict:
     try:
-        import requests, urllib3
-        urllib3.disable_warnings()
-        r = requests.get(
+        r = http_pool.get(
             f"https://apipubaws.tcbs.com.vn/tcanalysis/v1/ticker/{ticker}/overview",
-            headers={"User-Agent":"Mozilla/5.0","Accept":"application/json",
-                     "Origin":"https://tcinvest.tcbs.com.vn",
+            headers={"Origin":"https://tcinvest.tcbs.com.vn",
                      "Referer":"https://tcinvest.tcbs.com.vn/"},
-            timeout=5, verify=False)
+            timeout=5)
         if r.status_code != 200:
             return {}
         d = r.json()
@@ -163,15 +194,12 @@ def _try_tcbs(ticker: str) -> dict:
 
 def _try_ssi_room(ticker: str) -> dict:
     try:
-        import requests, urllib3
-        urllib3.disable_warnings()
-        r = requests.get(
+        r = http_pool.get(
             "https://iboard-query.ssi.com.vn/v2/stock/full",
             params={"symbol": ticker},
-            headers={"User-Agent":"Mozilla/5.0","Accept":"application/json",
-                     "Origin":"https://iboard.ssi.com.vn",
+            headers={"Origin":"https://iboard.ssi.com.vn",
                      "Referer":"https://iboard.ssi.com.vn/"},
-            timeout=5, verify=False)
+            timeout=5)
         if r.status_code != 200:
             return {}
         raw = r.json()
@@ -207,78 +235,290 @@ def _try_ssi_room(ticker: str) -> dict:
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-#  HÀM CHÍNH
+#  CÁC LỚP DỮ LIỆU — mỗi lớp cache riêng theo tốc độ thay đổi của nó
+#    quote      (giá, KL phiên)          QUOTE_TTL      ~1 phút
+#    valuation  (.info, fast_info, API)  VALUATION_TTL  vài giờ
+#    statements (BCTC năm)               STATEMENT_TTL  1 ngày
+#  Lớp nào lỗi/rỗng → raise _LayerMiss để st.cache_data KHÔNG cache kết quả rỗng.
 # ══════════════════════════════════════════════════════════════════════════════
-@st.cache_data(ttl=60, show_spinner=False)
-def get_stock_data(ticker: str, region: str = "VN") -> dict:
-    ticker = ticker.upper().strip()
-    suffix = REGION_SUFFIX.get(region, "")
-    stock  = None
-    price  = open_p = high = low = volume = prev = None
-
-    # ── BƯỚC 1: yfinance history (LUÔN CÓ) ───────────────────────────────────
-    for yf_str in [f"{ticker}{suffix}", ticker]:
-        for attempt in range(3):
-            try:
-                s  = yf.Ticker(yf_str)
-                df = s.history(period="5d", timeout=12)
-                if df is not None and not df.empty:
-                    last  = df.iloc[-1]
-                    prev2 = df.iloc[-2] if len(df) >= 2 else last
-                    price  = round(float(last["Close"]), 2)
-                    open_p = round(float(last["Open"]),  2) if last["Open"]  > 0 else None
-                    high   = round(float(last["High"]),  2) if last["High"]  > 0 else None
-                    low    = round(float(last["Low"]),   2) if last["Low"]   > 0 else None
-                    volume = int(last["Volume"])
-                    prev   = round(float(prev2["Close"]), 2)
-                    stock  = s
+QUOTE_TTL     = 60
+VALUATION_TTL = 6 * 3600
+STATEMENT_TTL = 24 * 3600
+
+
+class _LayerMiss(Exception):
+    """Lớp dữ liệu không có kết quả lần này — không cache."""
+
+
+class _Unavailable(_LayerMiss):
+    """Nguồn giá quá deadline / chỉ gặp lỗi tạm thời — KHÁC "không có mã", không cache."""
+
+
+def _nonempty(v, sp=None):
+    if v is None or (v.empty if hasattr(v, "empty") else v == {}):
+        if sp is not None:
+            sp.outcome = "empty"
+        raise _LayerMiss()
+    return v
+
+
+def _parse_quote(df) -> dict:
+    """Lấy OHLCV phiên cuối + giá đóng cửa phiên trước từ history."""
+    last  = df.iloc[-1]
+    prev2 = df.iloc[-2] if len(df) >= 2 else last
+    return {
+        "price":  round(float(last["Close"]), 2),
+        "open":   round(float(last["Open"]),  2) if last["Open"]  > 0 else None,
+        "high":   round(float(last["High"]),  2) if last["High"]  > 0 else None,
+        "low":    round(float(last["Low"]),   2) if last["Low"]   > 0 else None,
+        "volume": int(last["Volume"]),
+        "prev":   round(float(prev2["Close"]), 2),
+    }
+
+
+@st.cache_data(ttl=QUOTE_TTL, show_spinner=False)
+def _quote_layer(ticker: str, suffix: str):
+    """
+    BƯỚC 1: history(5d) có retry. Trả về (mã Yahoo dùng được, quote).
+    Dạng mã đã biết chạy được thử trước (symbol_resolver). Dữ liệu rỗng =
+    mã không tồn tại ở dạng đó → sang dạng kế, không retry. Mọi dạng đều
+    rỗng (không có lỗi tạm thời nào) → ghi cache âm.
+    Span "history" cho cả bước, "history_attempt" cho từng lần gọi theo dạng mã.
+    """
+    with latency.span("history") as sp:
+        if symbol_resolver.is_unknown(ticker, suffix):
+            sp.outcome = "negative_cache"
+            raise _LayerMiss()
+        transient = False
+        for yf_str in symbol_resolver.candidates(ticker, suffix):
+            form = "suffix" if suffix and yf_str != ticker else "bare"
+            for attempt in range(3):
+                if attempt:
+                    sp.retries += 1
+                try:
+                    with latency.span("history_attempt", form=form) as at:
+                        df = yf.Ticker(yf_str).history(period="5d", timeout=12)
+                        if df is None or df.empty:
+                            at.outcome = "empty"
+                    if df is not None and not df.empty:
+                        symbol_resolver.remember(ticker, suffix, yf_str)
+                        return yf_str, _parse_quote(df)
                     break
-            except Exception as e:
-                err = str(e).lower()
-                if ("ratelimit" in err or "429" in err) and attempt < 2:
-                    time.sleep((attempt+1)*3)
-                elif "timeout" in err and attempt < 2:
-                    time.sleep(2)
-        if price: break
+                except Exception as e:
+                    err = str(e).lower()
+                    if symbol_resolver.is_not_found_error(err):
+                        break
+                    transient = True
+                    if ("ratelimit" in err or "429" in err) and attempt < 2:
+                        sp.sleep((attempt+1)*3)
+                    elif "timeout" in err and attempt < 2:
+                        sp.sleep(2)
+        sp.outcome = "error" if transient else "not_found"
+        if transient:
+            raise _Unavailable()
+        symbol_resolver.mark_unknown(ticker, suffix)
+        raise _LayerMiss()
+
+
+@st.cache_data(ttl=VALUATION_TTL, show_spinner=False)
+def _info_layer(yf_str: str) -> dict:
+    with latency.span("info") as sp:
+        return _nonempty(yf.Ticker(yf_str).info or {}, sp)
+
+
+@st.cache_data(ttl=VALUATION_TTL, show_spinner=False)
+def _fast_shares_layer(yf_str: str):
+    with latency.span("fast_info") as sp:
+        fi = getattr(yf.Ticker(yf_str), "fast_info", None)
+        return _nonempty(_i(getattr(fi, "shares", None), lo=1000), sp)
+
+
+@st.cache_data(ttl=STATEMENT_TTL, show_spinner=False)
+def _income_layer(yf_str: str):
+    with latency.span("income_stmt") as sp:
+        return _nonempty(yf.Ticker(yf_str).income_stmt, sp)
+
+
+@st.cache_data(ttl=STATEMENT_TTL, show_spinner=False)
+def _balance_layer(yf_str: str):
+    with latency.span("balance_sheet") as sp:
+        return _nonempty(yf.Ticker(yf_str).balance_sheet, sp)
+
+
+@st.cache_data(ttl=VALUATION_TTL, show_spinner=False)
+def _vndirect_layer(ticker: str) -> dict:
+    with latency.span("vndirect") as sp:
+        return _nonempty(_try_vndirect(ticker), sp)
+
+
+@st.cache_data(ttl=VALUATION_TTL, show_spinner=False)
+def _tcbs_layer(ticker: str) -> dict:
+    with latency.span("tcbs") as sp:
+        return _nonempty(_try_tcbs(ticker), sp)
+
+
+@st.cache_data(ttl=QUOTE_TTL, show_spinner=False)
+def _ssi_layer(ticker: str) -> dict:
+    # Room NN, NN mua/bán, giá tham chiếu thay đổi trong phiên → TTL như quote
+    with latency.span("ssi") as sp:
+        return _nonempty(_try_ssi_room(ticker), sp)
+
+
+# Thứ tự khai báo = thứ tự ưu tiên khi merge vào `ext`
+_EXT_SOURCES = {
+    "vndirect": _vndirect_layer,
+    "tcbs":     _tcbs_layer,
+    "ssi":      _ssi_layer,
+}
+_EXT_HOSTS = {
+    "vndirect": "finfo-api.vndirect.com.vn",
+    "tcbs":     "apipubaws.tcbs.com.vn",
+    "ssi":      "iboard-query.ssi.com.vn",
+}
+_STOCK_SOURCES = {
+    "info":          _info_layer,
+    "fast_info":     _fast_shares_layer,
+    "income_stmt":   _income_layer,
+    "balance_sheet": _balance_layer,
+}
+
+
+def _safe(fn, *args):
+    try: return fn(*args)
+    except Exception: return None
 
-    if not price:
-        return {"error": f"Không tìm thấy mã **'{ticker}'**."}
 
-    # ── BƯỚC 2: yfinance .info + fast_info ───────────────────────────────────
-    info = {}
-    try: info = stock.info or {}
-    except: pass
+# ══════════════════════════════════════════════════════════════════════════════
+#  REGISTRY NGUỒN — chỉ gọi nguồn phục vụ vùng đó và còn trường để lấp
+#  (core.providers; thứ tự theo tỉ lệ thành công + độ trễ đo được)
+# ══════════════════════════════════════════════════════════════════════════════
+FIELDS = frozenset({
+    "pe", "pb", "eps", "bvps", "roe", "roa", "avg_pe", "avg_pb",
+    "industry", "market", "shares", "market_cap", "room", "fbuy", "fsell",
+})
+_ALL_REGIONS = set(REGION_SUFFIX)
+
+# Tiền tố key của _try_* ("pe_vd" → "pe") → trường
+_EXT_FIELD = {"pe": "pe", "pb": "pb", "eps": "eps", "bvps": "bvps", "roe": "roe",
+              "roa": "roa", "ape": "avg_pe", "apb": "avg_pb", "ind": "industry",
+              "mkt": "market", "sh": "shares", "mc": "market_cap", "room": "room",
+              "fbuy": "fbuy", "fsell": "fsell"}
+_INFO_FIELD = {"pe": ("trailingPE", "forwardPE"), "pb": ("priceToBook",),
+               "eps": ("trailingEps",), "bvps": ("bookValue",),
+               "roe": ("returnOnEquity",), "roa": ("returnOnAssets",),
+               "industry": ("industry", "sector"), "market": ("exchange",),
+               "shares": ("sharesOutstanding",), "market_cap": ("marketCap",)}
+_STMT_FIELD = (("eps", "eps_stmt"), ("bvps", "bvps_stmt"), ("roe", "roe_stmt"),
+               ("roa", "roa_stmt"), ("pe", "pe_calc"), ("pb", "pb_calc"))
+
+
+def _breaker_closed(host: str):
+    return lambda: breaker_for(host).snapshot()["state"] != "open"
+
+
+_PROVIDERS = providers.Registry()
+for _name, _fields, _cost, _prior in [
+    ("vndirect", {"pe", "pb", "eps", "bvps", "roe", "roa", "avg_pe", "avg_pb",
+                  "industry", "market", "shares", "market_cap", "room"}, 1, 0.09),
+    ("tcbs",     {"pe", "pb", "eps", "bvps", "roe", "roa", "avg_pe", "avg_pb",
+                  "industry", "market", "shares", "market_cap"}, 1, 0.11),
+    ("ssi",      {"room", "fbuy", "fsell", "shares", "market_cap"}, 1, 0.07),
+]:
+    _PROVIDERS.register(providers.Provider(
+        _name, _EXT_SOURCES[_name], {"VN"}, _fields, cost=_cost, prior_s=_prior,
+        available=_breaker_closed(_EXT_HOSTS[_name])))
+for _name, _fields, _cost, _prior in [
+    # .info là trang nặng nhất của Yahoo, hay bị rate limit trước
+    ("info",          {"pe", "pb", "eps", "bvps", "roe", "roa", "industry",
+                       "market", "shares", "market_cap"}, 3, 0.42),
+    ("fast_info",     {"shares", "market_cap"}, 1, 0.15),
+    ("income_stmt",   {"eps", "roe", "roa", "pe"}, 2, 0.38),
+    ("balance_sheet", {"bvps", "pb", "roe", "roa"}, 2, 0.36),
+]:
+    _PROVIDERS.register(providers.Provider(
+        _name, _STOCK_SOURCES[_name], _ALL_REGIONS, _fields, cost=_cost,
+        key="yf", prior_s=_prior))
+latency.subscribe(_PROVIDERS.observe)
 
-    # Shares — nhiều nguồn
-    shares = _pick(
-        _i(getattr(getattr(stock, "fast_info", None), "shares", None), lo=1000),
-        _i(info.get("sharesOutstanding"), lo=1000),
-    )
 
-    # PE, PB từ .info (thường có cho VN)
-    pe_info = _pick(_f(info.get("trailingPE")), _f(info.get("forwardPE")))
-    pb_info = _f(info.get("priceToBook"))
+# ══════════════════════════════════════════════════════════════════════════════
+#  NGÂN SÁCH YAHOO CHUNG CỦA TIẾN TRÌNH
+#  Mỗi request Yahoo thật (span dưới đây, ở bất kỳ luồng nào) trừ vào 1 limiter
+#  GCRA (core.rate_limiter). Người dùng không phải chờ; việc nền
+#  (core.cache_warmer, universe của core.screener) chờ YAHOO.ready_in() == 0.
+# ══════════════════════════════════════════════════════════════════════════════
+YF_CALLS_PER_MIN = float(os.environ.get("LBCK_YF_RPM", 60))
+YF_STAGES = frozenset({"history_attempt", "info", "fast_info", "income_stmt", "balance_sheet",
+                       "live_quote", "chart_download", "batch_download"})
+YAHOO = rate_limiter.configure("yahoo", YF_CALLS_PER_MIN)
 
-    # EPS, BVPS, ROE, ROA từ .info (thường KHÔNG có cho VN → tính bên dưới)
-    eps_info  = _f(info.get("trailingEps"), lo=-1e9, hi=1e9)
-    bvps_info = _f(info.get("bookValue"))
-    roe_r = info.get("returnOnEquity")
-    roa_r = info.get("returnOnAssets")
-    roe_info  = round(float(roe_r)*100, 2) if roe_r else None
-    roa_info  = round(float(roa_r)*100, 2) if roa_r else None
 
-    industry = info.get("industry") or info.get("sector") or "N/A"
-    market   = (info.get("exchange") or "HOSE").replace("HSX","HOSE").replace("VNM","HOSE")
-    mc_info  = _f(info.get("marketCap"), lo=0)
+def _charge_yahoo(stage: str, seconds: float, outcome: str, **labels):
+    if stage in YF_STAGES:
+        YAHOO.charge()
 
-    # ── BƯỚC 3: Tính từ financial statements ─────────────────────────────────
+
+latency.subscribe(_charge_yahoo)
+
+
+def _filled(raw: dict, price) -> set:
+    """Các trường của FIELDS đã có giá trị từ những nguồn đã trả về (theo đúng logic merge)."""
+    got = set()
+    for name in _EXT_SOURCES:
+        for k, v in (raw.get(name) or {}).items():
+            f = _EXT_FIELD.get(k.rsplit("_", 1)[0])
+            if f and v not in (None, "", 0):
+                got.add(f)
+    info = raw.get("info") or {}
+    got |= {f for f, keys in _INFO_FIELD.items() if any(info.get(k) for k in keys)}
+    shares = _pick(raw.get("fast_info"), _i(info.get("sharesOutstanding"), lo=1000))
+    if shares or "shares" in got:
+        got |= {"shares", "market_cap"}       # vốn hoá = KLCP × giá
+    sm = _statement_metrics(raw.get("income_stmt"), raw.get("balance_sheet"), shares, price)
+    got |= {f for f, k in _STMT_FIELD if sm[k]}
+    return got
+
+
+def _arg(p, ticker: str, yf_str: str) -> str:
+    return yf_str if p.key == "yf" else ticker
+
+
+def _vn_proven() -> bool:
+    """Đã có ít nhất 1 lần gọi API VN thành công trong tiến trình này."""
+    return any(p.calls > p.failures for p in map(_PROVIDERS.get, _EXT_SOURCES))
+
+
+def _first_wave(region: str) -> list:
+    """
+    plan() cho mọi trường. Với VN khi chưa host VN nào từng trả lời (vd chạy
+    từ US, SSI/VnDirect/TCBS chặn IP nhưng breaker chưa kịp mở): thêm nguồn
+    Yahoo tốt nhất vào đợt 1 thay vì đợi API VN hết timeout rồi mới sang đợt 2.
+    """
+    wave = _PROVIDERS.plan(region, FIELDS)
+    if region != "VN" or _vn_proven() or any(p.key == "yf" for p in wave):
+        return wave
+    now = time.monotonic()
+    yf_ps = [p for p in _PROVIDERS.ranked(region) if p.key == "yf"]
+    if yf_ps:
+        wave.append(max(yf_ps, key=lambda p: len(p.fields & FIELDS) / p.score(now)))
+    return wave
+
+
+def provider_stats() -> dict:
+    return _PROVIDERS.stats()
+
+
+def _statement_metrics(inc, bs, shares, price) -> dict:
+    """
+    BƯỚC 3: EPS / BVPS / ROE / ROA (+ P/E, P/B tự tính) từ income_stmt và
+    balance_sheet. Dùng chung cho get_stock_data và batch snapshot.
+    """
     ni = equity = total_assets = None
     eps_stmt = bvps_stmt = roe_stmt = roa_stmt = None
     pe_calc  = pb_calc  = None
 
     try:
-        inc = stock.income_stmt
-        if inc is not None and not inc.empty:
+        if inc is not None:
             # Net Income
             ni = _get_row(inc,
                 "Net Income",
@@ -304,8 +544,7 @@ def get_stock_data(ticker: str, region: str = "VN") -> dict:
         pass
 
     try:
-        bs = stock.balance_sheet
-        if bs is not None and not bs.empty:
+        if bs is not None:
             equity = _get_row(bs,
                 "Stockholders Equity",
                 "Total Stockholders Equity",
@@ -327,13 +566,190 @@ def get_stock_data(ticker: str, region: str = "VN") -> dict:
     except:
         pass
 
-    # ── BƯỚC 4: Thử API VN (không phụ thuộc, bonus nếu có) ───────────────────
+    return {
+        "ni": ni, "equity": equity, "total_assets": total_assets,
+        "eps_stmt": eps_stmt, "bvps_stmt": bvps_stmt,
+        "roe_stmt": roe_stmt, "roa_stmt": roa_stmt,
+        "pe_calc":  pe_calc,  "pb_calc":  pb_calc,
+    }
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CHẾ ĐỘ SONG SONG — pool giới hạn + 1 deadline chung cho cả lượt tra cứu
+# ══════════════════════════════════════════════════════════════════════════════
+MAX_WORKERS = 8        # dùng chung cho mọi session Streamlit trong process
+DEADLINE_S  = 15.0     # tổng thời gian tối đa cho 1 lần get_stock_data
+
+_POOL = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="fetch")
+
+
+def _remaining(t_end: float) -> float:
+    return max(0.0, t_end - time.monotonic())
+
+
+def _fetch_sequential(ticker: str, region: str):
+    """Từng nguồn một theo plan, dừng khi đủ trường (không có deadline)."""
+    try:
+        yf_str, quote = _quote_layer(ticker, REGION_SUFFIX.get(region, ""))
+    except _Unavailable:
+        raise
+    except Exception:
+        yf_str, quote = None, None
+    if not quote:
+        return None, {}, [], []
+    raw, tried = {}, []
+    while True:
+        missing = FIELDS - _filled(raw, quote["price"])
+        nxt = _PROVIDERS.plan(region, missing, exclude=tried) if missing else []
+        if not nxt:
+            return quote, raw, [], tried
+        p = nxt[0]
+        tried.append(p.name)
+        raw[p.name] = _safe(p.fn, _arg(p, ticker, yf_str))
+
+
+def _fetch_parallel(ticker: str, region: str, deadline: float):
+    """
+    Fan-out trên _POOL theo từng đợt:
+      - Đợt 1: plan cho mọi trường → submit ngay, song song với history.
+        VN khi chưa API VN nào từng thành công → kèm nguồn Yahoo tốt nhất;
+        đợt 1 lỗi cả → đợt sau bỏ luôn các API VN còn lại (cùng bị chặn IP)
+        Nguồn Yahoo dùng dạng mã đã biết chạy được (symbol_resolver; mặc định
+        `{ticker}{suffix}`); nếu history lại khớp dạng khác thì submit lại
+      - Đợt sau: nguồn nào rỗng / lỗi → plan lại cho các trường còn thiếu,
+        chỉ với nguồn chưa thử; hết trường thiếu hoặc hết nguồn → dừng
+      - Mã nằm trong cache âm → trả về ngay, không gọi mạng
+    Nguồn nào chưa xong khi hết deadline → bỏ qua, ghi vào danh sách missed.
+    History quá deadline / chỉ lỗi tạm thời → raise _Unavailable (không phải "không có mã").
+    Thread chạy trễ vẫn tiếp tục trong pool và lấp cache cho lần sau.
+    Trả về (quote, raw, missed, các nguồn đã gọi).
+    """
+    suffix = REGION_SUFFIX.get(region, "")
+    if symbol_resolver.is_unknown(ticker, suffix):
+        return None, {}, [], []
+    t_end   = time.monotonic() + deadline
+    primary = symbol_resolver.preferred(ticker, suffix)
+    wave    = _first_wave(region)
+    hist    = _POOL.submit(_quote_layer, ticker, suffix)
+    futs    = {p.name: _POOL.submit(_safe, p.fn, _arg(p, ticker, primary)) for p in wave}
+
+    try:
+        yf_str, quote = hist.result(timeout=_remaining(t_end))
+    except FutureTimeout:
+        raise _Unavailable()
+    except _Unavailable:
+        raise
+    except Exception:
+        yf_str, quote = None, None
+    if not quote:
+        return None, {}, [], list(futs)
+
+    if yf_str != primary:
+        futs.update({p.name: _POOL.submit(_safe, p.fn, yf_str) for p in wave if p.key == "yf"})
+
+    raw, missed, tried = {}, [], []
+    while futs:
+        tried += list(futs)
+        done, _ = wait(futs.values(), timeout=_remaining(t_end))
+        for name, f in futs.items():
+            if f in done:
+                raw[name] = f.result()
+            else:
+                missed.append(name)
+        missing = FIELDS - _filled(raw, quote["price"])
+        if missed or not missing:
+            break
+        skip = tried if region != "VN" or _vn_proven() else tried + list(_EXT_SOURCES)
+        futs = {p.name: _POOL.submit(_safe, p.fn, _arg(p, ticker, yf_str))
+                for p in _PROVIDERS.plan(region, missing, exclude=skip)}
+    return quote, raw, missed, tried
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  HÀM CHÍNH
+# ══════════════════════════════════════════════════════════════════════════════
+def get_stock_data(ticker: str, region: str = "VN",
+                   parallel: bool = True, deadline: float = DEADLINE_S) -> dict:
+    """
+    parallel=True  → chạy các nguồn đồng thời, tổng thời gian ≤ `deadline` giây.
+    parallel=False → chạy tuần tự, từng nguồn một.
+    Chỉ gọi nguồn phục vụ `region` và còn trường để lấp (`_providers`: nguồn đã gọi).
+    Kết quả có key `_missed_sources`: các nguồn không kịp trả về trước deadline.
+    Dict cuối được ghép từ các lớp cache riêng → hết TTL chỉ tốn request quote.
+    Nguồn giá quá deadline / lỗi tạm thời → lỗi riêng (`_unavailable`), KHÔNG cache:
+    exception đi xuyên st.cache_data / shared_cache rồi mới đổi thành dict ở đây.
+    """
+    ticker = ticker.upper().strip()
+    try:
+        return _get_stock_data(ticker, region, parallel, deadline)
+    except _Unavailable:
+        return {"error": f"Nguồn giá cho **'{ticker}'** tạm thời không phản hồi — thử lại sau.",
+                "_unavailable": True, "_missed_sources": ["history"]}
+
+
+@st.cache_data(ttl=QUOTE_TTL, show_spinner=False)
+@shared_cache("stock", ttl=QUOTE_TTL, cache_if=lambda d: "error" not in d)
+@singleflight("get_stock_data")
+def _get_stock_data(ticker: str, region: str, parallel: bool, deadline: float) -> dict:
+    with latency.span("fetch", mode="parallel" if parallel else "sequential") as sp:
+        try:
+            if parallel:
+                quote, raw, missed, tried = _fetch_parallel(ticker, region, deadline)
+            else:
+                quote, raw, missed, tried = _fetch_sequential(ticker, region)
+        except _Unavailable:
+            sp.outcome = "unavailable"
+            raise
+        sp.outcome = "not_found" if not quote else ("partial" if missed else "ok")
+
+    if not quote:
+        return {"error": f"Không tìm thấy mã **'{ticker}'**.",
+                "_missed_sources": missed}
+
+    t_merge = time.perf_counter()
+    price  = quote["price"]
+    open_p, high, low = quote["open"], quote["high"], quote["low"]
+    volume, prev      = quote["volume"], quote["prev"]
+
+    # ── BƯỚC 2: yfinance .info + fast_info ───────────────────────────────────
+    info        = raw.get("info") or {}
+    fast_shares = raw.get("fast_info")
+
+    # Shares — nhiều nguồn
+    shares = _pick(
+        fast_shares,
+        _i(info.get("sharesOutstanding"), lo=1000),
+    )
+
+    # PE, PB từ .info (thường có cho VN)
+    pe_info = _pick(_f(info.get("trailingPE")), _f(info.get("forwardPE")))
+    pb_info = _f(info.get("priceToBook"))
+
+    # EPS, BVPS, ROE, ROA từ .info (thường KHÔNG có cho VN → tính bên dưới)
+    eps_info  = _f(info.get("trailingEps"), lo=-1e9, hi=1e9)
+    bvps_info = _f(info.get("bookValue"))
+    roe_r = info.get("returnOnEquity")
+    roa_r = info.get("returnOnAssets")
+    roe_info  = round(float(roe_r)*100, 2) if roe_r else None
+    roa_info  = round(float(roa_r)*100, 2) if roa_r else None
+
+    industry = info.get("industry") or info.get("sector") or "N/A"
+    market   = (info.get("exchange") or "HOSE").replace("HSX","HOSE").replace("VNM","HOSE")
+    mc_info  = _f(info.get("marketCap"), lo=0)
+
+    # ── BƯỚC 3: Tính từ financial statements ─────────────────────────────────
+    sm = _statement_metrics(raw.get("income_stmt"), raw.get("balance_sheet"), shares, price)
+    ni, equity = sm["ni"], sm["equity"]
+    eps_stmt, bvps_stmt = sm["eps_stmt"], sm["bvps_stmt"]
+    roe_stmt, roa_stmt  = sm["roe_stmt"], sm["roa_stmt"]
+    pe_calc,  pb_calc   = sm["pe_calc"],  sm["pb_calc"]
+
+    # ── BƯỚC 4: API VN (không phụ thuộc, bonus nếu có) ───────────────────────
     ext = {}
-    for fn in [lambda: _try_vndirect(ticker),
-               lambda: _try_tcbs(ticker),
-               lambda: _try_ssi_room(ticker)]:
+    for name in _EXT_SOURCES:
         try:
-            ext.update({k: v for k, v in fn().items() if v not in (None, "", 0)})
+            ext.update({k: v for k, v in (raw.get(name) or {}).items()
+                        if v not in (None, "", 0)})
         except:
             pass
 
@@ -354,7 +770,7 @@ def get_stock_data(ticker: str, region: str = "VN") -> dict:
 
     # KLCP
     shares_best = _pick(
-        _i(getattr(getattr(stock,"fast_info",None),"shares",None), lo=1000),
+        fast_shares,
         ext.get("sh_vd"), ext.get("sh_tc"), ext.get("sh_si"),
         shares
     )
@@ -391,6 +807,17 @@ def get_stock_data(ticker: str, region: str = "VN") -> dict:
     except:
         price_change = price_change_pct = 0
 
+    # Lý do thiếu dữ liệu — hiển thị trong expander "Một số chỉ số chưa có"
+    fund_errors = {name: "quá deadline" for name in missed}
+    for name, host in _EXT_HOSTS.items():
+        if not _PROVIDERS.get(name).serves(region):
+            continue
+        snap = breaker_for(host).snapshot()
+        if snap["state"] != "closed" and name not in fund_errors:
+            fund_errors[name] = (f"circuit {snap['state']} (thử lại sau {snap['retry_in_s']:.0f}s)"
+                                 f" — {snap['last_error']}")
+    latency.observe("merge", time.perf_counter() - t_merge)
+
     # Format numbers đẹp
     def fmt2(v, dec=2):
         if v in (None, "N/A", ""): return "N/A"
@@ -436,5 +863,42 @@ def get_stock_data(ticker: str, region: str = "VN") -> dict:
             "roa":  "financials" if roa_stmt and roa == fmt2(roa_stmt) else "api/info",
             "ni":   f"{ni:,.0f}" if ni else "N/A",
             "equity": f"{equity:,.0f}" if equity else "N/A",
-        }
+        },
+        "_missed_sources": missed,
+        "_fund_errors":    fund_errors,
+        "_providers":      tried,
     }
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  QUOTE TRỰC TIẾP — chỉ nến phiên hiện tại, cho panel live (components.live_quote_ui)
+# ══════════════════════════════════════════════════════════════════════════════
+LIVE_TTL = 10
+
+
+@st.cache_data(ttl=LIVE_TTL, show_spinner=False)
+@shared_cache("live_quote", ttl=LIVE_TTL, cache_if=bool)
+@singleflight("live_quote")
+def get_live_quote(ticker: str, region: str = "VN") -> dict:
+    """
+    1 request history(1d) theo dạng mã đã biết chạy được — không .info, BCTC
+    hay API VN. Trả về price/open/high/low/volume + `date` của nến cuối;
+    {} nếu lỗi / rỗng (panel giữ giá cũ, không cache ở backend chung).
+    """
+    ticker = ticker.upper().strip()
+    suffix = REGION_SUFFIX.get(region, "")
+    if symbol_resolver.is_unknown(ticker, suffix):
+        return {}
+    with latency.span("live_quote") as sp:
+        try:
+            df = yf.Ticker(symbol_resolver.preferred(ticker, suffix)).history(period="1d", timeout=5)
+        except Exception:
+            sp.outcome = "error"
+            return {}
+        if df is None or df.empty:
+            sp.outcome = "empty"
+            return {}
+    q = _parse_quote(df)
+    q.pop("prev")
+    q["date"] = df.index[-1].strftime("%Y-%m-%d")
+    return q
@@ -0,0 +1,61 @@
+"""
+core/downsample.py — Giảm số điểm vẽ cho biểu đồ khung dài
+
+  aggregate_ohlcv(df, budget) → gộp nến ngày thành nến tuần / tháng cho tới
+                                khi ≤ budget nến (OHLC đúng nghĩa, KL cộng dồn)
+  lttb(x, y, n)               → Largest-Triangle-Three-Buckets cho đường line
+                                (SMA...), giữ hình dạng với n điểm
+"""
+import numpy as np
+import pandas as pd
+
+_OHLCV_AGG = {"Open": "first", "High": "max", "Low": "min",
+              "Close": "last", "Volume": "sum"}
+_RULES = ("W-FRI", "ME")      # tuần (chốt thứ Sáu) → tháng
+
+
+def aggregate_ohlcv(df: pd.DataFrame, budget: int):
+    """Trả về (df_gộp, rule) — rule = None nếu không cần gộp."""
+    if df is None or len(df) <= budget:
+        return df, None
+    agg = {k: v for k, v in _OHLCV_AGG.items() if k in df.columns}
+    out, rule = df, None
+    for rule in _RULES:
+        try:
+            out = df.resample(rule).agg(agg).dropna(subset=["Close"])
+        except ValueError:                  # pandas < 2.2 chưa có alias "ME"
+            out = df.resample("M").agg(agg).dropna(subset=["Close"])
+        if len(out) <= budget:
+            break
+    return out, rule
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int):
+    """
+    Largest-Triangle-Three-Buckets. NaN ở đầu chuỗi (SMA chưa đủ kỳ) bị bỏ.
+    `x` là số (vd datetime64 → int64). Trả về (x_out, y_out).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    ok = ~np.isnan(y)
+    x, y = x[ok], y[ok]
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    # Bucket giữa: n-2 điểm chia đều thành n_out-2 nhóm
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx   = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Điểm trung bình của bucket kế tiếp (hoặc điểm cuối)
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        # Diện tích tam giác (a, điểm j, avg) — chọn j lớn nhất
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return x[idx], y[idx]
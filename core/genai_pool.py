@@ -0,0 +1,153 @@
+"""
+core/genai_pool.py — Pool client Gemini dùng lại lâu dài + xoay vòng nhiều API key
+
+Trước: mỗi request tạo genai.Client mới (kết nối HTTPS mới) + Tool search mới,
+và chỉ đọc 1 key. Pool này:
+  - 1 genai.Client / key, cache bằng st.cache_resource → giữ kết nối keep-alive
+  - GenerateContentConfig (Google Search) dựng 1 lần
+  - Nhiều key: chọn key còn lượt sớm nhất, ưu tiên ngẫu nhiên theo quota còn
+    lại trong ngày (core.rate_limiter theo từng key)
+  - Key trả 401/403 → loại khỏi pool, request chuyển sang key khác
+  - Key trả 429 → lùi key đó, thử ngay key khác còn lượt
+
+Secrets:
+    GOOGLE_API_KEYS = ["AIza...1", "AIza...2"]     # hoặc chuỗi "k1,k2"
+    GOOGLE_API_KEY  = "AIza..."                    # vẫn hỗ trợ như cũ
+"""
+import hashlib
+import random
+import threading
+
+import streamlit as st
+
+from core import rate_limiter
+
+HAS_GENAI = False
+try:
+    from google import genai
+    from google.genai import types
+    HAS_GENAI = True
+except ImportError:
+    pass
+
+_SECRET_LISTS  = ("GOOGLE_API_KEYS", "GEMINI_API_KEYS")
+_SECRET_SINGLE = ("GOOGLE_API_KEY", "google_api_key", "GEMINI_API_KEY")
+
+
+class NoKeyAvailable(Exception):
+    """Pool không còn key dùng được (chưa cấu hình / tất cả bị thu hồi)."""
+
+
+def key_id(api_key: str) -> str:
+    """Mã rút gọn của key — dùng trong log / limiter, không lộ key thật."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:8]
+
+
+def is_auth_error(err: str) -> bool:
+    el = err.lower()
+    return any(x in el for x in ["api_key", "api key", "401", "403", "unauthorized",
+                                 "permission_denied"])
+
+
+def is_rate_error(err: str) -> bool:
+    el = err.lower()
+    return any(x in el for x in ["429", "quota", "resource_exhausted", "rate"])
+
+
+class ClientPool:
+    def __init__(self, api_keys, client_factory=None):
+        factory = client_factory or (lambda k: genai.Client(api_key=k))
+        self._clients = {key_id(k): factory(k) for k in api_keys}
+        self._dropped = {}                  # kid → lý do
+        self._picks   = {kid: 0 for kid in self._clients}
+        self._lock    = threading.Lock()
+        self._search_config = None
+
+    @property
+    def alive(self) -> list:
+        with self._lock:
+            return [k for k in self._clients if k not in self._dropped]
+
+    def search_config(self):
+        """GenerateContentConfig có Google Search — dựng 1 lần cho cả pool."""
+        if self._search_config is None:
+            self._search_config = types.GenerateContentConfig(
+                tools=[types.Tool(google_search=types.GoogleSearch())])
+        return self._search_config
+
+    def pick(self, model: str, exclude=()):
+        """
+        (kid, client) cho lần gọi kế tiếp: key có lượt sớm nhất; nếu nhiều key
+        đều đang rảnh → chọn ngẫu nhiên theo trọng số quota còn lại hôm nay.
+        """
+        cands = []
+        for kid in self.alive:
+            if kid in exclude:
+                continue
+            q = rate_limiter.limiter_for(model, kid).snapshot()
+            if q["left_today"] > 0:
+                cands.append((q["next_slot_s"], q["left_today"], kid))
+        if not cands:
+            raise NoKeyAvailable(model)
+        soonest = min(c[0] for c in cands)
+        ready   = [c for c in cands if c[0] <= soonest]
+        kid = random.choices([c[2] for c in ready], weights=[c[1] for c in ready])[0]
+        with self._lock:
+            self._picks[kid] += 1
+        return kid, self._clients[kid]
+
+    def drop(self, kid: str, reason: str) -> bool:
+        """Loại key bị thu hồi. Không loại key cuối cùng. True nếu còn key khác."""
+        with self._lock:
+            alive = [k for k in self._clients if k not in self._dropped]
+            if kid not in alive or len(alive) <= 1:
+                return False
+            self._dropped[kid] = reason[:200]
+            return True
+
+    def quota(self, model: str) -> dict:
+        """Tổng hợp limiter của mọi key còn sống cho 1 model (sidebar)."""
+        snaps = [rate_limiter.limiter_for(model, k).snapshot() for k in self.alive]
+        out = {"keys": len(snaps), "dropped": len(self._dropped)}
+        for f in ("rpm", "rpd", "used_today", "left_today", "waiting",
+                  "admitted", "queued", "rejected", "throttled"):
+            out[f] = sum(s[f] for s in snaps)
+        out["next_slot_s"] = min((s["next_slot_s"] for s in snaps), default=0.0)
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"keys": list(self._clients), "dropped": dict(self._dropped),
+                    "picks": dict(self._picks)}
+
+
+def _secret_keys() -> tuple:
+    keys = []
+    try:
+        for name in _SECRET_LISTS:
+            v = st.secrets.get(name)
+            if isinstance(v, str):
+                v = v.split(",")
+            keys += [str(k).strip() for k in (v or [])]
+        keys += [st.secrets.get(name) or "" for name in _SECRET_SINGLE]
+    except Exception:
+        pass
+    seen, out = set(), []
+    for k in keys:
+        if k and k not in seen:
+            seen.add(k)
+            out.append(k)
+    return tuple(out)
+
+
+@st.cache_resource(show_spinner=False)
+def _pool_for(api_keys: tuple) -> ClientPool:
+    return ClientPool(api_keys)
+
+
+def get_pool():
+    """Pool dùng chung cả tiến trình; None nếu chưa có key hoặc thiếu google-genai."""
+    keys = _secret_keys()
+    if not HAS_GENAI or not keys:
+        return None
+    return _pool_for(keys)
@@ -0,0 +1,111 @@
+"""
+core/http_pool.py — Session HTTP dùng chung cho các API thị trường VN
+
+Trước đây mỗi `_try_*` gọi `requests.get(...)` một lần rồi bỏ → mỗi ticker
+phải bắt tay TCP + TLS lại từ đầu. Module này giữ 1 `requests.Session` cho
+mỗi host (VnDirect, TCBS, SSI...), có connection pool + keep-alive, sống
+suốt vòng đời process nên được dùng lại giữa các ticker và các session
+Streamlit.
+
+Mỗi request đi qua circuit breaker của host (core.circuit_breaker): host đang
+"open" → raise CircuitOpenError ngay, không chạm mạng.
+
+    from core import http_pool
+    r = http_pool.get("https://apipubaws.tcbs.com.vn/...", headers=..., timeout=5)
+"""
+import threading
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from core.circuit_breaker import breaker_for
+
+# Các API VN dùng chứng chỉ lỗi / chain thiếu → giữ verify=False như cũ,
+# tắt cảnh báo 1 lần duy nhất thay vì mỗi request.
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+POOL_CONNECTIONS = 4    # số pool (mỗi scheme+host+port 1 pool) trong 1 adapter
+POOL_MAXSIZE     = 16   # số kết nối keep-alive tối đa tới 1 host — ≥ MAX_WORKERS
+DEFAULT_HEADERS  = {"User-Agent": "Mozilla/5.0", "Accept": "application/json"}
+# Status bị tính là lỗi cho breaker (5xx + bị WAF chặn / rate limit).
+# 404 = "không có mã" là phản hồi hợp lệ, không tính.
+FAILURE_STATUSES = {403, 429}
+
+_sessions: dict = {}
+_lock = threading.Lock()
+
+
+def _make_session() -> requests.Session:
+    s = requests.Session()
+    # max_retries=0: retry/fallback đã do tầng gọi xử lý, không nhân đôi timeout
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                          pool_maxsize=POOL_MAXSIZE,
+                          max_retries=0, pool_block=False)
+    s.mount("https://", adapter)
+    s.mount("http://",  adapter)
+    s.headers.update(DEFAULT_HEADERS)
+    s.verify = False
+    return s
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def session_for(url: str) -> requests.Session:
+    """Session dùng chung cho host của `url` (tạo lần đầu, thread-safe)."""
+    host = _host(url)
+    s = _sessions.get(host)
+    if s is None:
+        with _lock:
+            s = _sessions.get(host)
+            if s is None:
+                s = _sessions[host] = _make_session()
+    return s
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """
+    Như `requests.get` nhưng đi qua session keep-alive của host.
+    Raise CircuitOpenError nếu breaker của host đang mở.
+    """
+    br = breaker_for(_host(url))
+    br.before_call()
+    try:
+        r = session_for(url).get(url, **kwargs)
+    except Exception as e:
+        br.record_failure(f"{type(e).__name__}: {e}")
+        raise
+    if r.status_code >= 500 or r.status_code in FAILURE_STATUSES:
+        br.record_failure(f"HTTP {r.status_code}")
+    else:
+        br.record_success()
+    return r
+
+
+def stats() -> dict:
+    """Host → số kết nối đang nằm trong pool (để debug/monitor)."""
+    out = {}
+    with _lock:
+        items = list(_sessions.items())
+    for host, s in items:
+        n = 0
+        for adapter in set(s.adapters.values()):
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is not None:
+                    n += pool.num_connections
+        out[host] = {"connections_opened": n}
+    return out
+
+
+def close_all():
+    """Đóng toàn bộ session (dùng khi test/benchmark)."""
+    with _lock:
+        items = list(_sessions.values())
+        _sessions.clear()
+    for s in items:
+        try: s.close()
+        except: pass
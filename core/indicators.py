@@ -0,0 +1,262 @@
+"""
+core/indicators.py — Chỉ báo kỹ thuật tính bằng NumPy, có cache + cập nhật tăng dần
+
+Chỉ báo: SMA, EMA, RSI, MACD, Bollinger Bands, ATR, OBV.
+
+Kết quả được nhớ theo (symbol, tên chỉ báo, tham số). Mỗi entry giữ trạng
+thái đệ quy (EMA, Wilder, OBV...) tại NẾN KẾ CUỐI:
+  - cùng ngày cuối + cùng nến cuối   → trả ngay từ cache
+  - nến cuối đổi giá (phiên chưa đóng) hoặc thêm k nến mới
+                                     → chỉ tính lại từ nến cuối cũ trở đi,
+                                       O(k) thay vì O(toàn bộ lịch sử)
+  - lịch sử khác đi (điều chỉnh giá, khung khác) → tính lại toàn bộ
+
+    out = compute("FPT.VN", df, "macd", fast=12, slow=26, signal=9)
+    out["macd"], out["signal"], out["hist"]          # pd.Series theo df.index
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+CACHE_SIZE = 256
+EWM_LOOP_MAX  = 64       # đuôi ≤ N nến (cập nhật tăng dần) → vòng Python, rẻ hơn dựng mảng
+EWM_BLOCK_POW = 100.0    # mỗi khối dạng đóng giữ β^-L ≤ 1e100 → không tràn float64
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  KHỐI CƠ BẢN
+#  Mỗi chỉ báo: fn(a, p, start, state) → (outputs cho [start:], state tại n-2)
+#    a     : dict mảng float64 open/high/low/close/volume (toàn bộ lịch sử)
+#    state : trạng thái sau khi xử lý nến start-1 (None khi start=0)
+# ══════════════════════════════════════════════════════════════════════════════
+def _ewm(x, alpha, start, prev, keep_at):
+    """
+    EMA đệ quy (adjust=False) trên x[start:]. `prev` = giá trị tại start-1,
+    None → lấy x[start] làm hạt giống. Trả về (mảng, giá trị tại keep_at).
+    Đoạn dài không NaN → dạng đóng vector hoá; đuôi ngắn / có NaN → vòng lặp.
+    """
+    seg = x[start:]
+    if len(seg) <= EWM_LOOP_MAX or np.isnan(seg).any():
+        return _ewm_loop(x, alpha, start, prev, keep_at)
+    seed = None if prev is None or np.isnan(prev) else prev
+    out  = _ewm_closed(seg, alpha, seed)
+    return out, (out[keep_at - start] if keep_at >= start else prev)
+
+
+def _ewm_closed(seg, alpha, seed):
+    """
+    y_j = β^j·c + α·Σ_{k≤j} β^(j-k)·x_k = (c + α·cumsum(x_k·β^-k)) / β^-j, β = 1-α,
+    c = giá trị trước khối. Chia thành khối L nến để β^-L không tràn.
+    """
+    beta = 1.0 - alpha
+    if beta <= 0.0:
+        return seg.astype(np.float64, copy=True)
+    out = np.empty(len(seg))
+    i, c = 0, seed
+    if c is None:
+        out[0] = c = seg[0]
+        i = 1
+    L  = max(1, int(EWM_BLOCK_POW / -np.log10(beta)))
+    pw = np.power(beta, -np.arange(1, min(L, len(seg)) + 1, dtype=np.float64))
+    while i < len(seg):
+        blk = seg[i:i + L]
+        w   = pw[:len(blk)]
+        out[i:i + len(blk)] = (c + alpha * np.cumsum(blk * w)) / w
+        c  = out[i + len(blk) - 1]
+        i += len(blk)
+    return out
+
+
+def _ewm_loop(x, alpha, start, prev, keep_at):
+    out  = np.empty(len(x) - start)
+    kept = prev
+    for j, i in enumerate(range(start, len(x))):
+        prev = x[i] if prev is None or np.isnan(prev) else prev + alpha * (x[i] - prev)
+        out[j] = prev
+        if i == keep_at:
+            kept = prev
+    return out, kept
+
+
+def _rolling_mean(x, n, start):
+    """Trung bình trượt n kỳ cho các vị trí [start:], vector hoá bằng cumsum."""
+    lo = max(0, start - n + 1)
+    seg = x[lo:]
+    cs = np.concatenate(([0.0], np.cumsum(seg)))
+    out = np.full(len(x) - start, np.nan)
+    for_idx = np.arange(start, len(x))
+    ok = for_idx >= n - 1
+    ends = for_idx[ok] - lo + 1
+    out[ok] = (cs[ends] - cs[ends - n]) / n
+    return out
+
+
+def _sma(a, p, start, state):
+    return {"sma": _rolling_mean(a["close"], p["n"], start)}, None
+
+
+def _ema(a, p, start, state):
+    n = len(a["close"])
+    out, kept = _ewm(a["close"], 2 / (p["n"] + 1), start, (state or {}).get("ema"), n - 2)
+    return {"ema": out}, {"ema": kept}
+
+
+def _rsi(a, p, start, state):
+    c, n = a["close"], len(a["close"])
+    d     = np.diff(c, prepend=np.nan)
+    gain  = np.where(d > 0, d, 0.0)
+    loss  = np.where(d < 0, -d, 0.0)
+    alpha = 1 / p["n"]
+    s     = max(start, 1)                   # nến 0 không có diff
+    st    = state or {}
+    g, kg = _ewm(gain, alpha, s, st.get("g"), n - 2)
+    l, kl = _ewm(loss, alpha, s, st.get("l"), n - 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(l == 0, 100.0, 100 - 100 / (1 + g / l))
+    if s > start:
+        rsi = np.concatenate(([np.nan], rsi))
+    return {"rsi": rsi}, {"g": kg, "l": kl}
+
+
+def _macd(a, p, start, state):
+    c, n = a["close"], len(a["close"])
+    st   = state or {}
+    f, kf = _ewm(c, 2 / (p["fast"] + 1), start, st.get("f"), n - 2)
+    s, ks = _ewm(c, 2 / (p["slow"] + 1), start, st.get("s"), n - 2)
+    macd  = f - s
+    full  = np.empty(n); full[start:] = macd
+    sig, kz = _ewm(full, 2 / (p["signal"] + 1), start, st.get("z"), n - 2)
+    return ({"macd": macd, "signal": sig, "hist": macd - sig},
+            {"f": kf, "s": ks, "z": kz})
+
+
+def _bbands(a, p, start, state):
+    c, w, k = a["close"], p["n"], p["k"]
+    mid  = _rolling_mean(c, w, start)
+    sq   = _rolling_mean(c * c, w, start)
+    std  = np.sqrt(np.maximum(sq - mid * mid, 0.0))     # ddof=0
+    return {"mid": mid, "upper": mid + k * std, "lower": mid - k * std}, None
+
+
+def _atr(a, p, start, state):
+    h, l, c = a["high"], a["low"], a["close"]
+    n  = len(c)
+    pc = np.concatenate(([np.nan], c[:-1]))
+    tr = np.fmax(h - l, np.fmax(np.abs(h - pc), np.abs(l - pc)))
+    out, kept = _ewm(tr, 1 / p["n"], start, (state or {}).get("atr"), n - 2)
+    return {"atr": out}, {"atr": kept}
+
+
+def _obv(a, p, start, state):
+    c, v = a["close"], a["volume"]
+    n    = len(c)
+    step = np.sign(np.diff(c, prepend=c[0])) * v
+    step[0] = 0.0
+    base = (state or {}).get("obv", 0.0) if start else 0.0
+    out  = base + np.cumsum(step[start:])
+    kept = out[n - 2 - start] if n - 2 >= start else base
+    return {"obv": out}, {"obv": kept}
+
+
+INDICATORS = {
+    # tên: (hàm, tham số mặc định, nằm trên panel giá?)
+    "sma":    (_sma,    {"n": 20},                             True),
+    "ema":    (_ema,    {"n": 20},                             True),
+    "bbands": (_bbands, {"n": 20, "k": 2.0},                   True),
+    "rsi":    (_rsi,    {"n": 14},                             False),
+    "macd":   (_macd,   {"fast": 12, "slow": 26, "signal": 9}, False),
+    "atr":    (_atr,    {"n": 14},                             False),
+    "obv":    (_obv,    {},                                    False),
+}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CACHE + CẬP NHẬT TĂNG DẦN
+# ══════════════════════════════════════════════════════════════════════════════
+class _Entry:
+    __slots__ = ("index", "last_bar", "settled", "state", "out")
+
+    def __init__(self, index, last_bar, settled, state, out):
+        self.index, self.last_bar, self.state, self.out = index, last_bar, state, out
+        self.settled = settled          # nến kế cuối lúc tính (mọi cột state phụ thuộc)
+
+
+_cache: "OrderedDict[tuple, _Entry]" = OrderedDict()
+_lock  = threading.Lock()
+_stats = {"hit": 0, "incremental": 0, "full": 0}
+
+
+def _arrays(df: pd.DataFrame) -> dict:
+    return {k.lower(): df[k].to_numpy(dtype=np.float64)
+            for k in ("Open", "High", "Low", "Close", "Volume") if k in df.columns}
+
+
+def _bar(a: dict, i: int) -> tuple:
+    """Nến thứ i trên mọi cột state có thể phụ thuộc (ATR: high/low, OBV: volume)."""
+    return tuple(float(a[k][i]) for k in ("close", "high", "low", "volume") if k in a)
+
+
+def _resume_from(e: _Entry, index: pd.Index, a: dict):
+    """
+    Vị trí bắt đầu tính lại nếu dữ liệu mới nối tiếp được entry cũ, ngược lại
+    None. Nến kế cuối cũ đổi (close/high/low/volume) = lịch sử đã điều chỉnh
+    → phải tính lại hết.
+    """
+    m = len(e.index)
+    if m < 2 or len(index) < m or not index[:m - 1].equals(e.index[:m - 1]):
+        return None
+    if _bar(a, m - 2) != e.settled:
+        return None
+    return m - 1
+
+
+def compute(symbol: str, df: pd.DataFrame, name: str, **params) -> dict:
+    """
+    Tính chỉ báo `name` trên df (Open/High/Low/Close/Volume, index ngày tăng dần).
+    Trả về {tên output: pd.Series theo df.index}.
+    """
+    fn, defaults, _ = INDICATORS[name]
+    p   = {**defaults, **params}
+    key = (symbol, name, tuple(sorted(p.items())))
+    a   = _arrays(df)
+    last_bar = _bar(a, -1)
+
+    with _lock:
+        e = _cache.get(key)
+        if e is not None:
+            _cache.move_to_end(key)
+
+    if e is not None and len(e.index) == len(df) and e.index[-1] == df.index[-1] \
+            and e.last_bar == last_bar and e.index.equals(df.index):
+        with _lock:
+            _stats["hit"] += 1
+        out = e.out
+    else:
+        start = _resume_from(e, df.index, a) if e is not None else None
+        if start is not None:
+            tail, state = fn(a, p, start, e.state)
+            out = {k: np.concatenate((e.out[k][:start], tail[k])) for k in tail}
+            kind = "incremental"
+        else:
+            out, state = fn(a, p, 0, None)
+            kind = "full"
+        with _lock:
+            _stats[kind] += 1
+            settled = _bar(a, -2) if len(df) >= 2 else None
+            _cache[key] = _Entry(df.index, last_bar, settled, state, out)
+            _cache.move_to_end(key)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    return {k: pd.Series(v, index=df.index, name=k) for k, v in out.items()}
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "entries": len(_cache)}
+
+
+def clear():
+    with _lock:
+        _cache.clear()
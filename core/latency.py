@@ -0,0 +1,203 @@
+"""
+core/latency.py — Đo thời gian từng bước của waterfall dữ liệu
+
+get_stock_data / chart chỉ có `_calc_source` để debug — không biết thời gian
+đi đâu. Mỗi bước (history từng lần thử, .info, income_stmt, balance_sheet,
+từng API VN, merge, tải + dựng chart) được bọc trong 1 span; span ghi vào
+histogram trong process:
+
+  thời lượng   → bucket cố định kiểu Prometheus (5ms … 60s)
+  kết quả      → ok / empty / error / not_found / partial ... (đếm riêng)
+  retry, sleep → cộng dồn — tách được "mạng chậm" với "tự ngủ chờ 429"
+
+    with latency.span("info") as sp:
+        data = yf.Ticker(sym).info
+        if not data: sp.outcome = "empty"
+    ...
+    for attempt in range(3):
+        if attempt: sp.retries += 1
+        ...
+        sp.sleep(3)                      # ngủ + cộng vào sleep_s
+
+  Exception lọt ra khỏi span → outcome "error" (nếu chưa gán khác), vẫn raise.
+  subscribe(fn)      → nhận từng mẫu (vd core.providers xếp hạng nguồn)
+  stats()            → p50 / p99 / mean / max theo từng bước
+  prometheus_text()  → text exposition format cho scraper
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Cận trên bucket (giây) — cuối cùng là +Inf
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0)
+METRIC_PREFIX = "lbck_stage"
+
+
+class _Hist:
+    __slots__ = ("counts", "count", "sum", "max", "outcomes", "retries", "sleep_s")
+
+    def __init__(self):
+        self.counts   = [0] * (len(BUCKETS) + 1)
+        self.count    = 0
+        self.sum      = 0.0
+        self.max      = 0.0
+        self.outcomes = {}
+        self.retries  = 0
+        self.sleep_s  = 0.0
+
+    def add(self, seconds, outcome, retries, sleep_s):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count   += 1
+        self.sum     += seconds
+        self.max      = max(self.max, seconds)
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.retries += retries
+        self.sleep_s += sleep_s
+
+    def quantile(self, q: float) -> float:
+        """Nội suy tuyến tính trong bucket (như histogram_quantile)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = BUCKETS[i - 1] if i else 0.0
+                hi = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lo + (hi - lo) * (rank - seen) / c, self.max)
+            seen += c
+        return self.max
+
+
+class Span:
+    __slots__ = ("stage", "labels", "outcome", "retries", "sleep_s")
+
+    def __init__(self, stage: str, labels: dict):
+        self.stage   = stage
+        self.labels  = labels
+        self.outcome = "ok"
+        self.retries = 0
+        self.sleep_s = 0.0
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+        self.sleep_s += seconds
+
+
+class Registry:
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._lock  = threading.Lock()
+        self._hists = {}
+        self._listeners = []
+
+    def subscribe(self, fn):
+        """fn(stage, seconds, outcome, **labels) được gọi sau mỗi lần ghi."""
+        self._listeners.append(fn)
+
+    def observe(self, stage: str, seconds: float, outcome: str = "ok",
+                retries: int = 0, sleep_s: float = 0.0, **labels):
+        key = (stage, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._hists.get(key)
+            if h is None:
+                h = self._hists[key] = _Hist()
+            h.add(seconds, outcome, retries, sleep_s)
+        for fn in self._listeners:
+            try:
+                fn(stage, seconds, outcome, **labels)
+            except Exception:
+                pass
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        sp = Span(stage, labels)
+        t0 = self._clock()
+        try:
+            yield sp
+        except BaseException:
+            if sp.outcome == "ok":
+                sp.outcome = "error"
+            raise
+        finally:
+            self.observe(stage, self._clock() - t0, sp.outcome,
+                         sp.retries, sp.sleep_s, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._hists.clear()
+
+    def _items(self):
+        with self._lock:
+            return sorted((k, _copy(h)) for k, h in self._hists.items())
+
+    def stats(self) -> list:
+        rows = []
+        for (stage, labels), h in self._items():
+            rows.append({
+                "stage":    stage + "".join(f" {k}={v}" for k, v in labels),
+                "count":    h.count,
+                "p50_ms":   round(h.quantile(0.50) * 1000, 1),
+                "p99_ms":   round(h.quantile(0.99) * 1000, 1),
+                "mean_ms":  round(h.sum / h.count * 1000, 1),
+                "max_ms":   round(h.max * 1000, 1),
+                "outcomes": dict(h.outcomes),
+                "retries":  h.retries,
+                "sleep_s":  round(h.sleep_s, 2),
+            })
+        return rows
+
+    def prometheus_text(self) -> str:
+        name  = METRIC_PREFIX
+        items = self._items()
+        out = [f"# HELP {name}_duration_seconds Thời gian từng bước waterfall dữ liệu.",
+               f"# TYPE {name}_duration_seconds histogram"]
+        for (stage, labels), h in items:
+            base, cum = _labels(stage, labels), 0
+            for le, c in zip(BUCKETS + ("+Inf",), h.counts):
+                cum += c
+                out.append(f'{name}_duration_seconds_bucket{{{base},le="{le}"}} {cum}')
+            out.append(f"{name}_duration_seconds_sum{{{base}}} {h.sum:.6f}")
+            out.append(f"{name}_duration_seconds_count{{{base}}} {h.count}")
+        out += [f"# HELP {name}_outcomes_total Số lần chạy theo kết quả.",
+                f"# TYPE {name}_outcomes_total counter"]
+        for (stage, labels), h in items:
+            base = _labels(stage, labels)
+            for outcome, c in sorted(h.outcomes.items()):
+                out.append(f'{name}_outcomes_total{{{base},outcome="{outcome}"}} {c}')
+        out += [f"# HELP {name}_retries_total Số lần thử lại.",
+                f"# TYPE {name}_retries_total counter"]
+        out += [f"{name}_retries_total{{{_labels(s, l)}}} {h.retries}" for (s, l), h in items]
+        out += [f"# HELP {name}_sleep_seconds_total Thời gian ngủ chờ giữa các lần thử.",
+                f"# TYPE {name}_sleep_seconds_total counter"]
+        out += [f"{name}_sleep_seconds_total{{{_labels(s, l)}}} {h.sleep_s:.3f}" for (s, l), h in items]
+        return "\n".join(out) + "\n"
+
+
+def _copy(h: _Hist) -> _Hist:
+    c = _Hist()
+    c.counts, c.count, c.sum, c.max = list(h.counts), h.count, h.sum, h.max
+    c.outcomes, c.retries, c.sleep_s = dict(h.outcomes), h.retries, h.sleep_s
+    return c
+
+
+def _esc(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(stage: str, labels: tuple) -> str:
+    return ",".join([f'stage="{_esc(stage)}"'] + [f'{k}="{_esc(v)}"' for k, v in labels])
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  REGISTRY MẶC ĐỊNH CỦA PROCESS
+# ══════════════════════════════════════════════════════════════════════════════
+_default = Registry()
+
+span            = _default.span
+observe         = _default.observe
+subscribe       = _default.subscribe
+stats           = _default.stats
+prometheus_text = _default.prometheus_text
+reset           = _default.reset
@@ -0,0 +1,240 @@
+"""
+core/ohlcv_store.py — Kho nến ngày (OHLCV) trên đĩa, cập nhật tăng dần
+
+Trước đây mỗi lần vẽ chart là `yf.download(period="5y")` tải lại TOÀN BỘ
+chuỗi. Kho này lưu nến ngày theo mã vào SQLite (stdlib, không cần thêm
+thư viện) và chỉ tải phần còn thiếu:
+
+  - Chưa có gì            → tải 1 lần đúng khoảng cần
+  - Thiếu phía trước      → tải bù [start, ngày đầu đã lưu)   (backfill)
+  - Phía sau              → tải từ 2 nến cuối đã lưu đến nay (delta):
+        nến cuối có thể là nến chưa đóng phiên → ghi đè
+        nến kế cuối đã chốt → nếu giá khác đi = có điều chỉnh cổ tức/chia
+        tách → xoá mã, tải lại toàn bộ
+  - Vừa cập nhật < REFRESH_S → không gọi mạng
+
+    df = get_history("FPT.VN", "5y")   # DataFrame Open/High/Low/Close/Volume
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+import yfinance as yf
+
+from core import latency
+
+_ROOT     = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get("LBCK_CACHE_DIR", os.path.join(_ROOT, ".cache"))
+DB_PATH   = os.path.join(CACHE_DIR, "ohlcv.sqlite")
+
+REFRESH_S   = 300      # không tải delta nếu vừa cập nhật trong 5 phút
+ADJUST_TOL  = 0.005    # nến đã chốt lệch > 0.5% → coi như giá đã điều chỉnh
+COLUMNS     = ["Open", "High", "Low", "Close", "Volume"]
+
+PERIOD_DAYS = {
+    "1mo": 31, "3mo": 92, "6mo": 183,
+    "1y": 366, "2y": 731, "5y": 1827, "10y": 3653,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT NOT NULL, date TEXT NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL,
+    PRIMARY KEY (symbol, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    symbol       TEXT PRIMARY KEY,
+    covered_from TEXT NOT NULL,     -- ngày sớm nhất đã từng yêu cầu tải
+    fetched_at   REAL NOT NULL      -- epoch lần tải delta gần nhất
+);
+"""
+
+_sym_locks: dict = {}
+_locks_guard = threading.Lock()
+_init_done = False
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  SQLITE
+# ══════════════════════════════════════════════════════════════════════════════
+def _connect() -> sqlite3.Connection:
+    global _init_done
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    con = sqlite3.connect(DB_PATH, timeout=15)
+    if not _init_done:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript(_SCHEMA)
+        _init_done = True
+    return con
+
+
+def _lock_for(symbol: str) -> threading.RLock:
+    with _locks_guard:
+        return _sym_locks.setdefault(symbol, threading.RLock())
+
+
+def _read_meta(con, symbol):
+    row = con.execute("SELECT covered_from, fetched_at FROM meta WHERE symbol=?",
+                      (symbol,)).fetchone()
+    return (date.fromisoformat(row[0]), row[1]) if row else (None, 0.0)
+
+
+def _last_dates(con, symbol, n=2) -> list:
+    rows = con.execute("SELECT date, close FROM bars WHERE symbol=? "
+                       "ORDER BY date DESC LIMIT ?", (symbol, n)).fetchall()
+    return [(date.fromisoformat(d), c) for d, c in rows]
+
+
+def _write(con, symbol, df: pd.DataFrame):
+    if df.empty:
+        return
+    rows = [(symbol, idx.date().isoformat(),
+             float(r.Open), float(r.High), float(r.Low), float(r.Close), float(r.Volume))
+            for idx, r in zip(df.index, df.itertuples(index=False))]
+    con.executemany("INSERT OR REPLACE INTO bars VALUES (?,?,?,?,?,?,?)", rows)
+
+
+def _set_meta(con, symbol, covered_from: date, fetched_at: float):
+    con.execute("INSERT OR REPLACE INTO meta VALUES (?,?,?)",
+                (symbol, covered_from.isoformat(), fetched_at))
+
+
+def _read(con, symbol, start: date) -> pd.DataFrame:
+    df = pd.read_sql_query(
+        "SELECT date, open, high, low, close, volume FROM bars "
+        "WHERE symbol=? AND date>=? ORDER BY date", con,
+        params=(symbol, start.isoformat()), parse_dates=["date"], index_col="date")
+    df.columns = COLUMNS
+    df.index.name = "Date"
+    return df
+
+
+def invalidate(symbol: str):
+    con = _connect()
+    try:
+        with con:
+            con.execute("DELETE FROM bars WHERE symbol=?", (symbol,))
+            con.execute("DELETE FROM meta WHERE symbol=?", (symbol,))
+    finally:
+        con.close()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  TẢI TỪ YAHOO
+# ══════════════════════════════════════════════════════════════════════════════
+def _normalize(df) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = [col[0] for col in df.columns]
+    df.columns = [str(c).capitalize() for c in df.columns]
+    df = df[[c for c in COLUMNS if c in df.columns]].dropna(subset=["Close"])
+    if df.index.tz is not None:
+        df.index = df.index.tz_localize(None)
+    return df
+
+
+def _download(symbol: str, start: date, end: date):
+    """
+    yf.download [start, end) có retry khi rate limit (như chart_ui cũ).
+    Trả None nếu lỗi mạng → không đánh dấu khoảng này là đã có.
+    """
+    with latency.span("chart_download") as sp:
+        for attempt in range(3):
+            if attempt:
+                sp.retries += 1
+            try:
+                df = yf.download(symbol, start=start.isoformat(), end=end.isoformat(),
+                                 progress=False, timeout=12)
+                return _normalize(df)
+            except Exception as e:
+                err = str(e).lower()
+                if ("ratelimit" in err or "429" in err or "too many" in err) and attempt < 2:
+                    sp.sleep((attempt + 1) * 4)
+                else:
+                    break
+        sp.outcome = "error"
+        return None
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  API CHÍNH
+# ══════════════════════════════════════════════════════════════════════════════
+def get_history(symbol: str, period: str = "1y", today: date = None) -> pd.DataFrame:
+    """
+    Nến ngày của `symbol` (mã Yahoo, vd "FPT.VN") cho `period`, lấy từ kho
+    và chỉ tải phần còn thiếu. Trả DataFrame rỗng nếu Yahoo không có mã.
+    """
+    today = today or date.today()
+    start = today - timedelta(days=PERIOD_DAYS.get(period, 366))
+    end   = today + timedelta(days=1)
+
+    with _lock_for(symbol):
+        con = _connect()
+        try:
+            covered_from, fetched_at = _read_meta(con, symbol)
+            tail = _last_dates(con, symbol)
+
+            if covered_from is None or not tail:
+                fresh = _download(symbol, start, end)
+                if fresh is None or fresh.empty:
+                    return _normalize(None)
+                with con:
+                    _write(con, symbol, fresh)
+                    _set_meta(con, symbol, start, time.time())
+                return _read(con, symbol, start)
+
+            # Thiếu phía trước → tải bù
+            if start < covered_from:
+                back = _download(symbol, start, covered_from)
+                if back is not None:
+                    with con:
+                        _write(con, symbol, back)
+                        _set_meta(con, symbol, start, fetched_at)
+                    covered_from = start
+
+            # Phía sau → delta từ 2 nến cuối
+            if time.time() - fetched_at >= REFRESH_S:
+                since = tail[-1][0]                   # nến kế cuối (hoặc nến duy nhất)
+                delta = _download(symbol, since, end)
+                if delta is None:
+                    return _read(con, symbol, start)
+                if len(tail) >= 2 and not delta.empty:
+                    settled_d, settled_c = tail[-1]
+                    hit = delta[delta.index.date == settled_d]
+                    if (not hit.empty and settled_c and
+                            abs(float(hit["Close"].iloc[0]) / settled_c - 1) > ADJUST_TOL):
+                        con.close()
+                        invalidate(symbol)
+                        return get_history(symbol, period, today)
+                with con:
+                    _write(con, symbol, delta)
+                    _set_meta(con, symbol, covered_from, time.time())
+
+            return _read(con, symbol, start)
+        finally:
+            con.close()
+
+
+def slice_period(df: pd.DataFrame, period: str, today: date = None) -> pd.DataFrame:
+    """Cắt khung `period` từ chuỗi dài hơn — cùng mốc start như get_history."""
+    if df is None or df.empty:
+        return df
+    today = today or date.today()
+    start = today - timedelta(days=PERIOD_DAYS.get(period, 366))
+    return df[df.index >= pd.Timestamp(start)]
+
+
+def stats() -> dict:
+    """Số mã / số nến đang lưu + dung lượng file."""
+    con = _connect()
+    try:
+        n_sym, n_bar = con.execute(
+            "SELECT COUNT(DISTINCT symbol), COUNT(*) FROM bars").fetchone()
+    finally:
+        con.close()
+    size = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
+    return {"symbols": n_sym, "bars": n_bar, "bytes": size}
@@ -0,0 +1,129 @@
+"""
+core/providers.py — Registry nguồn dữ liệu: chọn nguồn theo vùng + trường còn thiếu
+
+Trước đây get_stock_data gọi MỌI nguồn cho mọi mã: API VN (VnDirect, TCBS,
+SSI) chạy cả cho AAPL, và thứ tự không đổi dù nguồn đó đang chết. Mỗi nguồn
+giờ khai báo:
+
+  regions  vùng phục vụ ("VN", "US", "INTL")
+  fields   các trường có thể cung cấp (pe, eps, room...)
+  cost     chi phí tương đối (trang Yahoo nặng, dễ bị rate limit → cost cao)
+  key      "ticker" (mã trần) hay "yf" (mã Yahoo)
+
+plan(region, missing) chọn tham lam tập nguồn nhỏ nhất phủ được các trường
+còn thiếu, theo thứ tự điểm:
+
+  score = (latency EWMA + cost × COST_S) / tỉ lệ thành công EWMA
+
+Thành công / độ trễ cập nhật từ span của core.latency (chỉ lần gọi mạng thật).
+Nguồn lâu không có mẫu mới được hồi dần tỉ lệ thành công (RECOVER_S) → nguồn
+từng chết vẫn được thử lại khi đã sống lại.
+
+    reg = Registry()
+    reg.register(Provider("vndirect", fn, {"VN"}, {"pe", "pb"}, cost=1))
+    for p in reg.plan("VN", {"pe", "room"}): ...
+"""
+import threading
+import time
+
+ALPHA       = 0.2      # trọng số mẫu mới trong EWMA
+COST_S      = 0.1      # 1 đơn vị cost ≈ 100ms khi xếp hạng
+MIN_SUCCESS = 0.05     # chặn dưới — nguồn chết vẫn là lựa chọn cuối cùng
+RECOVER_S   = 600.0    # sau 10 phút không có mẫu → tỉ lệ thành công về lại 1
+
+
+class Provider:
+    def __init__(self, name: str, fn, regions, fields, cost: float = 1.0,
+                 key: str = "ticker", prior_s: float = 0.5, available=None):
+        self.name      = name
+        self.fn        = fn
+        self.regions   = frozenset(regions)
+        self.fields    = frozenset(fields)
+        self.cost      = cost
+        self.key       = key
+        self.available = available or (lambda: True)
+        self.success   = 1.0            # lạc quan: nguồn mới luôn được thử
+        self.prior_s   = prior_s
+        self.latency_s = prior_s
+        self.calls     = 0
+        self.failures  = 0
+        self.last_at   = None
+
+    def serves(self, region: str) -> bool:
+        return region in self.regions
+
+    def success_rate(self, now: float) -> float:
+        if self.last_at is None:
+            return self.success
+        heal = min(1.0, (now - self.last_at) / RECOVER_S)
+        return self.success + (1.0 - self.success) * heal
+
+    def score(self, now: float) -> float:
+        return (self.latency_s + self.cost * COST_S) / max(self.success_rate(now), MIN_SUCCESS)
+
+
+class Registry:
+    def __init__(self, alpha: float = ALPHA, clock=time.monotonic):
+        self._alpha     = alpha
+        self._clock     = clock
+        self._lock      = threading.Lock()
+        self._providers = {}
+
+    def register(self, provider: Provider) -> Provider:
+        self._providers[provider.name] = provider
+        return provider
+
+    def get(self, name: str) -> Provider:
+        return self._providers[name]
+
+    def record(self, name: str, ok: bool, seconds: float):
+        p = self._providers.get(name)
+        if p is None:
+            return
+        a = self._alpha
+        with self._lock:
+            p.success   = (1 - a) * p.success_rate(self._clock()) + a * (1.0 if ok else 0.0)
+            p.latency_s = (1 - a) * p.latency_s + a * seconds
+            p.calls    += 1
+            p.failures += 0 if ok else 1
+            p.last_at   = self._clock()
+
+    def reset(self):
+        """Xoá thống kê đã học (về lại prior) — admin / benchmark."""
+        with self._lock:
+            for p in self._providers.values():
+                p.success, p.calls, p.failures, p.last_at = 1.0, 0, 0, None
+                p.latency_s = p.prior_s
+
+    def observe(self, stage: str, seconds: float, outcome: str, **labels):
+        """Listener cho core.latency.subscribe — span trùng tên nguồn."""
+        if stage in self._providers:
+            self.record(stage, outcome == "ok", seconds)
+
+    def ranked(self, region: str) -> list:
+        now = self._clock()
+        ps = [p for p in self._providers.values() if p.serves(region) and p.available()]
+        return sorted(ps, key=lambda p: p.score(now))
+
+    def plan(self, region: str, missing, exclude=()) -> list:
+        """Các nguồn cần gọi (theo thứ tự điểm) để phủ `missing`; [] nếu không nguồn nào giúp được."""
+        need, out = set(missing), []
+        for p in self.ranked(region):
+            if not need:
+                break
+            if p.name not in exclude and need & p.fields:
+                out.append(p)
+                need -= p.fields
+        return out
+
+    def stats(self) -> dict:
+        now = self._clock()
+        return {p.name: {
+            "regions":   ",".join(sorted(p.regions)),
+            "score":     round(p.score(now), 3),
+            "success":   round(p.success_rate(now), 3),
+            "latency_s": round(p.latency_s, 3),
+            "calls":     p.calls,
+            "failures":  p.failures,
+            "available": p.available(),
+        } for p in sorted(self._providers.values(), key=lambda p: p.score(now))}
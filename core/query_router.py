@@ -0,0 +1,127 @@
+"""
+core/query_router.py — Phân loại câu nhập: mã cổ phiếu hay câu hỏi thị trường
+
+Bản cũ (app.classify) chạy `kw in text` lần lượt qua cả danh sách từ khoá
+rồi đoán theo độ dài từ:
+  - khớp chuỗi con không theo ranh giới từ ("fed" khớp cả "fedex", "gdp"
+    khớp "gdpr"...) và chi phí tăng theo số từ khoá
+  - mã hợp lệ đi kèm 1 từ khoá ("HPG rủi ro") bị đẩy sang câu hỏi chung
+
+Router:
+  - Mọi từ khoá gộp thành 1 regex đã biên dịch, có ranh giới từ (Unicode)
+  - Token đầu là mã đã biết (KNOWN_SYMBOLS + mã tra thành công, add_symbol)
+    và câu ngắn → "ticker", bất kể có từ khoá — chỉ khi token được GÕ HOA
+    hoặc theo sau toàn là mã: KNOWN_SYMBOLS có cả từ thường (OIL, GAS, CEO,
+    POW, AMD) → "oil price outlook", "ceo là ai" vẫn là câu hỏi chung
+  - Còn lại giữ nguyên heuristic cũ (1–2 từ, mỗi từ ≤ 6 ký tự chữ/số)
+
+    classify("FPT")                   → "ticker"
+    classify_batch(["lãi suất?", "VNM"]) → ["general", "ticker"]
+    route("FPT?")                     → ("ticker", "FPT")   # mã đã bỏ dấu câu
+
+LBCK_QUERY_LOG=queries.jsonl → log_query ghi mỗi câu nhập + kết quả route
+(1 dòng JSON) để gán nhãn làm bộ câu thật cho benchmarks/bench_router.py.
+"""
+import json
+import os
+import re
+import threading
+import time
+
+from core.batch_fetcher import VN30
+
+GENERAL_KEYWORDS = [
+    "thị trường", "market", "nhận định", "lạm phát", "lãi suất", "kinh tế", "vĩ mô",
+    "hôm nay", "tuần này", "tháng này", "xu hướng", "nên mua", "nên bán", "cổ phiếu nào",
+    "gợi ý", "recommend", "inflation", "interest rate", "gdp", "fed", "ngân hàng",
+    "strategy", "chiến lược", "danh mục", "portfolio", "rủi ro", "risk", "cơ hội",
+    "tổng quan", "tổng kết", "diễn biến", "có gì", "thế nào", "ra sao", "như thế nào",
+    "hàng hóa", "dầu", "vàng", "đặc biệt", "sự kiện",
+]
+
+KNOWN_SYMBOLS = set(VN30) | {
+    # HOSE / HNX / UPCOM thanh khoản cao ngoài VN30
+    "VND", "VCI", "HCM", "DIG", "DXG", "NVL", "PDR", "KBC", "GEX", "DGC",
+    "DCM", "DPM", "PVD", "PVS", "PVT", "BSR", "OIL", "REE", "PNJ", "FRT",
+    "DGW", "VHC", "ANV", "KDH", "NLG", "HSG", "NKG", "EIB", "MSB", "OCB",
+    "VIX", "SHS", "CEO", "IDC", "VGC", "HAG", "HHV", "CII", "VCG", "POW",
+    # Mỹ
+    "AAPL", "MSFT", "NVDA", "TSLA", "GOOGL", "GOOG", "AMZN", "META", "NFLX", "AMD",
+}
+
+_MAX_TICKER_QUERY_WORDS = 3      # "HPG rủi ro" vẫn là tra mã
+QUERY_LOG = os.environ.get("LBCK_QUERY_LOG")
+_log_lock = threading.Lock()
+
+
+class Router:
+    def __init__(self, keywords=GENERAL_KEYWORDS, symbols=KNOWN_SYMBOLS):
+        kws = sorted({k.lower() for k in keywords}, key=len, reverse=True)
+        self._kw_re  = re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, kws)) + r")(?!\w)")
+        self._tok_re = re.compile(r"[^\W_]+")
+        self._symbols = {s.upper() for s in symbols}
+        self._lock = threading.Lock()
+
+    def add_symbol(self, symbol: str):
+        """Mã vừa tra thành công → lần sau luôn được nhận là mã."""
+        with self._lock:
+            self._symbols.add(symbol.upper())
+
+    def is_known(self, symbol: str) -> bool:
+        return symbol.upper() in self._symbols
+
+    def route(self, text: str):
+        """("ticker", mã) hoặc ("general", None) — mã là token router đã khớp."""
+        if not text:
+            return "general", None
+        tl = text.lower().strip()
+        ws = self._tok_re.findall(tl)
+        if not ws:
+            return "general", None
+        sym = ws[0].upper()
+        if len(ws) <= _MAX_TICKER_QUERY_WORDS and sym in self._symbols \
+                and (self._tok_re.search(text).group().isupper()
+                     or all(w.upper() in self._symbols for w in ws[1:])):
+            return "ticker", sym
+        if self._kw_re.search(tl):
+            return "general", None
+        words = tl.split()
+        if len(words) == 1 and len(words[0]) <= 6 and words[0].isalnum():
+            return "ticker", sym
+        if len(words) == 2 and all(len(w) <= 6 and w.isalnum() for w in words):
+            return "ticker", sym
+        return "general", None
+
+    def classify(self, text: str) -> str:
+        return self.route(text)[0]
+
+    def classify_batch(self, texts) -> list:
+        return [self.classify(t) for t in texts]
+
+
+_default = Router()
+
+
+def route(text: str):
+    return _default.route(text)
+
+
+def classify(text: str) -> str:
+    return _default.classify(text)
+
+
+def classify_batch(texts) -> list:
+    return _default.classify_batch(texts)
+
+
+def add_symbol(symbol: str):
+    _default.add_symbol(symbol)
+
+
+def log_query(text: str, kind: str):
+    """Ghi câu nhập vào QUERY_LOG (chỉ khi bật) — thêm "label" tay rồi dùng làm --corpus."""
+    if not QUERY_LOG:
+        return
+    line = json.dumps({"q": text, "route": kind, "ts": int(time.time())}, ensure_ascii=False)
+    with _log_lock, open(QUERY_LOG, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
@@ -0,0 +1,207 @@
+"""
+core/rate_limiter.py — Giới hạn tốc độ gọi Gemini dùng chung cả tiến trình
+
+Mọi phiên Streamlit chạy chung 1 tiến trình → chung 1 bộ giới hạn theo model:
+  - Token bucket theo phút (dạng GCRA: mỗi yêu cầu nhận 1 "khe" thời gian,
+    khe sau nối tiếp khe trước → vào hàng đúng thứ tự FIFO, biết trước
+    phải chờ bao lâu)
+  - Trần theo ngày (reset 0h giờ Pacific như quota Gemini)
+  - Gặp 429 → penalize(): đẩy khe kế tiếp ra sau retryDelay cho TẤT CẢ phiên,
+    thay vì mỗi phiên tự sleep 35s rồi gọi tiếp
+
+    wait = acquire("gemini-2.0-flash", max_wait=90,
+                   on_wait=lambda s, ahead: ...)   # báo UI thời gian chờ
+    ... gọi API ...
+
+Quota Gemini tính theo từng API key → mỗi (model, key) có 1 limiter riêng;
+`key` là mã rút gọn của key (core.genai_pool), "" = key duy nhất.
+
+Nguồn khác (vd "yahoo") dùng chung cơ chế qua configure(): request thật
+đã gọi → charge() (không chờ), việc chạy nền chờ ready_in() == 0 rồi mới gọi
+→ luồng nền tự nhường khi người dùng đang tiêu ngân sách.
+"""
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+    _QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:
+    _QUOTA_TZ = timezone(timedelta(hours=-8))
+
+# model (hoặc tiền tố) → (req/phút, req/ngày) — gói miễn phí
+MODEL_LIMITS = {
+    "gemini-2.0-flash": (15, 1500),
+    "gemini-1.5-flash": (15, 1500),
+    "gemini-2.0-pro":   (2, 50),
+    "gemini-1.5-pro":   (2, 50),
+}
+DEFAULT_LIMITS  = (15, 1500)
+PRO_LIMITS      = (2, 50)
+MAX_QUEUE_S     = 90.0     # chờ lâu hơn → báo người dùng thay vì treo phiên
+DEFAULT_RETRY_S = 35.0     # 429 không kèm retryDelay
+
+
+class QuotaExceeded(Exception):
+    """Không thể gọi trong MAX_QUEUE_S (hàng đợi quá dài / hết quota ngày)."""
+    def __init__(self, model, wait_s, daily=False):
+        self.model, self.wait_s, self.daily = model, wait_s, daily
+        super().__init__(f"{model}: phải chờ {wait_s:.0f}s" + (" (hết quota ngày)" if daily else ""))
+
+
+def _quota_day(wall: float) -> str:
+    return datetime.fromtimestamp(wall, _QUOTA_TZ).date().isoformat()
+
+
+def _until_quota_reset(wall: float) -> float:
+    now = datetime.fromtimestamp(wall, _QUOTA_TZ)
+    nxt = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), now.tzinfo)
+    return (nxt - now).total_seconds()
+
+
+class ModelLimiter:
+    def __init__(self, model: str, rpm: int, rpd: int, burst: int = None,
+                 clock=time.monotonic, wall=time.time, key: str = ""):
+        self.model, self.rpm, self.rpd, self.key = model, rpm, rpd, key
+        self.interval = 60.0 / rpm
+        self.burst    = burst or max(1, rpm // 5)
+        self._tau     = (self.burst - 1) * self.interval
+        self._clock, self._wall = clock, wall
+        self._lock    = threading.Lock()
+        self._tat     = 0.0             # theoretical arrival time của khe kế tiếp
+        self._day     = _quota_day(wall())
+        self._used    = 0
+        self._waiting = 0
+        self._counts  = {"admitted": 0, "queued": 0, "rejected": 0, "throttled": 0,
+                         "charged": 0}
+
+    def _roll_day(self):
+        day = _quota_day(self._wall())
+        if day != self._day:
+            self._day, self._used = day, 0
+
+    def reserve(self, max_wait: float = MAX_QUEUE_S):
+        """
+        Giữ 1 khe, trả về (số giây phải chờ, số yêu cầu đang chờ phía trước).
+        Quá max_wait hoặc hết quota ngày → QuotaExceeded (không giữ khe).
+        """
+        with self._lock:
+            self._roll_day()
+            if self._used >= self.rpd:
+                self._counts["rejected"] += 1
+                raise QuotaExceeded(self.model, _until_quota_reset(self._wall()), daily=True)
+            now  = self._clock()
+            tat  = max(self._tat, now)
+            wait = max(0.0, tat - self._tau - now)
+            if wait > max_wait:
+                self._counts["rejected"] += 1
+                raise QuotaExceeded(self.model, wait)
+            self._tat   = tat + self.interval
+            self._used += 1
+            ahead = self._waiting
+            self._counts["queued" if wait > 0 else "admitted"] += 1
+            return wait, ahead
+
+    def charge(self, n: int = 1):
+        """Ghi nhận n lần gọi ĐÃ diễn ra (không chờ, không từ chối) — khe kế tiếp lùi lại."""
+        with self._lock:
+            self._roll_day()
+            self._tat    = max(self._tat, self._clock()) + n * self.interval
+            self._used  += n
+            self._counts["charged"] += n
+
+    def ready_in(self) -> float:
+        """Số giây tới khi có khe trống (0 = gọi được ngay), không giữ khe."""
+        with self._lock:
+            return max(0.0, self._tat - self._tau - self._clock())
+
+    def penalize(self, retry_after: float = DEFAULT_RETRY_S):
+        """API trả 429 → không cấp khe nào trước now + retry_after."""
+        with self._lock:
+            self._tat = max(self._tat, self._clock() + retry_after + self._tau)
+            self._counts["throttled"] += 1
+
+    def wait(self, seconds: float):
+        with self._lock:
+            self._waiting += 1
+        try:
+            time.sleep(seconds)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._roll_day()
+            now = self._clock()
+            return {
+                "model": self.model, "key": self.key, "rpm": self.rpm, "rpd": self.rpd,
+                "used_today": self._used, "left_today": max(0, self.rpd - self._used),
+                "next_slot_s": round(max(0.0, self._tat - self._tau - now), 1),
+                "waiting": self._waiting, **self._counts,
+            }
+
+
+_limiters: dict = {}
+_guard = threading.Lock()
+
+
+def limits_for(model: str) -> tuple:
+    for prefix, lim in MODEL_LIMITS.items():
+        if model.startswith(prefix):
+            return lim
+    return PRO_LIMITS if "pro" in model.lower() else DEFAULT_LIMITS
+
+
+def limiter_for(model: str, key: str = "") -> ModelLimiter:
+    with _guard:
+        lim = _limiters.get((model, key))
+        if lim is None:
+            lim = _limiters[(model, key)] = ModelLimiter(model, *limits_for(model), key=key)
+        return lim
+
+
+def configure(name: str, rpm: float, rpd: int = 10 ** 9, burst: int = None) -> ModelLimiter:
+    """Limiter cho nguồn không phải Gemini (giới hạn tự đặt); gọi lại → thay limiter cũ."""
+    with _guard:
+        lim = _limiters[(name, "")] = ModelLimiter(name, rpm, rpd, burst=burst)
+        return lim
+
+
+def acquire(model: str, max_wait: float = MAX_QUEUE_S, on_wait=None, key: str = "") -> float:
+    """
+    Chờ tới lượt gọi `model` (FIFO). on_wait(giây, số phía trước) được gọi
+    trước khi chờ để UI hiện thời gian ước tính. Trả về số giây đã chờ.
+    """
+    lim = limiter_for(model, key)
+    wait, ahead = lim.reserve(max_wait)
+    if wait > 0:
+        if on_wait:
+            try: on_wait(wait, ahead)
+            except Exception: pass
+        lim.wait(wait)
+    return wait
+
+
+def penalize(model: str, retry_after: float = DEFAULT_RETRY_S, key: str = ""):
+    limiter_for(model, key).penalize(retry_after)
+
+
+def seconds_to_reset() -> float:
+    """Số giây tới lúc quota ngày reset."""
+    return _until_quota_reset(time.time())
+
+
+def retry_after_from(err: str) -> float:
+    """Đọc retryDelay ('35s') trong thông báo 429 của Gemini, mặc định 35s."""
+    m = re.search(r"retry[^0-9]{0,20}(\d+(?:\.\d+)?)\s*s", err, re.IGNORECASE)
+    return float(m.group(1)) if m else DEFAULT_RETRY_S
+
+
+def stats() -> dict:
+    """Trạng thái mọi (model, key) đã dùng — cho sidebar / giám sát."""
+    with _guard:
+        lims = list(_limiters.values())
+    return {f"{l.model}@{l.key}" if l.key else l.model: l.snapshot() for l in lims}
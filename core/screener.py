@@ -0,0 +1,320 @@
+"""
+core/screener.py — Bộ lọc cổ phiếu dạng vector trên HOSE / HNX / UPCOM
+
+Universe = 1 DataFrame (index ticker) gồm đúng các field get_stock_data trả
+về (pe, pb, eps, roe, roa, market_cap, volume, price_change_pct, ...), do
+UniverseBuilder dựng dần trong nền (executor riêng, ngân sách Yahoo riêng,
+1 request .info / mã). Trang Bộ lọc chỉ đọc bản hiện có. Mọi điều kiện lọc /
+xếp hạng chạy trên mảng NumPy — không gọi mạng theo từng dòng.
+
+    uni  = universe()                       # có thể chưa đủ mã khi đang dựng
+    hits = screen(uni, [("roe", ">", 15), ("pe", "<", INDUSTRY_AVG)],
+                  sort_by="volume", top_n=20)
+"""
+import operator
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from core import cache_backend, http_pool, symbol_resolver
+from core.batch_fetcher import get_batch_snapshot, VN30, SNAPSHOT_COLUMNS, _fundamental_row
+from core.data_fetcher import (_LayerMiss, _safe, _info_layer, REGION_SUFFIX,
+                               VALUATION_TTL, YAHOO)
+
+EXCHANGES        = ("HOSE", "HNX", "UPCOM")
+UNIVERSE_TTL     = 15 * 60
+LISTING_TTL      = 24 * 3600
+UNIVERSE_CHUNK   = 200      # số mã mỗi lần yf.download
+UNIVERSE_WORKERS = 2        # executor riêng của builder
+UNIVERSE_SHARE   = float(os.environ.get("LBCK_UNIVERSE_SHARE", 0.25))   # phần ngân sách Yahoo
+PRESTART         = os.environ.get("LBCK_UNIVERSE", "1") != "0"
+SAVE_EVERY       = 50       # lưu tiến độ .info sau mỗi N mã
+TICK_S           = 5
+INDUSTRY_AVG     = "industry_avg"
+
+QUOTE_COLUMNS = ["price", "open_price", "high_price", "low_price", "volume", "ref_price",
+                 "price_change", "price_change_pct"]
+INFO_KEYS     = ("trailingPE", "forwardPE", "priceToBook", "trailingEps", "bookValue",
+                 "returnOnEquity", "returnOnAssets", "sharesOutstanding",
+                 "industry", "sector", "exchange")
+_STORE_KEY    = cache_backend.make_key("universe_info", EXCHANGES)
+
+SCREEN_FIELDS = ["pe", "pb", "eps", "roe", "roa", "market_cap",
+                 "volume", "price_change_pct", "price"]
+
+_OPS = {
+    ">":  operator.gt, ">=": operator.ge,
+    "<":  operator.lt, "<=": operator.le,
+    "==": operator.eq, "!=": operator.ne,
+}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  DANH SÁCH NIÊM YẾT
+# ══════════════════════════════════════════════════════════════════════════════
+@st.cache_data(ttl=LISTING_TTL, show_spinner=False)
+def _ssi_listing(exchange: str) -> list:
+    """Mã niêm yết trên 1 sàn từ SSI iBoard (bị chặn từ US → breaker mở nhanh)."""
+    r = http_pool.get(f"https://iboard-query.ssi.com.vn/v2/stock/exchange/{exchange.lower()}",
+                      headers={"Origin": "https://iboard.ssi.com.vn",
+                               "Referer": "https://iboard.ssi.com.vn/"},
+                      timeout=5)
+    if r.status_code != 200:
+        raise _LayerMiss()
+    data = r.json().get("data") or []
+    syms = sorted({str(x.get("stockSymbol") or x.get("symbol") or "").upper()
+                   for x in data if isinstance(x, dict)} - {""})
+    if not syms:
+        raise _LayerMiss()
+    return syms
+
+
+def load_listing(exchanges=EXCHANGES) -> pd.DataFrame:
+    """
+    DataFrame (ticker, exchange). Không lấy được danh sách sàn → VN30 với
+    exchange rỗng (sẽ lấy từ .info khi dựng universe).
+    """
+    frames = []
+    for ex in exchanges:
+        syms = _safe(_ssi_listing, ex)
+        if syms:
+            frames.append(pd.DataFrame({"ticker": syms, "exchange": ex}))
+    if not frames:
+        return pd.DataFrame({"ticker": VN30, "exchange": None})
+    return pd.concat(frames, ignore_index=True).drop_duplicates("ticker")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  UNIVERSE — dựng dần trong nền
+# ══════════════════════════════════════════════════════════════════════════════
+class UniverseBuilder:
+    """
+    Dựng universe từng phần trong 1 luồng nền, không chặn trang nào:
+      1. Danh sách niêm yết, VN30 đứng đầu → kết quả dùng được sớm
+      2. Giá: 1 yf.download / UNIVERSE_CHUNK mã (get_batch_snapshot, fundamentals=False)
+      3. Cơ bản: đúng 1 request .info / mã, chạy trên executor riêng
+         UNIVERSE_WORKERS luồng (không chiếm _POOL của get_stock_data), giãn
+         theo UNIVERSE_SHARE ngân sách data_fetcher.YAHOO và chờ khe trống
+    Giá làm mới mỗi UNIVERSE_TTL, .info mỗi VALUATION_TTL (lỗi → thử lại sau
+    UNIVERSE_TTL). Tiến độ .info lưu vào cache_backend → khởi động lại hay
+    replica khác tiếp tục từ chỗ dở thay vì dựng lại từ đầu.
+    """
+
+    def __init__(self, exchanges=EXCHANGES, budget=None, share: float = UNIVERSE_SHARE,
+                 workers: int = UNIVERSE_WORKERS, fetch_listing=None, fetch_quotes=None,
+                 fetch_info=None, backend=None, clock=time.time, sleep=time.sleep):
+        self.exchanges = tuple(exchanges)
+        self.budget    = budget or YAHOO
+        self.share     = share
+        self._fetch_listing = fetch_listing or load_listing
+        self._fetch_quotes  = fetch_quotes or _snapshot_quotes
+        self._fetch_info    = fetch_info or _info_fields
+        self._backend  = backend
+        self._clock, self._sleep = clock, sleep
+        self._pool     = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="universe")
+        self._lock     = threading.Lock()
+        self._gate     = threading.Lock()
+        self._next_at  = 0.0
+        self._listing  = None
+        self._quotes   = {}        # ticker → {trường giá}
+        self._funda    = {}        # ticker → (thời điểm, trường .info | None nếu lỗi)
+        self._version  = 0
+        self._cached   = (-1, None)
+        self._stats    = {"passes": 0, "info_calls": 0, "info_errors": 0, "quote_batches": 0}
+        self._stop     = threading.Event()
+        self._thread   = None
+
+    # ── Ngân sách ────────────────────────────────────────────────────────────
+    def _wait_turn(self) -> bool:
+        """Chờ tới lượt: limiter chung có khe và đã qua khoảng giãn của builder."""
+        gap = 60.0 / (self.budget.rpm * self.share)
+        while not self._stop.is_set():
+            with self._gate:
+                w = max(self.budget.ready_in(), self._next_at - self._clock())
+                if w <= 0:
+                    self._next_at = self._clock() + gap
+                    return True
+            self._sleep(min(w, TICK_S))
+        return False
+
+    # ── Lưu / nạp tiến độ ────────────────────────────────────────────────────
+    def _store(self):
+        return self._backend or cache_backend.default()
+
+    def _load(self):
+        saved = self._store().get(_STORE_KEY) or {}
+        with self._lock:
+            for t, (at, fields) in saved.items():
+                if t not in self._funda:
+                    self._funda[t] = (at, fields)
+            self._version += 1
+
+    def _save(self):
+        with self._lock:
+            snap = dict(self._funda)
+        self._store().set(_STORE_KEY, snap, VALUATION_TTL)
+
+    # ── Vòng dựng ────────────────────────────────────────────────────────────
+    def _due(self, t: str, now: float) -> bool:
+        at, fields = self._funda.get(t, (None, None))
+        return at is None or now - at >= (VALUATION_TTL if fields else UNIVERSE_TTL)
+
+    def _info_job(self, t: str):
+        if not self._wait_turn():
+            return
+        fields = self._fetch_info(t)
+        with self._lock:
+            self._funda[t] = (self._clock(), fields or None)
+            self._stats["info_calls"] += 1
+            self._stats["info_errors"] += not fields
+            self._version += 1
+
+    def run_once(self):
+        listing = self._fetch_listing(self.exchanges)
+        listing = listing.iloc[(~listing["ticker"].isin(VN30)).argsort(kind="stable")]
+        tickers = listing["ticker"].tolist()
+        with self._lock:
+            self._listing = listing.reset_index(drop=True)
+            self._version += 1
+
+        for i in range(0, len(tickers), UNIVERSE_CHUNK):
+            if not self._wait_turn():
+                return
+            df = self._fetch_quotes(tickers[i:i + UNIVERSE_CHUNK])
+            with self._lock:
+                self._quotes.update(df[QUOTE_COLUMNS].to_dict("index"))
+                self._stats["quote_batches"] += 1
+                self._version += 1
+
+        now = self._clock()
+        with self._lock:
+            due = [t for t in tickers if t in self._quotes and self._due(t, now)]
+        futs = [self._pool.submit(self._info_job, t) for t in due]
+        for n, f in enumerate(as_completed(futs), 1):
+            f.result()
+            if n % SAVE_EVERY == 0:
+                self._save()
+        if futs:
+            self._save()
+        with self._lock:
+            self._stats["passes"] += 1
+
+    def _run(self):
+        self._load()
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                pass                        # lỗi mạng / nguồn → thử lại lượt sau
+            self._stop.wait(UNIVERSE_TTL)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="universe", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ── Đọc ──────────────────────────────────────────────────────────────────
+    def progress(self) -> dict:
+        with self._lock:
+            listed = 0 if self._listing is None else len(self._listing)
+            return {**self._stats, "listed": listed, "quoted": len(self._quotes),
+                    "fundamentals": sum(1 for t in self._quotes
+                                        if (self._funda.get(t) or (0, None))[1]),
+                    "running": bool(self._thread and self._thread.is_alive())}
+
+    def snapshot(self) -> pd.DataFrame:
+        """Universe hiện có (mã chưa có .info → NaN ở các cột cơ bản)."""
+        with self._lock:
+            version, listing = self._version, self._listing
+            if self._cached[0] == version:
+                return self._cached[1]
+            quotes = dict(self._quotes)
+            funda  = {t: f for t, (_, f) in self._funda.items() if f}
+        rows = {t: {**q, **_fundamental_row(q["price"], {"info": funda.get(t)})}
+                for t, q in quotes.items()}
+        uni = pd.DataFrame.from_dict(rows, orient="index").reindex(columns=SNAPSHOT_COLUMNS)
+        uni.index.name = "ticker"
+        num = [c for c in SNAPSHOT_COLUMNS if c not in ("industry", "market")]
+        uni[num] = uni[num].apply(pd.to_numeric, errors="coerce").astype(np.float64)
+        if listing is not None and not uni.empty:
+            ex = listing.set_index("ticker")["exchange"].reindex(uni.index)
+            uni["market"] = ex.where(ex.notna(), uni["market"])
+        uni["industry"] = uni["industry"].fillna("N/A")
+        with self._lock:
+            self._cached = (version, uni)
+        return uni
+
+
+def _snapshot_quotes(tickers: list) -> pd.DataFrame:
+    return get_batch_snapshot(tickers, region="VN", fundamentals=False)[0]
+
+
+def _info_fields(ticker: str) -> dict:
+    """1 request .info → đúng các trường _fundamental_row cần (gọn để lưu backend)."""
+    info = _safe(_info_layer, symbol_resolver.preferred(ticker, REGION_SUFFIX["VN"])) or {}
+    return {k: info[k] for k in INFO_KEYS if info.get(k) is not None}
+
+
+@st.cache_resource(show_spinner=False)
+def _builder() -> UniverseBuilder:
+    b = UniverseBuilder()
+    b.start()
+    return b
+
+
+def start_universe():
+    """Bắt đầu dựng universe ngay khi khởi động (LBCK_UNIVERSE=0 → đợi lần mở Bộ lọc đầu)."""
+    return _builder() if PRESTART else None
+
+
+def universe() -> pd.DataFrame:
+    return _builder().snapshot()
+
+
+def universe_progress() -> dict:
+    return _builder().progress()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  LỌC + XẾP HẠNG (vector)
+# ══════════════════════════════════════════════════════════════════════════════
+def industry_average(uni: pd.DataFrame, field: str) -> np.ndarray:
+    """TB ngành của `field` cho từng dòng (chỉ tính giá trị > 0, như P/E TB ngành)."""
+    col = uni[field].where(uni[field] > 0)
+    return col.groupby(uni["industry"]).transform("mean").to_numpy()
+
+
+def screen(uni: pd.DataFrame, conditions=(), market: str = None,
+           sort_by: str = "volume", ascending: bool = False, top_n: int = 20) -> pd.DataFrame:
+    """
+    conditions: [(field, op, value)], op ∈ >, >=, <, <=, ==, !=
+                value là số hoặc INDUSTRY_AVG (so với TB ngành của chính field đó;
+                giá trị ≤ 0 như P/E âm bị loại, giống cách tính TB ngành)
+    market:     "HOSE" / "HNX" / "UPCOM" / None hoặc "Tất cả"
+    NaN không bao giờ thoả điều kiện.
+    """
+    if uni is None or uni.empty:
+        return uni
+    mask = np.ones(len(uni), dtype=bool)
+    if market and market in EXCHANGES:
+        mask &= (uni["market"] == market).to_numpy()
+    for field, op, value in conditions:
+        col = uni[field].to_numpy(dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            if value == INDUSTRY_AVG:
+                mask &= _OPS[op](col, industry_average(uni, field)) & (col > 0)
+            else:
+                mask &= _OPS[op](col, float(value)) & ~np.isnan(col)
+    out = uni[mask]
+    if sort_by:
+        out = out.sort_values(sort_by, ascending=ascending, na_position="last")
+    return out.head(top_n) if top_n else out
@@ -0,0 +1,164 @@
+"""
+core/singleflight.py — Gộp các lời gọi trùng nhau đang chạy cùng lúc
+
+st.cache_data chỉ chặn gọi lại SAU khi đã có kết quả. Lúc entry vừa hết hạn,
+20 phiên cùng hỏi VNM sẽ cùng chạy lại get_stock_data. Single-flight: theo
+khoá (hàm, tham số), chỉ 1 lời gọi thật sự chạy, các lời gọi đến sau chờ và
+dùng chung kết quả (hoặc chung exception).
+
+    @st.cache_data(ttl=60)          # cache bên ngoài
+    @singleflight("get_stock_data") # gộp các lần cache miss đồng thời
+    def get_stock_data(ticker, region="VN"): ...
+
+Với kết quả dạng stream (AI), Group.stream(): 1 luồng nền chạy generator,
+mọi người đọc cùng nhận từng đoạn (người đến sau nhận lại từ đầu).
+"""
+import functools
+import threading
+
+_groups: dict = {}
+_groups_lock = threading.Lock()
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event, self.result, self.error, self.waiters = threading.Event(), None, None, 0
+
+
+class _Broadcast:
+    """Bộ đệm các đoạn stream: ("chunk", text) hoặc ("wait", (giây, phía trước))."""
+
+    def __init__(self):
+        self.items, self.done, self.error = [], False, None
+        self.cond = threading.Condition()
+
+    def push(self, item):
+        with self.cond:
+            self.items.append(item)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.done, self.error = True, error
+            self.cond.notify_all()
+
+    def read(self, on_wait=None):
+        i = 0
+        while True:
+            with self.cond:
+                while i >= len(self.items) and not self.done:
+                    self.cond.wait()
+                batch, done, error = self.items[i:], self.done, self.error
+            i += len(batch)
+            for kind, val in batch:
+                if kind == "chunk":
+                    yield val
+                elif on_wait:
+                    try: on_wait(*val)
+                    except Exception: pass
+            if done and i >= len(self.items):
+                if error is not None:
+                    raise error
+                return
+
+
+class Group:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self._streams: dict = {}
+        self._counts = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Chạy fn(*args, **kwargs) — hoặc chờ lời gọi cùng `key` đang chạy."""
+        with self._lock:
+            self._counts["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counts["executed"] += 1
+            else:
+                call.waiters += 1
+                self._counts["coalesced"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def stream(self, key, gen_fn, on_wait=None):
+        """
+        Generator dùng chung cho `key`. gen_fn(on_wait) → generator, chạy 1 lần
+        trên luồng nền (người đọc rời đi giữa chừng không làm hỏng người khác).
+        on_wait của từng người đọc được gọi lại trên luồng của chính họ.
+        """
+        with self._lock:
+            self._counts["calls"] += 1
+            bc = self._streams.get(key)
+            if bc is None:
+                bc = self._streams[key] = _Broadcast()
+                self._counts["executed"] += 1
+                threading.Thread(target=self._produce, args=(key, bc, gen_fn),
+                                 name=f"singleflight-{self.name}", daemon=True).start()
+            else:
+                self._counts["coalesced"] += 1
+        return bc.read(on_wait)
+
+    def _produce(self, key, bc, gen_fn):
+        error = None
+        try:
+            for chunk in gen_fn(lambda *a: bc.push(("wait", a))):
+                bc.push(("chunk", chunk))
+        except BaseException as e:
+            error = e
+        finally:
+            with self._lock:
+                self._streams.pop(key, None)
+            bc.finish(error)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self._counts, "in_flight": len(self._calls) + len(self._streams)}
+
+
+def group(name: str) -> Group:
+    with _groups_lock:
+        g = _groups.get(name)
+        if g is None:
+            g = _groups[name] = Group(name)
+        return g
+
+
+def singleflight(name: str):
+    """Decorator: gộp các lời gọi đồng thời có cùng tham số (phải hashable)."""
+    def deco(fn):
+        g = group(name)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return g.do((args, tuple(sorted(kwargs.items()))), fn, *args, **kwargs)
+        return wrapper
+    return deco
+
+
+def stats() -> dict:
+    """{tên: {calls, executed, coalesced, in_flight}} — coalesced = số lời gọi được gộp."""
+    with _groups_lock:
+        gs = list(_groups.values())
+    return {g.name: g.snapshot() for g in gs}
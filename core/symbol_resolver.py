@@ -0,0 +1,78 @@
+"""
+core/symbol_resolver.py — Nhớ mã Yahoo dùng được + cache âm cho mã không tồn tại
+
+get_stock_data thử `{ticker}{suffix}` rồi mã trần, mỗi dạng tối đa 3 lần →
+mã gõ sai tốn tới 6 lần gọi mạng mới trả "Không tìm thấy mã", còn mã đúng
+thì lần nào cũng phải dò lại dạng nào chạy. Module này nhớ (qua backend
+chung core.cache_backend → dùng chung giữa replica, còn sau restart):
+
+  (ticker, suffix) → mã Yahoo đã chạy        giữ RESOLVE_TTL (7 ngày)
+  (ticker, suffix) → KHÔNG tồn tại           giữ NEGATIVE_TTL (10 phút)
+
+Cache âm chỉ ghi khi MỌI dạng mã đều trả dữ liệu rỗng / "delisted" — lỗi
+mạng, rate limit, timeout là lỗi tạm thời, không bị nhớ.
+
+    if symbol_resolver.is_unknown("FTPX", ".VN"): ...   # bỏ qua ngay
+    for yf_str in symbol_resolver.candidates("FPT", ".VN"): ...
+    symbol_resolver.remember("FPT", ".VN", "FPT.VN")
+"""
+from core import cache_backend
+
+RESOLVE_TTL  = 7 * 24 * 3600
+NEGATIVE_TTL = 10 * 60
+
+# Thông báo yfinance khi mã không tồn tại (khác lỗi mạng tạm thời)
+NOT_FOUND_MARKERS = ("delisted", "no data found", "not found", "no timezone found",
+                     "tzmissing", "no price data")
+
+_stats = {"memo_hit": 0, "resolved": 0, "negative_hit": 0, "negative_set": 0}
+
+
+def _key(kind: str, ticker: str, suffix: str) -> str:
+    return cache_backend.make_key(f"symbol_{kind}", (ticker.upper(), suffix))
+
+
+def is_not_found_error(err: str) -> bool:
+    el = err.lower()
+    return any(m in el for m in NOT_FOUND_MARKERS)
+
+
+def candidates(ticker: str, suffix: str) -> list:
+    """Các dạng mã Yahoo cần thử, dạng đã biết chạy được đứng đầu."""
+    forms = [f"{ticker}{suffix}", ticker] if suffix else [ticker]
+    known = cache_backend.default().get(_key("ok", ticker, suffix))
+    if known in forms:
+        _stats["memo_hit"] += 1
+        forms.remove(known)
+        forms.insert(0, known)
+    return forms
+
+
+def preferred(ticker: str, suffix: str) -> str:
+    return candidates(ticker, suffix)[0]
+
+
+def remember(ticker: str, suffix: str, yf_str: str):
+    _stats["resolved"] += 1
+    backend = cache_backend.default()
+    backend.set(_key("ok", ticker, suffix), yf_str, RESOLVE_TTL)
+    try:
+        backend.delete(_key("neg", ticker, suffix))
+    except Exception:
+        pass
+
+
+def is_unknown(ticker: str, suffix: str) -> bool:
+    hit = cache_backend.default().get(_key("neg", ticker, suffix)) is not None
+    if hit:
+        _stats["negative_hit"] += 1
+    return hit
+
+
+def mark_unknown(ticker: str, suffix: str):
+    _stats["negative_set"] += 1
+    cache_backend.default().set(_key("neg", ticker, suffix), True, NEGATIVE_TTL)
+
+
+def stats() -> dict:
+    return dict(_stats)
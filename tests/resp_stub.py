@@ -0,0 +1,90 @@
+"""
+tests/resp_stub.py — Server RESP giả lập Redis, đủ cho core.cache_backend.RedisBackend
+
+Chạy trong thread, cổng ngẫu nhiên, dữ liệu trong bộ nhớ:
+  GET / SET key value [PX ms] / DEL / FLUSHDB / AUTH / SELECT / PING
+Lệnh khác → "-ERR unknown command" (kết nối vẫn sống, như Redis thật).
+
+    with RespStub() as srv:
+        backend = RedisBackend(srv.url)
+"""
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            n = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(n + 2)[:n])
+        return args
+
+    def handle(self):
+        srv = self.server
+        while True:
+            args = self._read_command()
+            if not args:
+                return
+            srv.commands.append(args[0].upper().decode())
+            self.wfile.write(srv.execute(args))
+            self.wfile.flush()
+
+
+class RespStub(socketserver.ThreadingTCPServer):
+    daemon_threads      = True
+    allow_reuse_address = True
+
+    def __init__(self, password: str = None, clock=time.monotonic):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.password = password
+        self.clock    = clock
+        self.data     = {}          # key → (hết hạn | None, value)
+        self.commands = []
+        self._lock    = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        auth = f":{self.password}@" if self.password else ""
+        return f"redis://{auth}127.0.0.1:{self.server_address[1]}/0"
+
+    def execute(self, args) -> bytes:
+        cmd, rest = args[0].upper(), args[1:]
+        with self._lock:
+            if cmd in (b"AUTH", b"SELECT", b"PING"):
+                if cmd == b"AUTH" and rest[-1].decode() != self.password:
+                    return b"-WRONGPASS invalid password\r\n"
+                return b"+OK\r\n" if cmd != b"PING" else b"+PONG\r\n"
+            if cmd == b"GET":
+                item = self.data.get(rest[0])
+                if item and item[0] is not None and item[0] <= self.clock():
+                    del self.data[rest[0]]
+                    item = None
+                return b"$-1\r\n" if item is None else b"$%d\r\n%s\r\n" % (len(item[1]), item[1])
+            if cmd == b"SET":
+                expires = None
+                if len(rest) >= 4 and rest[2].upper() == b"PX":
+                    expires = self.clock() + int(rest[3]) / 1000
+                self.data[rest[0]] = (expires, rest[1])
+                return b"+OK\r\n"
+            if cmd == b"DEL":
+                n = sum(self.data.pop(k, None) is not None for k in rest)
+                return b":%d\r\n" % n
+            if cmd == b"FLUSHDB":
+                self.data.clear()
+                return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % cmd.lower()
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
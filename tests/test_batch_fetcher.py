@@ -0,0 +1,69 @@
+"""Lô yf.download thiếu cột: không dò mã trần, không nhớ gì, cache âm chỉ sau recheck."""
+import pandas as pd
+import pytest
+
+from core import batch_fetcher, cache_backend, symbol_resolver
+from core.cache_backend import MemoryBackend
+
+QUOTE = {"price": 25.0, "open": 24.8, "high": 25.3, "low": 24.5, "volume": 1_000_000, "prev": 24.6}
+
+
+@pytest.fixture
+def env(monkeypatch):
+    cache_backend.set_default(MemoryBackend())
+    calls = {"batch": [], "recheck": [], "remember": []}
+
+    def batch_quotes(symbols):
+        calls["batch"].append(symbols)
+        kept = [s for s in symbols if s != "ACB.VN"]         # cột ACB.VN rỗng (429 / timeout)
+        return pd.DataFrame.from_dict({s: QUOTE for s in kept}, orient="index")
+
+    monkeypatch.setattr(batch_fetcher, "_batch_quotes", batch_quotes)
+    monkeypatch.setattr(symbol_resolver, "remember",
+                        lambda *a: calls["remember"].append(a))
+    yield calls
+    cache_backend.set_default(None)
+
+
+def _recheck_with(monkeypatch, calls, result):
+    def recheck(sym):
+        calls["recheck"].append(sym)
+        return result
+    monkeypatch.setattr(batch_fetcher, "_recheck", recheck)
+
+
+def test_transient_miss_is_not_negative_cached(env, monkeypatch):
+    _recheck_with(monkeypatch, env, (None, False))
+    df, errors = batch_fetcher.get_batch_snapshot(["FPT", "ACB"], region="VN", fundamentals=False)
+    assert list(df.index) == ["FPT"]
+    assert errors == {"ACB": "Không có dữ liệu giá"}
+    assert env["recheck"] == ["ACB.VN"]
+    assert not symbol_resolver.is_unknown("ACB", ".VN")
+    assert all("ACB" not in syms for syms in env["batch"])      # không dò mã trần (mã Mỹ)
+    assert env["remember"] == []
+
+
+def test_recheck_not_found_marks_unknown(env, monkeypatch):
+    _recheck_with(monkeypatch, env, (None, True))
+    _, errors = batch_fetcher.get_batch_snapshot(["FPT", "ACB"], region="VN", fundamentals=False)
+    assert errors == {"ACB": "Không tìm thấy mã"}
+    assert symbol_resolver.is_unknown("ACB", ".VN")
+
+
+def test_recheck_recovers_quote(env, monkeypatch):
+    _recheck_with(monkeypatch, env, (dict(QUOTE, price=30.0), False))
+    df, errors = batch_fetcher.get_batch_snapshot(["FPT", "ACB"], region="VN", fundamentals=False)
+    assert errors == {}
+    assert df.loc["ACB", "price"] == 30.0
+    assert env["remember"] == []
+
+
+def test_no_recheck_when_batch_mostly_missing(env, monkeypatch):
+    _recheck_with(monkeypatch, env, (None, True))
+    monkeypatch.setattr(batch_fetcher, "_batch_quotes",
+                        lambda symbols: pd.DataFrame.from_dict({symbols[0]: QUOTE}, orient="index"))
+    tickers = [f"M{i:02d}" for i in range(batch_fetcher.RECHECK_MAX + 2)]
+    _, errors = batch_fetcher.get_batch_snapshot(tickers, region="VN", fundamentals=False)
+    assert env["recheck"] == []
+    assert not any(symbol_resolver.is_unknown(t, ".VN") for t in tickers)
+    assert len(errors) == len(tickers) - 1
@@ -0,0 +1,104 @@
+"""RedisBackend chạy với tests/resp_stub.py — không cần Redis thật."""
+import socket
+
+import pandas as pd
+import pytest
+
+from core import cache_backend
+from core.cache_backend import CacheBackend, RedisBackend
+from core.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from tests.resp_stub import RespStub
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def srv(clock):
+    with RespStub(password="s3cret", clock=clock) as s:
+        yield s
+
+
+def _backend(url, clock=None):
+    b = RedisBackend(url, timeout=0.2)
+    b._breaker = CircuitBreaker(url, failure_threshold=2, cooldown_s=30, clock=clock or _Clock())
+    return b
+
+
+def test_set_get_delete_roundtrip(srv):
+    b = _backend(srv.url)
+    value = {"price": 98200.0, "missed": ("ssi",), "df": pd.DataFrame({"Close": [1.0, 2.0]})}
+    b.set("k", value, ttl=60)
+    got = b.get("k")
+    assert got["price"] == 98200.0 and got["missed"] == ("ssi",)
+    assert got["df"]["Close"].tolist() == [1.0, 2.0]
+    assert srv.commands[:1] == ["AUTH"]
+    b.delete("k")
+    assert b.get("k", "miss") == "miss"
+    assert b.stats()["hit"] == 1 and b.stats()["miss"] == 1
+
+
+def test_ttl_evicts(srv, clock):
+    b = _backend(srv.url)
+    b.set("short", 1, ttl=5)
+    b.set("long", 2, ttl=600)
+    clock.t += 10
+    assert b.get("short") is None
+    assert b.get("long") == 2
+    assert b"short" not in srv.data
+
+
+def test_clear_flushes(srv):
+    b = _backend(srv.url)
+    b.set("a", 1, ttl=60)
+    b.clear()
+    assert b.get("a") is None and not srv.data
+
+
+def test_tampered_blob_is_a_miss_not_code(srv):
+    b = _backend(srv.url)
+    srv.data[b"evil"] = (None, b"LBCK\x01" + b"cos\nsystem\n(S'true'\ntR.")
+    srv.data[b"junk"] = (None, cache_backend.MAGIC + bytes([cache_backend.SERIAL_VERSION]) + b"{")
+    assert b.get("evil", "miss") == "miss"
+    assert b.get("junk", "miss") == "miss"
+
+
+def test_dead_host_is_a_miss_and_opens_breaker():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    b = _backend(f"redis://127.0.0.1:{port}/0")
+    assert b.get("k", "miss") == "miss"
+    b.set("k", 1, ttl=60)
+    assert b._breaker.state == OPEN
+    assert b.get("k", "miss") == "miss"              # bị chặn, không chờ timeout
+    assert b._breaker.snapshot()["rejected"] == 1
+
+
+def test_err_reply_during_probe_closes_breaker(srv, clock):
+    b = _backend(srv.url, clock)
+    b._breaker.record_failure("x")
+    b._breaker.record_failure("x")
+    clock.t += 31
+    assert b._breaker.state == HALF_OPEN
+    with pytest.raises(RuntimeError):
+        b.command("NOPE")                             # -ERR trong lượt thăm dò
+    assert b._breaker.state == CLOSED
+    b.set("k", 1, ttl=60)
+    assert b.get("k") == 1
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
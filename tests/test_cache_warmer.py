@@ -0,0 +1,74 @@
+"""Warmer: ngân sách Yahoo theo request thật, 1 lượt quote gọn trong QUOTE_TTL."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core import cache_warmer
+from core.rate_limiter import ModelLimiter
+
+SESSION = datetime(2026, 10, 19, 10, 0, tzinfo=timezone(timedelta(hours=7)))   # thứ Hai, phiên sáng
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, s):
+        self.sleeps.append(s)
+        self.t += s
+
+
+@pytest.fixture
+def env():
+    clock = _Clock()
+    budget = ModelLimiter("yahoo", 60, 10 ** 9, clock=clock)
+    calls = []
+
+    def quote(t, r):
+        calls.append(("q", t, clock.t))
+        budget.charge()
+
+    def history(t, r):
+        calls.append(("h", t, clock.t))
+        budget.charge(3)               # history + info + fast_info
+
+    w = cache_warmer.Warmer(base=[(f"T{i}", "VN") for i in range(50)], top_n=50,
+                            budget=budget, share=0.5, fetch_quote=quote,
+                            fetch_history=history, clock=clock, sleep=clock.sleep)
+    return w, clock, budget, calls
+
+
+def test_quote_capacity_trims_hot_set(env):
+    w, *_ = env
+    q_every = cache_warmer.CADENCE["session"][0]
+    assert w.quote_capacity(q_every) == 30          # 60 rpm × 60s × 0.5
+    w.run_once(SESSION)
+    assert w.stats()["quote_capacity"] == 30
+
+
+def test_quote_pass_fits_in_ttl(env):
+    w, clock, _, calls = env
+    w.run_once(SESSION)
+    qs = [at for kind, _, at in calls if kind == "q"]
+    assert len(qs) == 30
+    assert max(qs) - min(qs) < cache_warmer.QUOTE_TTL
+
+
+def test_waits_on_budget_not_fixed_gap(env):
+    w, clock, budget, calls = env
+    w.run_once(SESSION)
+    assert all(s <= cache_warmer.TICK_S for s in clock.sleeps)
+    assert clock.t <= cache_warmer.CADENCE["session"][0] + 5     # lịch sử dư → lượt sau
+    assert sum(1 for c in calls if c[0] == "h") < 50
+
+
+def test_user_traffic_delays_warmer(env):
+    w, clock, budget, calls = env
+    budget.charge(100)                  # người dùng vừa tiêu ngân sách
+    w.run_once(SESSION)
+    first = min(at for *_, at in calls)
+    assert first >= 100 - budget._tau - 1
@@ -0,0 +1,32 @@
+"""get_stock_data: history quá deadline → lỗi riêng, không cache như "không có mã"."""
+import streamlit as st
+import pytest
+
+from core import cache_backend, data_fetcher
+from core.cache_backend import MemoryBackend
+
+
+@pytest.fixture
+def env(monkeypatch):
+    cache_backend.set_default(MemoryBackend())
+    st.cache_data.clear()
+    calls = []
+
+    def fetch(ticker, region, deadline):
+        calls.append(ticker)
+        if len(calls) == 1:
+            raise data_fetcher._Unavailable()
+        return None, {}, [], []
+
+    monkeypatch.setattr(data_fetcher, "_fetch_parallel", fetch)
+    yield calls
+    st.cache_data.clear()
+    cache_backend.set_default(None)
+
+
+def test_timeout_is_not_cached(env):
+    first = data_fetcher.get_stock_data("zzq")
+    assert first["_unavailable"] and "không phản hồi" in first["error"]
+    second = data_fetcher.get_stock_data("ZZQ")
+    assert env == ["ZZQ", "ZZQ"]                         # lần 2 gọi lại thật
+    assert "Không tìm thấy mã" in second["error"] and "_unavailable" not in second
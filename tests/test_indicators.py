@@ -0,0 +1,72 @@
+"""EMA dạng đóng khớp vòng lặp / pandas; cập nhật tăng dần khớp tính lại toàn bộ."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import indicators
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(7)
+    close = 80_000 + np.cumsum(rng.normal(0, 500, 1300))
+    idx = pd.bdate_range("2021-01-04", periods=len(close))
+    return pd.DataFrame({"Open": close, "High": close + 300, "Low": close - 300,
+                         "Close": close, "Volume": rng.integers(1e5, 1e6, len(close))},
+                        index=idx, dtype=np.float64)
+
+
+@pytest.mark.parametrize("alpha", [1.0, 2 / 3, 2 / 21, 1 / 14, 2 / 501])
+@pytest.mark.parametrize("start, prev", [(0, None), (0, np.nan), (400, 80_000.0)])
+def test_closed_form_matches_loop(df, alpha, start, prev):
+    x = df["Close"].to_numpy()
+    got, kept = indicators._ewm(x, alpha, start, prev, len(x) - 2)
+    ref, kref = indicators._ewm_loop(x, alpha, start, prev, len(x) - 2)
+    np.testing.assert_allclose(got, ref, rtol=1e-12)
+    assert kept == pytest.approx(kref, rel=1e-12)
+
+
+def test_ema_matches_pandas(df):
+    indicators.clear()
+    got = indicators.compute("T", df, "ema", n=20)["ema"]
+    ref = df["Close"].ewm(span=20, adjust=False).mean()
+    np.testing.assert_allclose(got, ref, rtol=1e-12)
+
+
+def test_nan_falls_back_to_loop(df):
+    x = df["Close"].to_numpy().copy()
+    x[500] = np.nan
+    got, _ = indicators._ewm(x, 0.1, 0, None, len(x) - 2)
+    ref, _ = indicators._ewm_loop(x, 0.1, 0, None, len(x) - 2)
+    np.testing.assert_array_equal(np.isnan(got), np.isnan(ref))
+    np.testing.assert_allclose(got[~np.isnan(got)], ref[~np.isnan(ref)], rtol=1e-12)
+
+
+@pytest.mark.parametrize("name", ["ema", "rsi", "macd", "atr"])
+def test_incremental_equals_full(df, name):
+    indicators.clear()
+    before = indicators.stats()
+    indicators.compute("T", df.iloc[:-5], name)
+    inc = indicators.compute("T", df, name)
+    indicators.clear()
+    full = indicators.compute("T", df, name)
+    for k in full:
+        np.testing.assert_allclose(inc[k], full[k], rtol=1e-10)
+    after = indicators.stats()
+    assert after["incremental"] - before["incremental"] == 1
+    assert after["full"] - before["full"] == 2
+
+
+@pytest.mark.parametrize("name, col", [("atr", "High"), ("atr", "Low"), ("obv", "Volume")])
+def test_settled_bar_change_forces_full(df, name, col):
+    indicators.clear()
+    indicators.compute("T", df.iloc[:-5], name)
+    adj = df.copy()
+    adj.iloc[-7, adj.columns.get_loc(col)] *= 1.5        # nến kế cuối cũ, close giữ nguyên
+    before = indicators.stats()
+    got = indicators.compute("T", adj, name)
+    assert indicators.stats()["full"] - before["full"] == 1
+    indicators.clear()
+    ref = indicators.compute("T", adj, name)
+    for k in ref:
+        np.testing.assert_allclose(got[k], ref[k], rtol=1e-10)
@@ -0,0 +1,39 @@
+"""route(): mã trả về là token router đã khớp, không dính dấu câu."""
+import json
+
+import pytest
+
+from core import query_router
+from core.query_router import Router
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("FPT?", ("ticker", "FPT")),
+    ("  vcb!", ("ticker", "VCB")),
+    ("fpt, vnm", ("ticker", "FPT")),
+    ("HPG rủi ro", ("ticker", "HPG")),
+    ("AAPL.", ("ticker", "AAPL")),
+    ("oil price outlook", ("general", None)),       # OIL/CEO/GAS là mã nhưng gõ thường
+    ("ceo là ai", ("general", None)),
+    ("gas giá bao nhiêu", ("general", None)),
+    ("GAS giá", ("ticker", "GAS")),
+    ("lãi suất?", ("general", None)),
+    ("FedEx earnings", ("general", None)),
+    ("", ("general", None)),
+])
+def test_route(text, expected):
+    assert Router().route(text) == expected
+
+
+def test_classify_matches_route():
+    r = Router()
+    for t in ("FPT?", "thị trường hôm nay", "xyz"):
+        assert r.classify(t) == r.route(t)[0]
+
+
+def test_log_query(tmp_path, monkeypatch):
+    path = tmp_path / "q.jsonl"
+    monkeypatch.setattr(query_router, "QUERY_LOG", str(path))
+    query_router.log_query("FPT?", "ticker")
+    row = json.loads(path.read_text(encoding="utf-8"))
+    assert (row["q"], row["route"]) == ("FPT?", "ticker")
@@ -0,0 +1,103 @@
+"""UniverseBuilder: executor riêng, 1 .info / mã, giãn theo ngân sách, dựng tiếp từ backend."""
+import threading
+
+import pandas as pd
+import pytest
+
+from core import screener
+from core.cache_backend import MemoryBackend
+from core.data_fetcher import _POOL
+from core.rate_limiter import ModelLimiter
+
+TICKERS = ["AAA", "FPT", "BBB", "HPG", "CCC"]
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, s):
+        with self.lock:
+            self.t += s
+
+
+def _quotes(tickers):
+    return pd.DataFrame({"price": 10.0, "open_price": 10.0, "high_price": 11.0, "low_price": 9.0,
+                         "volume": 1e5, "ref_price": 9.5, "price_change": 0.5,
+                         "price_change_pct": 5.26}, index=pd.Index(tickers, name="ticker"))
+
+
+@pytest.fixture
+def env():
+    clock, calls = _Clock(), {"info": [], "quotes": 0, "threads": set()}
+    budget = ModelLimiter("yahoo", 60, 10 ** 9, clock=clock)
+
+    def quotes(tickers):
+        calls["quotes"] += 1
+        budget.charge()
+        return _quotes(tickers)
+
+    def info(t):
+        calls["info"].append(t)
+        calls["threads"].add(threading.current_thread().name)
+        budget.charge()
+        return {} if t == "CCC" else {"trailingPE": 12.0, "returnOnEquity": 0.2,
+                                      "sharesOutstanding": 1e9, "industry": "Tech"}
+
+    def make(backend):
+        return screener.UniverseBuilder(
+            budget=budget, share=0.5, backend=backend,
+            fetch_listing=lambda ex: pd.DataFrame({"ticker": TICKERS, "exchange": "HOSE"}),
+            fetch_quotes=quotes, fetch_info=info, clock=clock, sleep=clock.sleep)
+    return make, clock, calls
+
+
+def test_one_info_per_ticker_on_own_pool(env):
+    make, clock, calls = env
+    b = make(MemoryBackend())
+    b.run_once()
+    assert sorted(calls["info"]) == sorted(TICKERS)
+    assert calls["quotes"] == 1
+    assert all(n.startswith("universe") for n in calls["threads"])
+    assert _POOL._thread_name_prefix == "fetch"
+    assert set(calls["info"][:2]) == {"FPT", "HPG"}     # VN30 đứng đầu
+
+
+def test_paced_by_share_of_budget(env):
+    make, clock, calls = env
+    make(MemoryBackend()).run_once()
+    # 6 request với 60 rpm × 0.5 → cách nhau ≥ 2s
+    assert clock.t >= 5 * 2
+
+
+def test_snapshot_partial_and_progress(env):
+    make, clock, calls = env
+    b = make(MemoryBackend())
+    b.run_once()
+    uni = b.snapshot()
+    assert list(uni.index) == ["FPT", "HPG", "AAA", "BBB", "CCC"]
+    assert uni.loc["FPT", "roe"] == 20.0 and uni.loc["FPT", "market"] == "HOSE"
+    assert pd.isna(uni.loc["CCC", "pe"])
+    p = b.progress()
+    assert (p["listed"], p["quoted"], p["fundamentals"], p["passes"]) == (5, 5, 4, 1)
+    assert b.snapshot() is uni                           # không đổi → không dựng lại
+
+
+def test_resumes_from_backend_and_retries_errors_later(env):
+    make, clock, calls = env
+    backend = MemoryBackend()
+    make(backend).run_once()
+    calls["info"].clear()
+
+    b2 = make(backend)
+    b2._load()
+    b2.run_once()
+    assert calls["info"] == []                          # lỗi CCC chưa tới hạn thử lại
+
+    clock.t += screener.UNIVERSE_TTL
+    b2.run_once()
+    assert calls["info"] == ["CCC"]